@@ -2,13 +2,31 @@ import streamlit as st
 import sqlite3
 import pandas as pd
 import hashlib
+import json
 import uuid
-from datetime import datetime, timedelta
+from datetime import datetime, time, timedelta
 import os
 from pathlib import Path
 import plotly.express as px
 import plotly.graph_objects as go
 
+from database import DB_PATH, get_connection
+from migrations import migrate
+import assignment
+import bulk_update
+import business_calendar
+import metrics
+import metrics_exporter
+import queries
+import query_log
+import render_profiler
+import sla
+import sla_worker
+import timestamps
+import work_queue
+import write_queue
+from reference_data import LookupTable, get_reference_data
+
 # Page configuration
 st.set_page_config(
     page_title="IT Ticketing System",
@@ -426,197 +444,6 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Database setup
-def init_database():
-    """Initialize the SQLite database with required tables"""
-    conn = sqlite3.connect('tickets.db')
-    cursor = conn.cursor()
-    
-    # Users table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            email TEXT UNIQUE NOT NULL,
-            full_name TEXT NOT NULL,
-            role TEXT NOT NULL CHECK (role IN ('admin', 'it_staff', 'user')),
-            department TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Categories table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS categories (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT UNIQUE NOT NULL,
-            description TEXT
-        )
-    ''')
-    
-    # Priorities table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS priorities (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT UNIQUE NOT NULL,
-            level INTEGER UNIQUE NOT NULL,
-            color TEXT NOT NULL
-        )
-    ''')
-    
-    # Statuses table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS statuses (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT UNIQUE NOT NULL,
-            description TEXT
-        )
-    ''')
-    
-    # Tickets table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS tickets (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            ticket_number TEXT UNIQUE NOT NULL,
-            title TEXT NOT NULL,
-            description TEXT NOT NULL,
-            status_id INTEGER,
-            priority_id INTEGER,
-            category_id INTEGER,
-            requester_id INTEGER,
-            assignee_id INTEGER,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            resolved_at TIMESTAMP,
-            sla_response_due TIMESTAMP,
-            sla_resolution_due TIMESTAMP,
-            first_response_at TIMESTAMP,
-            escalated_at TIMESTAMP,
-
-
-            FOREIGN KEY (status_id) REFERENCES statuses(id),
-            FOREIGN KEY (priority_id) REFERENCES priorities(id),
-            FOREIGN KEY (category_id) REFERENCES categories(id),
-            FOREIGN KEY (requester_id) REFERENCES users(id),
-            FOREIGN KEY (assignee_id) REFERENCES users(id)
-        )
-    ''')
-    
-    # Comments table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS comments (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            ticket_id INTEGER NOT NULL,
-            user_id INTEGER NOT NULL,
-            content TEXT NOT NULL,
-            is_internal BOOLEAN DEFAULT FALSE,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (ticket_id) REFERENCES tickets(id) ON DELETE CASCADE,
-            FOREIGN KEY (user_id) REFERENCES users(id)
-        )
-    ''')
-    
-    # Time tracking table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS time_entries (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            ticket_id INTEGER NOT NULL,
-            user_id INTEGER NOT NULL,
-            description TEXT,
-            time_spent_minutes INTEGER NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (ticket_id) REFERENCES tickets(id) ON DELETE CASCADE,
-            FOREIGN KEY (user_id) REFERENCES users(id)
-        )
-    ''')
-    
-
-    # Knowledge base table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS knowledge_base (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT UNIQUE NOT NULL,
-            content TEXT NOT NULL,
-            category_id INTEGER,
-            tags TEXT,
-            is_public BOOLEAN DEFAULT TRUE,
-            created_by INTEGER,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (category_id) REFERENCES categories(id),
-            FOREIGN KEY (created_by) REFERENCES users(id)
-        )
-    ''')
-    
-    # Insert default data
-    cursor.execute('''
-        INSERT OR IGNORE INTO categories (name, description) VALUES 
-        ('Hardware', 'Issues related to computer hardware, printers, etc.'),
-        ('Software', 'Software installation, configuration, or bugs'),
-        ('Network', 'Network connectivity and infrastructure issues'),
-        ('Email', 'Email client and server issues'),
-        ('Security', 'Security-related concerns and access issues'),
-        ('Account', 'User account management and access'),
-        ('Other', 'Miscellaneous issues')
-    ''')
-    
-    cursor.execute('''
-        INSERT OR IGNORE INTO priorities (name, level, color) VALUES 
-        ('Low', 1, '#10B981'),
-        ('Medium', 2, '#F59E0B'),
-        ('High', 3, '#EF4444'),
-        ('Critical', 4, '#DC2626')
-    ''')
-    
-    cursor.execute('''
-        INSERT OR IGNORE INTO statuses (name, description) VALUES 
-        ('Open', 'New ticket awaiting assignment'),
-        ('In Progress', 'Ticket is being worked on'),
-        ('Pending User', 'Waiting for user response'),
-        ('Pending Vendor', 'Waiting for vendor response'),
-        ('Resolved', 'Issue has been resolved'),
-        ('Closed', 'Ticket is closed')
-    ''')
-    
-    # Create demo users for all roles
-    admin_password = hashlib.sha256('admin123'.encode()).hexdigest()
-    it_staff_password = hashlib.sha256('itstaff123'.encode()).hexdigest()
-    user_password = hashlib.sha256('user123'.encode()).hexdigest()
-    
-    cursor.execute('''
-        INSERT OR IGNORE INTO users (username, password_hash, email, full_name, role, department) 
-        VALUES 
-        ('admin', ?, 'admin@company.com', 'Admin User', 'admin', 'IT'),
-        ('itstaff', ?, 'itstaff@company.com', 'IT Staff User', 'it_staff', 'IT'),
-        ('user', ?, 'user@company.com', 'Regular User', 'user', 'Sales')
-    ''', (admin_password, it_staff_password, user_password))
-    
-
-    
-    # Insert default knowledge base entries (only if they don't exist)
-    cursor.execute('''
-        INSERT OR IGNORE INTO knowledge_base (title, content, category_id, tags, created_by) VALUES 
-        ('How to Reset Your Password', 'To reset your password:\n1. Go to the login page\n2. Click "Forgot Password"\n3. Enter your email address\n4. Check your email for reset instructions\n5. Follow the link and create a new password', 6, 'password,reset,login', 1),
-        ('Common Printer Issues', 'Common printer problems and solutions:\n\n1. Printer not responding:\n   - Check power and USB connections\n   - Restart the printer\n   - Reinstall printer drivers\n\n2. Print quality issues:\n   - Clean print heads\n   - Replace ink/toner cartridges\n   - Check paper quality', 1, 'printer,hardware,troubleshooting', 1),
-        ('VPN Connection Guide', 'How to connect to company VPN:\n\n1. Download VPN client from IT portal\n2. Install and launch the application\n3. Enter your credentials\n4. Select appropriate server location\n5. Click Connect\n\nIf issues persist, contact IT support.', 3, 'vpn,network,remote', 1)
-    ''')
-    
-    # Clean up any existing duplicate knowledge base entries
-    cursor.execute('''
-        DELETE FROM knowledge_base 
-        WHERE id NOT IN (
-            SELECT MIN(id) 
-            FROM knowledge_base 
-            GROUP BY title
-        )
-    ''')
-    
-
-    
-    conn.commit()
-    conn.close()
-
 def hash_password(password):
     """Hash a password using SHA256"""
     return hashlib.sha256(password.encode()).hexdigest()
@@ -627,7 +454,7 @@ def verify_password(password, hashed):
 
 def authenticate_user(username, password):
     """Authenticate a user and return user data if successful"""
-    conn = sqlite3.connect('tickets.db')
+    conn = get_db_connection()
     cursor = conn.cursor()
     
     cursor.execute('''
@@ -638,6 +465,7 @@ def authenticate_user(username, password):
     user = cursor.fetchone()
     conn.close()
     
+    metrics.LOGINS.inc('success' if user else 'failure')
     if user:
         return {
             'id': user[0],
@@ -653,35 +481,81 @@ def generate_ticket_number():
     """Generate a unique ticket number"""
     return f"TKT-{datetime.now().strftime('%Y%m%d')}-{str(uuid.uuid4())[:8].upper()}"
 
-def calculate_sla_dates(priority_id):
-    """Calculate SLA response and resolution due dates based on priority"""
-    now = datetime.now()
-    
-    # SLA rules (in hours)
-    sla_rules = {
-        1: {'response': 24, 'resolution': 72},  # Low
-        2: {'response': 8, 'resolution': 24},   # Medium  
-        3: {'response': 4, 'resolution': 12},   # High
-        4: {'response': 1, 'resolution': 4}     # Critical
-    }
-    
-    if priority_id in sla_rules:
-        response_hours = sla_rules[priority_id]['response']
-        resolution_hours = sla_rules[priority_id]['resolution']
-        
-        response_due = now + timedelta(hours=response_hours)
-        resolution_due = now + timedelta(hours=resolution_hours)
-        
-        return response_due, resolution_due
-    
-    return None, None
+def calculate_sla_dates(priority_id, category_id=None):
+    """Calculate SLA response and resolution due dates (epoch seconds) from the SLA policies"""
+    return sla.get_sla_policies(DB_PATH).due_dates(priority_id, category_id, timestamps.now())
+
+# Page sizes offered by the ticket list
+TICKET_PAGE_SIZES = [25, 50, 100]
+
+# Number of ranked knowledge base matches shown for a search
+KB_SEARCH_RESULT_LIMIT = 50
+
+# Number of tickets offered by the ticket picker
+TICKET_PICKER_LIMIT = 20
+
+# Number of tickets shown in an agent's queue
+MY_QUEUE_LIMIT = 50
+
+# Seconds a dashboard payload is reused before it is recomputed
+DASHBOARD_CACHE_TTL = int(os.environ.get('TICKETS_DASHBOARD_CACHE_TTL', '15'))
+
+def select_options(df, label_columns, id_column='id', separator=' - '):
+    """Build selectbox options from a DataFrame in one vectorized pass.
+    
+    Returns a LookupTable whose ids are the options in row order and whose
+    name() is an O(1) format_func, instead of filtering the DataFrame once per
+    option while the selectbox renders.
+    """
+    labels = df[label_columns[0]].astype(str)
+    for column in label_columns[1:]:
+        labels = labels + separator + df[column].astype(str)
+    return LookupTable(list(zip(df[id_column].tolist(), labels.tolist())))
+
+def ticket_picker(conn, user, key):
+    """Searchable ticket selectbox that only ever loads a handful of tickets
+    
+    With no search text it offers the tickets the user most recently logged
+    time on, commented on or was assigned. Otherwise it offers the top matches
+    by ticket number prefix, topped up with title keyword matches. Returns the
+    selected ticket id, or None when nothing matches.
+    """
+    search = st.text_input("Find ticket", key=f"{key}_search",
+                           placeholder="Ticket number or title keywords...").strip()
+    
+    if search:
+        low, high = queries.ticket_number_range(search)
+        tickets = pd.read_sql_query(queries.TICKET_PICKER_BY_NUMBER, conn,
+                                    params=(low, high, TICKET_PICKER_LIMIT))
+        title_match = queries.fts_match_expression(search, column='title')
+        if len(tickets) < TICKET_PICKER_LIMIT and title_match:
+            by_title = pd.read_sql_query(queries.TICKET_PICKER_BY_TITLE, conn,
+                                         params=(title_match, TICKET_PICKER_LIMIT))
+            tickets = pd.concat([tickets, by_title]).drop_duplicates('id').head(TICKET_PICKER_LIMIT)
+    else:
+        tickets = pd.read_sql_query(queries.TICKET_PICKER_RECENT, conn,
+                                    params=queries.ticket_picker_recent_params(user['id'], TICKET_PICKER_LIMIT))
+    
+    if len(tickets) == 0:
+        st.caption("No matching tickets" if search else "No recent tickets - search by ticket number or title")
+        return None
+    
+    ticket_options = select_options(tickets, ['ticket_number', 'title'])
+    return st.selectbox("Ticket", 
+                        options=ticket_options.ids, 
+                        format_func=ticket_options.name,
+                        key=f"{key}_ticket")
 
 def get_db_connection():
-    """Get database connection"""
-    return sqlite3.connect('tickets.db')
+    """Get a pooled database connection (close() returns it to the pool)"""
+    return get_connection(DB_PATH)
 
-# Initialize database
-init_database()
+# Bring the schema up to date (a no-op on every rerun after the first)
+migrate(DB_PATH)
+
+# Escalate SLA breaches in the background (started once per process)
+sla_worker.start(DB_PATH)
+metrics_exporter.start(DB_PATH)
 
 # Session state management
 if 'authenticated' not in st.session_state:
@@ -770,6 +644,9 @@ def dashboard_page():
             if st.button("All Tickets", use_container_width=True):
                 st.session_state.page = "tickets"
                 st.rerun()
+            if st.button("My Queue", use_container_width=True):
+                st.session_state.page = "my_queue"
+                st.rerun()
             if st.button("Create Ticket", use_container_width=True):
                 st.session_state.page = "create_ticket"
                 st.rerun()
@@ -784,6 +661,15 @@ def dashboard_page():
                 if st.button("User Management", use_container_width=True):
                     st.session_state.page = "user_management"
                     st.rerun()
+                if st.button("SLA Policies", use_container_width=True):
+                    st.session_state.page = "sla_policies"
+                    st.rerun()
+                if st.button("Diagnostics", use_container_width=True):
+                    st.session_state.page = "diagnostics"
+                    st.rerun()
+                if st.button("Profile This Page", use_container_width=True,
+                             help="Re-render the current page under cProfile; the capture appears on Diagnostics"):
+                    st.session_state.profile_next_render = True
             if st.button("Reports", use_container_width=True):
                 st.session_state.page = "reports"
                 st.rerun()
@@ -819,106 +705,109 @@ def dashboard_page():
                 st.session_state.user = None
                 st.rerun()
     
-    # Route to appropriate page
-    if page == "dashboard":
-        show_dashboard()
-    elif page == "tickets" or page == "my_tickets":
+    # Route to appropriate page, timing the render of whichever view it shows
+    view = page
+    if page in ("tickets", "my_tickets"):
         if 'selected_ticket' in st.session_state:
-            show_ticket_detail(st.session_state.selected_ticket)
+            view = "ticket_detail"
         elif 'edit_ticket' in st.session_state:
-            show_edit_ticket(st.session_state.edit_ticket)
-        else:
-            show_tickets_list()
-    elif page == "create_ticket":
-        show_create_ticket()
-    elif page == "knowledge_base":
-        show_knowledge_base()
+            view = "edit_ticket"
+    capture = user['role'] == 'admin' and st.session_state.pop('profile_next_render', False)
+    with render_profiler.profile(view, user['role'], capture=capture):
+        if page == "dashboard":
+            show_dashboard()
+        elif page == "tickets" or page == "my_tickets":
+            if 'selected_ticket' in st.session_state:
+                show_ticket_detail(st.session_state.selected_ticket)
+            elif 'edit_ticket' in st.session_state:
+                show_edit_ticket(st.session_state.edit_ticket)
+            else:
+                show_tickets_list()
+        elif page == "my_queue" and user['role'] in ['admin', 'it_staff']:
+            show_my_queue()
+        elif page == "create_ticket":
+            show_create_ticket()
+        elif page == "knowledge_base":
+            show_knowledge_base()
 
-    elif page == "time_tracking" and user['role'] in ['admin', 'it_staff']:
-        show_time_tracking()
-    elif page == "user_management" and user['role'] == 'admin':
-        show_user_management()
-    elif page == "reports" and user['role'] in ['admin', 'it_staff']:
-        show_reports()
-    elif page == "profile":
-        show_profile()
+        elif page == "time_tracking" and user['role'] in ['admin', 'it_staff']:
+            show_time_tracking()
+        elif page == "user_management" and user['role'] == 'admin':
+            show_user_management()
+        elif page == "sla_policies" and user['role'] == 'admin':
+            show_sla_policies()
+        elif page == "diagnostics" and user['role'] == 'admin':
+            show_diagnostics()
+        elif page == "reports" and user['role'] in ['admin', 'it_staff']:
+            show_reports()
+        elif page == "profile":
+            show_profile()
+
+def load_dashboard_stats(user):
+    """Return the dashboard payload for a user, cached for a few seconds.
+    
+    Staff all see the same dashboard, so they share one cache entry;
+    requesters get one each.
+    """
+    if user['role'] == 'user':
+        return _dashboard_stats(user['id'])
+    return _dashboard_stats(None)
+
+@st.cache_data(ttl=DASHBOARD_CACHE_TTL, show_spinner=False)
+def _dashboard_stats(requester_id):
+    sql, params = queries.dashboard_query(requester_id)
+    conn = get_db_connection()
+    try:
+        status_counts, sla_violations, recent = conn.execute(sql, params).fetchone()
+    finally:
+        conn.close()
+    
+    status_data = pd.DataFrame(json.loads(status_counts), columns=['name', 'count'])
+    return {
+        'total': int(status_data['count'].sum()),
+        'status_counts': dict(zip(status_data['name'], status_data['count'])),
+        'status_data': status_data,
+        'sla_violations': json.loads(sla_violations) if sla_violations else [],
+        'recent': json.loads(recent),
+    }
 
 def show_dashboard():
     """Show dashboard with statistics"""
     user = st.session_state.user
     
-    # Get statistics
-    conn = get_db_connection()
-    
-    # Total tickets
-    if user['role'] == 'user':
-        total_tickets = pd.read_sql_query(
-            "SELECT COUNT(*) as count FROM tickets WHERE requester_id = ?", 
-            conn, params=(user['id'],)
-        ).iloc[0]['count']
-    else:
-        total_tickets = pd.read_sql_query("SELECT COUNT(*) as count FROM tickets", conn).iloc[0]['count']
+    if 'dashboard_message' in st.session_state:
+        st.success(st.session_state.pop('dashboard_message'))
     
-    # Status breakdown
-    if user['role'] == 'user':
-        status_data = pd.read_sql_query('''
-            SELECT s.name, COUNT(t.id) as count
-            FROM statuses s
-            LEFT JOIN tickets t ON s.id = t.status_id AND t.requester_id = ?
-            GROUP BY s.id, s.name
-            ORDER BY s.id
-        ''', conn, params=(user['id'],))
-    else:
-        status_data = pd.read_sql_query('''
-            SELECT s.name, COUNT(t.id) as count
-            FROM statuses s
-            LEFT JOIN tickets t ON s.id = t.status_id
-            GROUP BY s.id, s.name
-            ORDER BY s.id
-        ''', conn)
+    # Get statistics
+    stats = load_dashboard_stats(user)
+    status_counts = stats['status_counts']
+    status_data = stats['status_data']
     
     # Display statistics
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.metric("Total Tickets", total_tickets)
+        st.metric("Total Tickets", stats['total'])
     
     with col2:
-        open_data = status_data[status_data['name'] == 'Open']
-        open_tickets = open_data['count'].iloc[0] if len(open_data) > 0 else 0
-        st.metric("Open Tickets", open_tickets)
+        st.metric("Open Tickets", status_counts.get('Open', 0))
     
     with col3:
-        in_progress_data = status_data[status_data['name'] == 'In Progress']
-        in_progress = in_progress_data['count'].iloc[0] if len(in_progress_data) > 0 else 0
-        st.metric("In Progress", in_progress)
+        st.metric("In Progress", status_counts.get('In Progress', 0))
     
     with col4:
-        resolved_data = status_data[status_data['name'] == 'Resolved']
-        resolved = resolved_data['count'].iloc[0] if len(resolved_data) > 0 else 0
-        st.metric("Resolved", resolved)
+        st.metric("Resolved", status_counts.get('Resolved', 0))
     
     # SLA Alerts
     if user['role'] in ['admin', 'it_staff']:
         st.subheader("SLA Alerts")
         
         # Get tickets with SLA violations
-        sla_query = '''
-            SELECT t.ticket_number, t.title, t.sla_response_due, t.sla_resolution_due, 
-                   t.first_response_at, s.name as status, p.name as priority
-            FROM tickets t
-            JOIN statuses s ON t.status_id = s.id
-            JOIN priorities p ON t.priority_id = p.id
-            WHERE (t.sla_response_due < datetime('now') AND t.first_response_at IS NULL)
-               OR (t.sla_resolution_due < datetime('now') AND s.name NOT IN ('Resolved', 'Closed'))
-            ORDER BY t.sla_response_due ASC, t.sla_resolution_due ASC
-        '''
-        
-        sla_violations = pd.read_sql_query(sla_query, conn)
+        sla_violations = stats['sla_violations']
         
         if len(sla_violations) > 0:
             st.warning(f"⚠️ {len(sla_violations)} tickets with SLA violations!")
-            for _, violation in sla_violations.iterrows():
+            for violation in sla_violations:
                 st.write(f"**{violation['ticket_number']}** - {violation['title']} ({violation['priority']})")
         else:
             st.success("✅ No SLA violations")
@@ -939,34 +828,15 @@ def show_dashboard():
     
     with col2:
         st.subheader("Recent Activity")
-        conn = get_db_connection()
-        if user['role'] == 'user':
-            recent_tickets = pd.read_sql_query('''
-                SELECT t.ticket_number, t.title, s.name as status, t.created_at
-                FROM tickets t
-                JOIN statuses s ON t.status_id = s.id
-                WHERE t.requester_id = ?
-                ORDER BY t.created_at DESC
-                LIMIT 5
-            ''', conn, params=(user['id'],))
-        else:
-            recent_tickets = pd.read_sql_query('''
-                SELECT t.ticket_number, t.title, s.name as status, t.created_at
-                FROM tickets t
-                JOIN statuses s ON t.status_id = s.id
-                ORDER BY t.created_at DESC
-                LIMIT 5
-            ''', conn)
+        recent_tickets = stats['recent']
         
         if len(recent_tickets) > 0:
-            for _, ticket in recent_tickets.iterrows():
+            for ticket in recent_tickets:
                 st.write(f"**{ticket['ticket_number']}** - {ticket['title']}")
-                st.caption(f"Status: {ticket['status']} | Created: {ticket['created_at']}")
+                st.caption(f"Status: {ticket['status']} | Created: {timestamps.format_timestamp(ticket['created_at'])}")
                 st.markdown("---")
         else:
             st.info("No recent tickets")
-    
-    conn.close()
 
 def show_tickets_list():
     """Show list of tickets"""
@@ -980,17 +850,9 @@ def show_tickets_list():
     # Get count of completed tickets for current user
     conn_temp = get_db_connection()
     if user['role'] == 'user':
-        completed_count = pd.read_sql_query("""
-            SELECT COUNT(*) as count FROM tickets t 
-            JOIN statuses s ON t.status_id = s.id 
-            WHERE s.name IN ('Resolved', 'Closed') AND t.requester_id = ?
-        """, conn_temp, params=(user['id'],)).iloc[0]['count']
+        completed_count = pd.read_sql_query(queries.COMPLETED_COUNT_FOR_REQUESTER, conn_temp, params=(user['id'],)).iloc[0]['count']
     else:
-        completed_count = pd.read_sql_query("""
-            SELECT COUNT(*) as count FROM tickets t 
-            JOIN statuses s ON t.status_id = s.id 
-            WHERE s.name IN ('Resolved', 'Closed')
-        """, conn_temp).iloc[0]['count']
+        completed_count = pd.read_sql_query(queries.COMPLETED_COUNT, conn_temp).iloc[0]['count']
     conn_temp.close()
     
     col_toggle, col_info = st.columns([1, 3])
@@ -1001,75 +863,63 @@ def show_tickets_list():
             st.caption(f"({completed_count} completed tickets hidden)")
     st.markdown("---")
     
+    # Full-text search over titles, descriptions and comments
+    search_term = st.text_input("Search tickets", placeholder="Search titles, descriptions and comments...")
+    
     # Filters
     col1, col2, col3 = st.columns(3)
     
     conn = get_db_connection()
     
+    ref = get_reference_data()
+    
     with col1:
-        statuses = pd.read_sql_query("SELECT id, name FROM statuses ORDER BY id", conn)
-        status_filter = st.selectbox("Filter by Status", ["All"] + list(statuses['name']))
+        status_filter = st.selectbox("Filter by Status", ["All"] + ref.statuses.names)
     
     with col2:
-        priorities = pd.read_sql_query("SELECT id, name FROM priorities ORDER BY level", conn)
-        priority_filter = st.selectbox("Filter by Priority", ["All"] + list(priorities['name']))
+        priority_filter = st.selectbox("Filter by Priority", ["All"] + ref.priorities.names)
     
     with col3:
-        categories = pd.read_sql_query("SELECT id, name FROM categories ORDER BY name", conn)
-        category_filter = st.selectbox("Filter by Category", ["All"] + list(categories['name']))
-    
-    # Build query
-    if user['role'] == 'user':
-        base_query = '''
-            SELECT t.id, t.ticket_number, t.title, t.description, 
-                   s.name as status, p.name as priority, c.name as category,
-                   t.created_at, u.full_name as requester
-            FROM tickets t
-            JOIN statuses s ON t.status_id = s.id
-            JOIN priorities p ON t.priority_id = p.id
-            JOIN categories c ON t.category_id = c.id
-            JOIN users u ON t.requester_id = u.id
-            WHERE t.requester_id = ?
-        '''
-        params = [user['id']]
-    else:
-        base_query = '''
-            SELECT t.id, t.ticket_number, t.title, t.description, 
-                   s.name as status, p.name as priority, c.name as category,
-                   t.created_at, u.full_name as requester, u2.full_name as assignee
-            FROM tickets t
-            JOIN statuses s ON t.status_id = s.id
-            JOIN priorities p ON t.priority_id = p.id
-            JOIN categories c ON t.category_id = c.id
-            JOIN users u ON t.requester_id = u.id
-            LEFT JOIN users u2 ON t.assignee_id = u2.id
-            WHERE 1=1
-        '''
-        params = []
-    
-    # Apply filters
-    if status_filter != "All":
-        status_id = statuses[statuses['name'] == status_filter]['id'].iloc[0]
-        base_query += " AND t.status_id = ?"
-        params.append(status_id)
-    elif not show_completed:
-        # Hide completed tickets by default for all users
-        base_query += " AND s.name NOT IN ('Resolved', 'Closed')"
-    
-    if priority_filter != "All":
-        priority_id = priorities[priorities['name'] == priority_filter]['id'].iloc[0]
-        base_query += " AND t.priority_id = ?"
-        params.append(priority_id)
-    
-    if category_filter != "All":
-        category_id = categories[categories['name'] == category_filter]['id'].iloc[0]
-        base_query += " AND t.category_id = ?"
-        params.append(category_id)
-    
-    base_query += " ORDER BY t.created_at DESC"
+        category_filter = st.selectbox("Filter by Category", ["All"] + ref.categories.names)
+    
+    # Resolve filter names to ids
+    status_id = ref.statuses.id(status_filter)
+    priority_id = ref.priorities.id(priority_filter)
+    category_id = ref.categories.id(category_filter)
+    
+    page_size = st.selectbox("Tickets per page", TICKET_PAGE_SIZES)
+    
+    # Start again from the first page whenever the filters change. The list
+    # keeps the (created_at, id) key each visited page started after, so
+    # moving between pages never re-reads earlier pages.
+    list_filters = (search_term, status_id, priority_id, category_id, show_completed, page_size)
+    if st.session_state.get('ticket_list_filters') != list_filters:
+        st.session_state.ticket_list_filters = list_filters
+        st.session_state.ticket_list_cursors = [None]
+    page_cursors = st.session_state.ticket_list_cursors
+    
+    # Build query (one extra row tells us whether a next page exists).
+    # Search results are ranked by relevance, the plain list by age.
+    list_args = dict(
+        requester_id=user['id'] if user['role'] == 'user' else None,
+        status_id=status_id,
+        priority_id=priority_id,
+        category_id=category_id,
+        show_completed=show_completed,
+        after=page_cursors[-1],
+        limit=page_size + 1
+    )
+    base_query, params = queries.ticket_search_query(
+        search_term, include_internal=user['role'] in ['admin', 'it_staff'], **list_args
+    )
+    is_search = base_query is not None
+    if not is_search:
+        base_query, params = queries.ticket_list_query(**list_args)
     
     # Execute query
     tickets_df = pd.read_sql_query(base_query, conn, params=params)
+    has_next_page = len(tickets_df) > page_size
+    tickets_df = tickets_df.iloc[:page_size]
     
     # Bulk operations (admin/IT staff only)
     if user['role'] in ['admin', 'it_staff'] and len(tickets_df) > 0:
@@ -1080,59 +930,88 @@ def show_tickets_list():
         
         with col1:
             # Bulk status update
-            statuses = pd.read_sql_query("SELECT id, name FROM statuses ORDER BY id", conn)
             bulk_status = st.selectbox("Bulk Update Status", 
-                                     options=[None] + list(statuses['id']), 
-                                     format_func=lambda x: "Select status..." if x is None else statuses[statuses['id']==x]['name'].iloc[0])
+                                     options=[None] + ref.statuses.ids, 
+                                     format_func=lambda x: ref.statuses.name(x, "Select status..."))
         
         with col2:
             # Bulk priority update
-            priorities = pd.read_sql_query("SELECT id, name FROM priorities ORDER BY level", conn)
             bulk_priority = st.selectbox("Bulk Update Priority", 
-                                       options=[None] + list(priorities['id']), 
-                                       format_func=lambda x: "Select priority..." if x is None else priorities[priorities['id']==x]['name'].iloc[0])
+                                       options=[None] + ref.priorities.ids, 
+                                       format_func=lambda x: ref.priorities.name(x, "Select priority..."))
         
         with col3:
             # Bulk assignee update
-            users = pd.read_sql_query("SELECT id, full_name FROM users WHERE role IN ('admin', 'it_staff') ORDER BY full_name", conn)
             bulk_assignee = st.selectbox("Bulk Assign", 
-                                       options=[None] + list(users['id']), 
-                                       format_func=lambda x: "Select assignee..." if x is None else users[users['id']==x]['full_name'].iloc[0])
-        
-        # Checkboxes for ticket selection
-        st.write("Select tickets for bulk operations:")
-        selected_tickets = []
-        
-        for _, ticket in tickets_df.iterrows():
-            if st.checkbox(f"{ticket['ticket_number']} - {ticket['title']}", key=f"bulk_{ticket['id']}"):
-                selected_tickets.append(ticket['id'])
-        
-        if selected_tickets and (bulk_status or bulk_priority or bulk_assignee):
-            if st.button("Apply Bulk Changes"):
-                cursor = conn.cursor()
-                updates = []
-                params = []
-                
-                if bulk_status:
-                    updates.append("status_id = ?")
-                    params.append(bulk_status)
-                
-                if bulk_priority:
-                    updates.append("priority_id = ?")
-                    params.append(bulk_priority)
-                
-                if bulk_assignee:
-                    updates.append("assignee_id = ?")
-                    params.append(bulk_assignee)
-                
-                if updates:
-                    updates.append("updated_at = CURRENT_TIMESTAMP")
-                    query = f"UPDATE tickets SET {', '.join(updates)} WHERE id IN ({','.join(['?'] * len(selected_tickets))})"
-                    params.extend(selected_tickets)
+                                       options=[None] + ref.staff.ids, 
+                                       format_func=lambda x: ref.staff.name(x, "Select assignee..."))
+        
+        # Either the tickets ticked below or everything the filters match,
+        # across all pages
+        apply_to = st.radio("Apply to", ["Selected tickets", "All tickets matching the current filters"],
+                            horizontal=True)
+        
+        if apply_to == "Selected tickets":
+            # Checkboxes for ticket selection
+            st.write("Select tickets for bulk operations:")
+            selected_tickets = []
+            
+            for _, ticket in tickets_df.iterrows():
+                if st.checkbox(f"{ticket['ticket_number']} - {ticket['title']}", key=f"bulk_{ticket['id']}"):
+                    selected_tickets.append(ticket['id'])
+            
+            if selected_tickets and (bulk_status or bulk_priority or bulk_assignee):
+                if st.button("Apply Bulk Changes"):
+                    updates = []
+                    params = []
+                    
+                    if bulk_status:
+                        updates.append("status_id = ?")
+                        params.append(bulk_status)
+                        if ref.statuses.name(bulk_status) in queries.COMPLETED_STATUSES:
+                            updates.append("resolved_at = COALESCE(resolved_at, ?)")
+                            params.append(timestamps.now())
+                    
+                    if bulk_priority:
+                        updates.append("priority_id = ?")
+                        params.append(bulk_priority)
+                    
+                    if bulk_assignee:
+                        updates.append("assignee_id = ?")
+                        params.append(bulk_assignee)
                     
-                    cursor.execute(query, params)
-                    conn.commit()
-                    st.success(f"Updated {len(selected_tickets)} tickets!")
+                    if updates:
+                        updates.append("updated_at = ?")
+                        params.append(timestamps.now())
+                        query = f"UPDATE tickets SET {', '.join(updates)} WHERE id IN ({','.join(['?'] * len(selected_tickets))})"
+                        params.extend(selected_tickets)
+                        
+                        write_queue.write([(query, params)], DB_PATH)
+                        st.success(f"Updated {len(selected_tickets)} tickets!")
+                        st.rerun()
+        else:
+            bulk_match = dict(
+                search_term=search_term,
+                include_internal=True,
+                status_id=status_id,
+                priority_id=priority_id,
+                category_id=category_id,
+                show_completed=show_completed
+            )
+            bulk_changes = {column: value for column, value in (('status_id', bulk_status),
+                                                                 ('priority_id', bulk_priority),
+                                                                 ('assignee_id', bulk_assignee)) if value}
+            match_count = bulk_update.count_matching(bulk_match, DB_PATH)
+            st.write(f"**{match_count}** tickets match the current filters")
+            
+            if match_count and bulk_changes:
+                if st.button(f"Apply Bulk Changes to {match_count} Tickets"):
+                    progress_bar = st.progress(0.0, text="Updating tickets...")
+                    def report_progress(done, total):
+                        progress_bar.progress(done / total, text=f"Updated {done} of {total} tickets")
+                    updated = bulk_update.update_matching(bulk_changes, bulk_match, DB_PATH, progress=report_progress)
+                    _dashboard_stats.clear()
+                    st.success(f"Updated {updated} tickets!")
                     st.rerun()
     
     # Display tickets
@@ -1147,15 +1026,8 @@ def show_tickets_list():
                 'Resolved': 'status-resolved',
                 'Closed': 'status-closed'
             }
-            priority_mapping = {
-                'Low': 'priority-low',
-                'Medium': 'priority-medium',
-                'High': 'priority-high',
-                'Critical': 'priority-critical'
-            }
             
             status_class = status_mapping.get(ticket['status'], 'status-open')
-            priority_class = priority_mapping.get(ticket['priority'], 'priority-low')
             
             # Create expander with status indicator in the title
             status_colors = {
@@ -1200,6 +1072,22 @@ def show_tickets_list():
                     st.session_state.delete_ticket_id = ticket['id']
                     st.rerun()
     
+    # Page navigation
+    if len(page_cursors) > 1 or has_next_page:
+        col_prev, col_page, col_next = st.columns([1, 2, 1])
+        with col_prev:
+            if len(page_cursors) > 1 and st.button("← Previous", key="tickets_prev_page"):
+                page_cursors.pop()
+                st.rerun()
+        with col_page:
+            st.caption(f"Page {len(page_cursors)}")
+        with col_next:
+            if has_next_page and st.button("Next →", key="tickets_next_page"):
+                last_ticket = tickets_df.iloc[-1]
+                sort_key = float(last_ticket['rank']) if is_search else int(last_ticket['created_at'])
+                page_cursors.append((sort_key, int(last_ticket['id'])))
+                st.rerun()
+    
     # Handle ticket deletion
     if 'delete_ticket_id' in st.session_state:
         st.markdown("---")
@@ -1222,11 +1110,7 @@ def show_tickets_list():
         with col1:
             if st.button("Yes, Delete Ticket", type="primary"):
                 try:
-                    conn = get_db_connection()
-                    cursor = conn.cursor()
-                    cursor.execute('DELETE FROM tickets WHERE id = ?', (st.session_state.delete_ticket_id,))
-                    conn.commit()
-                    conn.close()
+                    write_queue.write([('DELETE FROM tickets WHERE id = ?', (st.session_state.delete_ticket_id,))], DB_PATH)
                     st.success("Ticket deleted successfully!")
                     del st.session_state.delete_ticket_id
                     st.rerun()
@@ -1242,6 +1126,65 @@ def show_tickets_list():
     elif len(tickets_df) == 0:
         st.info("No tickets found matching the criteria")
 
+def show_my_queue():
+    """Show the agent's open tickets, most urgent SLA deadline first"""
+    user = st.session_state.user
+    
+    st.subheader("My Queue")
+    
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        if st.button("Take Next Ticket", type="primary"):
+            claimed = work_queue.claim_next(user['id'], DB_PATH)
+            if claimed is None:
+                st.session_state.queue_message = "No unassigned tickets are waiting."
+            else:
+                st.session_state.queue_message = f"Assigned {claimed[1]} to you."
+            st.rerun()
+    with col2:
+        st.caption("Claims the unassigned open ticket closest to breaching its SLA")
+    
+    # Spread the whole unassigned backlog by skill and load (admin only)
+    if user['role'] == 'admin':
+        if st.button("Auto-assign Unassigned Tickets"):
+            progress_bar = st.progress(0.0, text="Assigning tickets...")
+            def report_progress(done, total):
+                progress_bar.progress(done / total, text=f"Assigned {done} of {total} tickets")
+            assigned = assignment.assign_backlog(DB_PATH, progress=report_progress)
+            st.session_state.queue_message = f"Auto-assigned {assigned} tickets."
+            _dashboard_stats.clear()
+            st.rerun()
+    
+    if 'queue_message' in st.session_state:
+        st.info(st.session_state.pop('queue_message'))
+    
+    conn = get_db_connection()
+    queue_sql, params = queries.queue_query(user['id'], MY_QUEUE_LIMIT)
+    queue_df = pd.read_sql_query(queue_sql, conn, params=params)
+    conn.close()
+    
+    if len(queue_df) == 0:
+        st.info("No open tickets are assigned to you")
+        return
+    
+    now = timestamps.now()
+    for _, ticket in queue_df.iterrows():
+        col1, col2, col3 = st.columns([4, 2, 1])
+        with col1:
+            st.write(f"**{ticket['ticket_number']}** - {ticket['title']}")
+            st.caption(f"{ticket['priority']} priority · {ticket['status']}")
+        with col2:
+            due_text = work_queue.time_to_breach(ticket['next_due'], now)
+            if due_text.startswith('overdue'):
+                st.error(due_text)
+            else:
+                st.write(due_text)
+        with col3:
+            if st.button("View", key=f"queue_view_{ticket['id']}"):
+                st.session_state.page = "tickets"
+                st.session_state.selected_ticket = int(ticket['id'])
+                st.rerun()
+
 def show_ticket_detail(ticket_id):
     """Show detailed view of a specific ticket"""
     user = st.session_state.user
@@ -1255,22 +1198,7 @@ def show_ticket_detail(ticket_id):
     conn = get_db_connection()
     
     # Get ticket details
-    ticket_query = '''
-        SELECT t.id, t.ticket_number, t.title, t.description, t.created_at, t.updated_at, t.resolved_at,
-               t.sla_response_due, t.sla_resolution_due, t.first_response_at, t.escalated_at,
-               s.name as status, p.name as priority, c.name as category,
-               u.full_name as requester, u.email as requester_email,
-               u2.full_name as assignee, u2.email as assignee_email
-        FROM tickets t
-        JOIN statuses s ON t.status_id = s.id
-        JOIN priorities p ON t.priority_id = p.id
-        JOIN categories c ON t.category_id = c.id
-        JOIN users u ON t.requester_id = u.id
-        LEFT JOIN users u2 ON t.assignee_id = u2.id
-        WHERE t.id = ?
-    '''
-    
-    ticket_df = pd.read_sql_query(ticket_query, conn, params=(ticket_id,))
+    ticket_df = pd.read_sql_query(queries.TICKET_DETAIL, conn, params=(ticket_id,))
     
     if len(ticket_df) == 0:
         st.error("Ticket not found")
@@ -1305,44 +1233,28 @@ def show_ticket_detail(ticket_id):
     
     with col2:
         st.subheader("Timestamps")
-        st.write(f"**Created:** {ticket['created_at']}")
-        st.write(f"**Last Updated:** {ticket['updated_at']}")
-        if ticket['resolved_at']:
-            st.write(f"**Resolved:** {ticket['resolved_at']}")
+        st.write(f"**Created:** {timestamps.format_timestamp(ticket['created_at'])}")
+        st.write(f"**Last Updated:** {timestamps.format_timestamp(ticket['updated_at'])}")
+        if not pd.isna(ticket['resolved_at']):
+            st.write(f"**Resolved:** {timestamps.format_timestamp(ticket['resolved_at'])}")
         
         # SLA Information
-        if ticket['sla_response_due']:
-            st.write(f"**SLA Response Due:** {ticket['sla_response_due']}")
-        if ticket['sla_resolution_due']:
-            st.write(f"**SLA Resolution Due:** {ticket['sla_resolution_due']}")
+        if not pd.isna(ticket['sla_response_due']):
+            st.write(f"**SLA Response Due:** {timestamps.format_timestamp(ticket['sla_response_due'])}")
+        if not pd.isna(ticket['sla_resolution_due']):
+            st.write(f"**SLA Resolution Due:** {timestamps.format_timestamp(ticket['sla_resolution_due'])}")
+        if not pd.isna(ticket['escalated_at']):
+            st.write(f"**Escalated:** {timestamps.format_timestamp(ticket['escalated_at'])}")
         
         # Check SLA status
-        now = datetime.now()
-        if ticket['sla_response_due'] and not ticket['first_response_at']:
-            try:
-                # Handle datetime with or without microseconds
-                response_due_str = str(ticket['sla_response_due'])
-                if '.' in response_due_str:
-                    response_due = datetime.strptime(response_due_str, '%Y-%m-%d %H:%M:%S.%f')
-                else:
-                    response_due = datetime.strptime(response_due_str, '%Y-%m-%d %H:%M:%S')
-                if now > response_due:
-                    st.error("⚠️ SLA Response Time Exceeded!")
-            except (ValueError, TypeError):
-                pass  # Skip if datetime parsing fails
+        now = timestamps.now()
+        if not pd.isna(ticket['sla_response_due']) and pd.isna(ticket['first_response_at']):
+            if now > ticket['sla_response_due']:
+                st.error("⚠️ SLA Response Time Exceeded!")
         
-        if ticket['sla_resolution_due'] and ticket['status'] not in ['Resolved', 'Closed']:
-            try:
-                # Handle datetime with or without microseconds
-                resolution_due_str = str(ticket['sla_resolution_due'])
-                if '.' in resolution_due_str:
-                    resolution_due = datetime.strptime(resolution_due_str, '%Y-%m-%d %H:%M:%S.%f')
-                else:
-                    resolution_due = datetime.strptime(resolution_due_str, '%Y-%m-%d %H:%M:%S')
-                if now > resolution_due:
-                    st.error("⚠️ SLA Resolution Time Exceeded!")
-            except (ValueError, TypeError):
-                pass  # Skip if datetime parsing fails
+        if not pd.isna(ticket['sla_resolution_due']) and ticket['status'] not in ['Resolved', 'Closed']:
+            if now > ticket['sla_resolution_due']:
+                st.error("⚠️ SLA Resolution Time Exceeded!")
     
     st.subheader("Description")
     st.write(ticket['description'])
@@ -1351,22 +1263,14 @@ def show_ticket_detail(ticket_id):
     st.subheader("Time Tracking")
     
     # Get time entries for this ticket
-    time_entries_query = '''
-        SELECT te.description, te.time_spent_minutes, te.created_at, u.full_name as user_name
-        FROM time_entries te
-        JOIN users u ON te.user_id = u.id
-        WHERE te.ticket_id = ?
-        ORDER BY te.created_at DESC
-    '''
-    
-    time_entries_df = pd.read_sql_query(time_entries_query, conn, params=(ticket_id,))
+    time_entries_df = pd.read_sql_query(queries.TICKET_TIME_ENTRIES, conn, params=(ticket_id,))
     
     if len(time_entries_df) > 0:
         total_time = time_entries_df['time_spent_minutes'].sum()
         st.metric("Total Time Spent", f"{total_time} minutes ({total_time/60:.1f} hours)")
         
         for _, entry in time_entries_df.iterrows():
-            st.write(f"**{entry['user_name']}** - {entry['time_spent_minutes']} minutes ({entry['created_at']})")
+            st.write(f"**{entry['user_name']}** - {entry['time_spent_minutes']} minutes ({timestamps.format_timestamp(entry['created_at'])})")
             if entry['description']:
                 st.write(f"*{entry['description']}*")
             st.markdown("---")
@@ -1381,13 +1285,11 @@ def show_ticket_detail(ticket_id):
             
             if st.form_submit_button("Add Time Entry"):
                 if time_spent:
-                    cursor = conn.cursor()
-                    cursor.execute('''
+                    write_queue.write([('''
                         INSERT INTO time_entries (ticket_id, user_id, description, time_spent_minutes)
                         VALUES (?, ?, ?, ?)
-                    ''', (ticket_id, user['id'], description, time_spent))
+                    ''', (ticket_id, user['id'], description, time_spent))], DB_PATH)
                     
-                    conn.commit()
                     st.success("Time entry added successfully!")
                     st.rerun()
                 else:
@@ -1397,15 +1299,7 @@ def show_ticket_detail(ticket_id):
     st.subheader("Comments")
     
     # Get comments
-    comments_query = '''
-        SELECT c.content, c.is_internal, c.created_at, u.full_name as author
-        FROM comments c
-        JOIN users u ON c.user_id = u.id
-        WHERE c.ticket_id = ?
-        ORDER BY c.created_at ASC
-    '''
-    
-    comments_df = pd.read_sql_query(comments_query, conn, params=(ticket_id,))
+    comments_df = pd.read_sql_query(queries.TICKET_COMMENTS, conn, params=(ticket_id,))
     
     if len(comments_df) > 0:
         for _, comment in comments_df.iterrows():
@@ -1413,7 +1307,7 @@ def show_ticket_detail(ticket_id):
                 if comment['is_internal'] and user['role'] not in ['admin', 'it_staff']:
                     continue  # Skip internal comments for regular users
                 
-                st.write(f"**{comment['author']}** ({comment['created_at']})")
+                st.write(f"**{comment['author']}** ({timestamps.format_timestamp(comment['created_at'])})")
                 if comment['is_internal']:
                     st.info(f"[Internal] {comment['content']}")
                 else:
@@ -1432,25 +1326,26 @@ def show_ticket_detail(ticket_id):
         
         if st.form_submit_button("Add Comment"):
             if comment_content:
-                cursor = conn.cursor()
-                cursor.execute('''
+                statements = [('''
                     INSERT INTO comments (ticket_id, user_id, content, is_internal)
                     VALUES (?, ?, ?, ?)
-                ''', (ticket_id, user['id'], comment_content, is_internal))
+                ''', (ticket_id, user['id'], comment_content, is_internal))]
                 
                 # Update ticket's updated_at timestamp
-                cursor.execute('''
-                    UPDATE tickets SET updated_at = CURRENT_TIMESTAMP WHERE id = ?
-                ''', (ticket_id,))
+                statements.append(('''
+                    UPDATE tickets SET updated_at = ? WHERE id = ?
+                ''', (timestamps.now(), ticket_id)))
                 
                 # Set first_response_at if this is the first response from IT staff
                 if user['role'] in ['admin', 'it_staff'] and not is_internal:
-                    cursor.execute('''
-                        UPDATE tickets SET first_response_at = CURRENT_TIMESTAMP 
+                    statements.append(('''
+                        UPDATE tickets SET first_response_at = ? 
                         WHERE id = ? AND first_response_at IS NULL
-                    ''', (ticket_id,))
+                    ''', (timestamps.now(), ticket_id)))
                 
-                conn.commit()
+                # The comment and its ticket updates commit together
+                write_queue.write(statements, DB_PATH)
+                metrics.COMMENTS_POSTED.inc('internal' if is_internal else 'public')
                 st.success("Comment added successfully!")
                 st.rerun()
             else:
@@ -1459,33 +1354,32 @@ def show_ticket_detail(ticket_id):
     # Admin/IT Staff actions
     if user['role'] in ['admin', 'it_staff']:
         st.subheader("Ticket Actions")
+        ref = get_reference_data()
         
         col1, col2, col3 = st.columns(3)
         
         with col1:
             # Status update
             current_status = ticket['status']
-            statuses = pd.read_sql_query("SELECT id, name FROM statuses ORDER BY id", conn)
             new_status = st.selectbox("Update Status", 
-                                    options=statuses['id'], 
-                                    index=int(statuses[statuses['name'] == current_status].index[0]),
-                                    format_func=lambda x: statuses[statuses['id']==x]['name'].iloc[0])
+                                    options=ref.statuses.ids, 
+                                    index=ref.statuses.index(ref.statuses.id(current_status)),
+                                    format_func=ref.statuses.name)
             
             if st.button("Update Status"):
-                cursor = conn.cursor()
-                cursor.execute('''
-                    UPDATE tickets SET status_id = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?
-                ''', (new_status, ticket_id))
+                statements = [('''
+                    UPDATE tickets SET status_id = ?, updated_at = ? WHERE id = ?
+                ''', (new_status, timestamps.now(), ticket_id))]
                 
                 # Check if status is completed (Resolved or Closed)
-                new_status_name = statuses[statuses['id'] == new_status]['name'].iloc[0]
+                new_status_name = ref.statuses.name(new_status)
                 if new_status_name in ['Resolved', 'Closed']:
                     # Set resolved_at timestamp for completed tickets
-                    cursor.execute('''
-                        UPDATE tickets SET resolved_at = CURRENT_TIMESTAMP WHERE id = ?
-                    ''', (ticket_id,))
+                    statements.append(('''
+                        UPDATE tickets SET resolved_at = ? WHERE id = ?
+                    ''', (timestamps.now(), ticket_id)))
                 
-                conn.commit()
+                write_queue.write(statements, DB_PATH)
                 st.success("Status updated!")
                 
                 # If status is completed, go back to ticket list
@@ -1498,45 +1392,38 @@ def show_ticket_detail(ticket_id):
         
         with col2:
             # Assign ticket
-            users = pd.read_sql_query("SELECT id, full_name FROM users WHERE role IN ('admin', 'it_staff') ORDER BY full_name", conn)
-            current_assignee_id = pd.read_sql_query("SELECT assignee_id FROM tickets WHERE id = ?", conn, params=(ticket_id,)).iloc[0]['assignee_id']
+            current_assignee_id = ticket['assignee_id']
             
-            assignee_options = [None] + list(users['id'])
-            assignee_labels = ["Unassigned"] + list(users['full_name'])
+            assignee_options = [None] + ref.staff.ids
             
             current_index = 0
-            if current_assignee_id:
-                current_index = int(assignee_options.index(current_assignee_id))
+            if current_assignee_id in ref.staff:
+                current_index = assignee_options.index(current_assignee_id)
             
             new_assignee = st.selectbox("Assign to", 
                                       options=assignee_options,
                                       index=current_index,
-                                      format_func=lambda x: assignee_labels[assignee_options.index(x)] if x is not None else "Unassigned")
+                                      format_func=lambda x: ref.staff.name(x, "Unassigned"))
             
             if st.button("Update Assignment"):
-                cursor = conn.cursor()
-                cursor.execute('''
-                    UPDATE tickets SET assignee_id = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?
-                ''', (new_assignee, ticket_id))
-                conn.commit()
+                write_queue.write([('''
+                    UPDATE tickets SET assignee_id = ?, updated_at = ? WHERE id = ?
+                ''', (new_assignee, timestamps.now(), ticket_id))], DB_PATH)
                 st.success("Assignment updated!")
                 st.rerun()
         
         with col3:
             # Priority update
             current_priority = ticket['priority']
-            priorities = pd.read_sql_query("SELECT id, name FROM priorities ORDER BY level", conn)
             new_priority = st.selectbox("Update Priority", 
-                                      options=priorities['id'], 
-                                      index=int(priorities[priorities['name'] == current_priority].index[0]),
-                                      format_func=lambda x: priorities[priorities['id']==x]['name'].iloc[0])
+                                      options=ref.priorities.ids, 
+                                      index=ref.priorities.index(ref.priorities.id(current_priority)),
+                                      format_func=ref.priorities.name)
             
             if st.button("Update Priority"):
-                cursor = conn.cursor()
-                cursor.execute('''
-                    UPDATE tickets SET priority_id = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?
-                ''', (new_priority, ticket_id))
-                conn.commit()
+                write_queue.write([('''
+                    UPDATE tickets SET priority_id = ?, updated_at = ? WHERE id = ?
+                ''', (new_priority, timestamps.now(), ticket_id))], DB_PATH)
                 st.success("Priority updated!")
                 st.rerun()
         
@@ -1588,43 +1475,40 @@ def show_edit_ticket(ticket_id):
         title = st.text_input("Title", value=ticket['title'])
         description = st.text_area("Description", value=ticket['description'], height=150)
         
-        # Get categories and priorities
-        categories = pd.read_sql_query("SELECT id, name FROM categories ORDER BY name", conn)
-        priorities = pd.read_sql_query("SELECT id, name FROM priorities ORDER BY level", conn)
-        statuses = pd.read_sql_query("SELECT id, name FROM statuses ORDER BY id", conn)
+        # Get categories, priorities and statuses
+        ref = get_reference_data()
         
         # Current values
-        current_category = categories[categories['name'] == ticket['category']]['id'].iloc[0]
-        current_priority = priorities[priorities['name'] == ticket['priority']]['id'].iloc[0]
-        current_status = statuses[statuses['name'] == ticket['status']]['id'].iloc[0]
+        current_category = ref.categories.id(ticket['category'])
+        current_priority = ref.priorities.id(ticket['priority'])
+        current_status = ref.statuses.id(ticket['status'])
         
         col1, col2 = st.columns(2)
         
         with col1:
             category_id = st.selectbox("Category", 
-                                     options=list(categories['id']), 
-                                     index=list(categories['id']).index(current_category),
-                                     format_func=lambda x: categories[categories['id']==x]['name'].iloc[0])
+                                     options=ref.categories.ids, 
+                                     index=ref.categories.index(current_category),
+                                     format_func=ref.categories.name)
             
             priority_id = st.selectbox("Priority", 
-                                     options=list(priorities['id']), 
-                                     index=list(priorities['id']).index(current_priority),
-                                     format_func=lambda x: priorities[priorities['id']==x]['name'].iloc[0])
+                                     options=ref.priorities.ids, 
+                                     index=ref.priorities.index(current_priority),
+                                     format_func=ref.priorities.name)
         
         with col2:
             status_id = st.selectbox("Status", 
-                                   options=list(statuses['id']), 
-                                   index=list(statuses['id']).index(current_status),
-                                   format_func=lambda x: statuses[statuses['id']==x]['name'].iloc[0])
+                                   options=ref.statuses.ids, 
+                                   index=ref.statuses.index(current_status),
+                                   format_func=ref.statuses.name)
             
             # Assignee selection (admin/IT staff only)
             if user['role'] in ['admin', 'it_staff']:
-                users = pd.read_sql_query("SELECT id, full_name FROM users WHERE role IN ('admin', 'it_staff') ORDER BY full_name", conn)
                 current_assignee = None
                 if ticket['assignee']:
-                    current_assignee = users[users['full_name'] == ticket['assignee']]['id'].iloc[0] if len(users[users['full_name'] == ticket['assignee']]) > 0 else None
+                    current_assignee = ref.staff.id(ticket['assignee'])
                 
-                assignee_options = [None] + list(users['id'])
+                assignee_options = [None] + ref.staff.ids
                 assignee_index = 0
                 if current_assignee:
                     assignee_index = assignee_options.index(current_assignee)
@@ -1632,7 +1516,7 @@ def show_edit_ticket(ticket_id):
                 assignee_id = st.selectbox("Assignee", 
                                          options=assignee_options, 
                                          index=assignee_index,
-                                         format_func=lambda x: "Unassigned" if x is None else users[users['id']==x]['full_name'].iloc[0])
+                                         format_func=lambda x: ref.staff.name(x, "Unassigned"))
             else:
                 assignee_id = None
         
@@ -1640,17 +1524,14 @@ def show_edit_ticket(ticket_id):
         
         if submitted:
             if title and description:
-                cursor = conn.cursor()
-                
                 # Update ticket
-                cursor.execute('''
+                write_queue.write([('''
                     UPDATE tickets 
                     SET title = ?, description = ?, category_id = ?, priority_id = ?, status_id = ?, 
-                        assignee_id = ?, updated_at = CURRENT_TIMESTAMP
+                        assignee_id = ?, updated_at = ?
                     WHERE id = ?
-                ''', (title, description, category_id, priority_id, status_id, assignee_id, ticket_id))
+                ''', (title, description, category_id, priority_id, status_id, assignee_id, timestamps.now(), ticket_id))], DB_PATH)
                 
-                conn.commit()
                 st.success("Ticket updated successfully!")
                 
                 # Clear edit state and go back to ticket list
@@ -1672,24 +1553,24 @@ def show_create_ticket():
     
     with st.form("create_ticket_form"):
         # Get categories and priorities (put "Other" at the end)
-        categories = pd.read_sql_query("SELECT id, name FROM categories ORDER BY CASE WHEN name = 'Other' THEN 1 ELSE 0 END, name", conn)
-        priorities = pd.read_sql_query("SELECT id, name FROM priorities ORDER BY level", conn)
+        ref = get_reference_data()
+        category_options = sorted(ref.categories.ids, key=lambda x: ref.categories.name(x) == 'Other')
         
         col1, col2 = st.columns(2)
         with col1:
             category_id = st.selectbox("Category", 
-                                     options=categories['id'], 
-                                     format_func=lambda x: categories[categories['id']==x]['name'].iloc[0])
+                                     options=category_options, 
+                                     format_func=ref.categories.name)
         
         with col2:
             priority_id = st.selectbox("Priority", 
-                                     options=priorities['id'], 
-                                     format_func=lambda x: priorities[priorities['id']==x]['name'].iloc[0])
+                                     options=ref.priorities.ids, 
+                                     format_func=ref.priorities.name)
         
         # Show SLA information
-        response_due, resolution_due = calculate_sla_dates(priority_id)
+        response_due, resolution_due = calculate_sla_dates(priority_id, category_id)
         if response_due and resolution_due:
-            st.info(f"**SLA:** Response due within {response_due.strftime('%Y-%m-%d %H:%M')}, Resolution due within {resolution_due.strftime('%Y-%m-%d %H:%M')}")
+            st.info(f"**SLA:** Response due within {timestamps.format_timestamp(response_due, '%Y-%m-%d %H:%M')}, Resolution due within {timestamps.format_timestamp(resolution_due, '%Y-%m-%d %H:%M')}")
         
         title = st.text_input("Title", placeholder="Brief description of the issue")
         description = st.text_area("Description", placeholder="Detailed description of the issue...")
@@ -1701,30 +1582,37 @@ def show_create_ticket():
                 ticket_number = generate_ticket_number()
                 user = st.session_state.user
                 
-                # Get default status (Open) - use direct SQL instead of pandas
-                cursor_temp = conn.cursor()
-                cursor_temp.execute("SELECT id FROM statuses WHERE name = 'Open'")
-                status_result = cursor_temp.fetchone()
-                if status_result:
-                    status_id = status_result[0]
-                else:
+                # Get default status (Open)
+                status_id = ref.statuses.id('Open')
+                if status_id is None:
                     st.error("Error: 'Open' status not found in database")
                     conn.close()
                     return
                 
                 # Calculate SLA dates
-                response_due, resolution_due = calculate_sla_dates(priority_id)
+                response_due, resolution_due = calculate_sla_dates(priority_id, category_id)
                 
-                cursor = conn.cursor()
-                cursor.execute('''
+                ticket_id = write_queue.write([('''
                     INSERT INTO tickets (ticket_number, title, description, status_id, priority_id, category_id, requester_id, sla_response_due, sla_resolution_due)
                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (ticket_number, title, description, status_id, priority_id, category_id, user['id'], response_due, resolution_due))
-                
-                conn.commit()
+                ''', (ticket_number, title, description, status_id, priority_id, category_id, user['id'], response_due, resolution_due))], DB_PATH)[0].lastrowid
                 conn.close()
+                metrics.TICKETS_CREATED.inc()
                 
-                st.success(f"Ticket created successfully! Ticket number: {ticket_number}")
+                # Route the ticket to the least loaded agent for its category
+                assignee_id = None
+                if assignment.ENABLED:
+                    assignee_id = assignment.assign_ticket(ticket_id, category_id, DB_PATH)
+                
+                # Show the new ticket on the dashboard we redirect to
+                _dashboard_stats.clear()
+                sla_worker.notify(DB_PATH)
+                
+                # Shown on the dashboard after the redirect
+                message = f"Ticket created successfully! Ticket number: {ticket_number}"
+                if assignee_id is not None:
+                    message += f" Assigned to {ref.staff.name(assignee_id)}."
+                st.session_state.dashboard_message = message
                 # Redirect back to main page
                 st.session_state.page = "dashboard"
                 st.rerun()
@@ -1743,30 +1631,16 @@ def show_knowledge_base():
     search_term = st.text_input("Search Knowledge Base", placeholder="Enter keywords...")
     
     # Category filter
-    categories = pd.read_sql_query("SELECT id, name FROM categories ORDER BY name", conn)
-    category_filter = st.selectbox("Filter by Category", ["All"] + list(categories['name']))
-    
-    # Build query
-    base_query = '''
-        SELECT kb.id, kb.title, kb.content, kb.tags, kb.created_at, c.name as category, u.full_name as author
-        FROM knowledge_base kb
-        LEFT JOIN categories c ON kb.category_id = c.id
-        LEFT JOIN users u ON kb.created_by = u.id
-        WHERE kb.is_public = 1
-    '''
-    params = []
+    ref = get_reference_data()
+    category_filter = st.selectbox("Filter by Category", ["All"] + ref.categories.names)
+    category_id = ref.categories.id(category_filter)
     
-    if search_term:
-        base_query += " AND (kb.title LIKE ? OR kb.content LIKE ? OR kb.tags LIKE ?)"
-        search_param = f"%{search_term}%"
-        params.extend([search_param, search_param, search_param])
-    
-    if category_filter != "All":
-        category_id = categories[categories['name'] == category_filter]['id'].iloc[0]
-        base_query += " AND kb.category_id = ?"
-        params.append(category_id)
-    
-    base_query += " ORDER BY kb.created_at DESC"
+    # Build query (searches go through the full-text index, best matches first)
+    base_query, params = queries.knowledge_base_query(
+        search_term=search_term,
+        category_id=category_id,
+        limit=KB_SEARCH_RESULT_LIMIT if search_term else None
+    )
     
     # Execute query
     kb_articles = pd.read_sql_query(base_query, conn, params=params)
@@ -1783,6 +1657,8 @@ def show_knowledge_base():
                     st.write(f"**Tags:** {article['tags']}")
                 st.markdown("---")
                 st.markdown(article['content'])
+            if article['snippet']:
+                st.caption(" ".join(article['snippet'].split()))
     else:
         st.info("No articles found matching your criteria")
     
@@ -1798,10 +1674,9 @@ def show_knowledge_base():
             tags = st.text_input("Tags (comma-separated)")
             
             conn = get_db_connection()
-            categories = pd.read_sql_query("SELECT id, name FROM categories ORDER BY name", conn)
             category_id = st.selectbox("Category", 
-                                     options=[None] + list(categories['id']), 
-                                     format_func=lambda x: "General" if x is None else categories[categories['id']==x]['name'].iloc[0])
+                                     options=[None] + ref.categories.ids, 
+                                     format_func=lambda x: ref.categories.name(x, "General"))
             
             if st.form_submit_button("Add Article"):
                 if title and content:
@@ -1813,12 +1688,11 @@ def show_knowledge_base():
                         st.error("An article with this title already exists. Please choose a different title.")
                     else:
                         try:
-                            cursor.execute('''
+                            write_queue.write([('''
                                 INSERT INTO knowledge_base (title, content, category_id, tags, created_by)
                                 VALUES (?, ?, ?, ?, ?)
-                            ''', (title, content, category_id, tags, user['id']))
+                            ''', (title, content, category_id, tags, user['id']))], DB_PATH)
                             
-                            conn.commit()
                             st.success("Article added successfully!")
                             st.rerun()
                         except sqlite3.IntegrityError:
@@ -1848,6 +1722,7 @@ def show_time_tracking():
     ''', conn)
     
     if len(time_entries) > 0:
+        time_entries['created_at'] = time_entries['created_at'].map(timestamps.format_timestamp)
         st.dataframe(time_entries, use_container_width=True)
         
         # Summary
@@ -1860,26 +1735,21 @@ def show_time_tracking():
     st.markdown("---")
     st.subheader("Add Time Entry")
     
+    # The picker sits outside the form so searching updates it immediately
+    user = st.session_state.user
+    ticket_id = ticket_picker(conn, user, key="time_entry")
+    
     with st.form("add_time_entry_form"):
-        # Get tickets
-        tickets = pd.read_sql_query("SELECT id, ticket_number, title FROM tickets ORDER BY created_at DESC", conn)
-        ticket_id = st.selectbox("Ticket", 
-                               options=tickets['id'], 
-                               format_func=lambda x: f"{tickets[tickets['id']==x]['ticket_number'].iloc[0]} - {tickets[tickets['id']==x]['title'].iloc[0]}")
-        
         description = st.text_input("Description")
         time_spent = st.number_input("Time Spent (minutes)", min_value=1, value=30)
         
         if st.form_submit_button("Add Time Entry"):
             if ticket_id and time_spent:
-                user = st.session_state.user
-                cursor = conn.cursor()
-                cursor.execute('''
+                write_queue.write([('''
                     INSERT INTO time_entries (ticket_id, user_id, description, time_spent_minutes)
                     VALUES (?, ?, ?, ?)
-                ''', (ticket_id, user['id'], description, time_spent))
+                ''', (ticket_id, user['id'], description, time_spent))], DB_PATH)
                 
-                conn.commit()
                 st.success("Time entry added successfully!")
                 st.rerun()
             else:
@@ -1893,21 +1763,11 @@ def show_user_management():
     
     conn = get_db_connection()
     
-    # Get users with additional statistics
-    users_query = '''
-        SELECT u.id, u.username, u.email, u.full_name, u.role, u.department, u.created_at,
-               COUNT(DISTINCT t1.id) as tickets_created,
-               COUNT(DISTINCT t2.id) as tickets_assigned,
-               COUNT(DISTINCT te.id) as time_entries
-        FROM users u
-        LEFT JOIN tickets t1 ON u.id = t1.requester_id
-        LEFT JOIN tickets t2 ON u.id = t2.assignee_id
-        LEFT JOIN time_entries te ON u.id = te.user_id
-        GROUP BY u.id, u.username, u.email, u.full_name, u.role, u.department, u.created_at
-        ORDER BY u.created_at DESC
-    '''
+    # Users with their activity counters (kept current by triggers)
+    users = pd.read_sql_query(queries.USER_LIST_WITH_STATS, conn)
     
-    users = pd.read_sql_query(users_query, conn)
+    ref = get_reference_data()
+    skills = assignment.skills_by_user(DB_PATH)
     
     if len(users) > 0:
         # Display users in a more detailed format
@@ -1923,6 +1783,7 @@ def show_user_management():
                 with col2:
                     st.write(f"**Tickets Created:** {user['tickets_created']}")
                     st.write(f"**Tickets Assigned:** {user['tickets_assigned']}")
+                    st.write(f"**Open Assigned:** {user['open_assigned']}")
                     st.write(f"**Time Entries:** {user['time_entries']}")
                 
                 with col3:
@@ -1935,6 +1796,17 @@ def show_user_management():
                     if st.button(f"Delete User", key=f"delete_user_{user['id']}"):
                         st.session_state.delete_user_id = user['id']
                         st.rerun()
+                
+                # Categories used to route new tickets to this agent
+                if user['role'] in ['admin', 'it_staff']:
+                    user_skills = st.multiselect("Category skills",
+                                                 options=ref.categories.ids,
+                                                 default=skills.get(user['id'], []),
+                                                 format_func=ref.categories.name,
+                                                 key=f"skills_{user['id']}")
+                    if st.button("Save Skills", key=f"save_skills_{user['id']}"):
+                        assignment.set_skills(int(user['id']), user_skills, DB_PATH)
+                        st.success("Skills updated")
     else:
         st.info("No users found")
     
@@ -1957,13 +1829,11 @@ def show_user_management():
             with col1:
                 if st.form_submit_button("Update User"):
                     try:
-                        cursor = conn.cursor()
-                        cursor.execute('''
+                        write_queue.write([('''
                             UPDATE users SET username = ?, email = ?, full_name = ?, role = ?, department = ?
                             WHERE id = ?
-                        ''', (edit_username, edit_email, edit_full_name, edit_role, edit_department, st.session_state.edit_user_id))
+                        ''', (edit_username, edit_email, edit_full_name, edit_role, edit_department, int(st.session_state.edit_user_id)))], DB_PATH)
                         
-                        conn.commit()
                         st.success("User updated successfully!")
                         del st.session_state.edit_user_id
                         st.rerun()
@@ -1988,9 +1858,7 @@ def show_user_management():
         with col1:
             if st.button("Yes, Delete User", type="primary"):
                 try:
-                    cursor = conn.cursor()
-                    cursor.execute('DELETE FROM users WHERE id = ?', (st.session_state.delete_user_id,))
-                    conn.commit()
+                    write_queue.write([('DELETE FROM users WHERE id = ?', (int(st.session_state.delete_user_id),))], DB_PATH)
                     st.success("User deleted successfully!")
                     del st.session_state.delete_user_id
                     st.rerun()
@@ -2016,15 +1884,12 @@ def show_user_management():
         
         if st.form_submit_button("Add User"):
             if username and email and full_name and password:
-                cursor = conn.cursor()
-                
                 try:
-                    cursor.execute('''
+                    write_queue.write([('''
                         INSERT INTO users (username, password_hash, email, full_name, role, department)
                         VALUES (?, ?, ?, ?, ?, ?)
-                    ''', (username, hash_password(password), email, full_name, role, department))
+                    ''', (username, hash_password(password), email, full_name, role, department))], DB_PATH)
                     
-                    conn.commit()
                     st.success("User added successfully!")
                     st.rerun()
                 except sqlite3.IntegrityError:
@@ -2034,6 +1899,290 @@ def show_user_management():
     
     conn.close()
 
+def recompute_sla_due_dates():
+    """Re-baseline every open ticket's SLA due dates, with a progress bar"""
+    progress_bar = st.progress(0.0, text="Recomputing open tickets...")
+    def report_progress(done, total):
+        progress_bar.progress(done / total, text=f"Recomputed {done} of {total} tickets")
+    
+    updated = sla.recompute_open_tickets(DB_PATH, progress=report_progress)
+    sla_worker.notify(DB_PATH)
+    progress_bar.empty()
+    return updated
+
+def show_sla_policies():
+    """Show SLA policy and business calendar editors (admin only)"""
+    st.subheader("SLA Policies")
+    st.caption("A policy for all categories applies to every category of its priority that has no policy of its own. "
+               "Targets on a business calendar only count its working hours. "
+               "Saving re-baselines the due dates of every open ticket.")
+    
+    ref = get_reference_data()
+    policies = sla.get_sla_policies(DB_PATH)
+    all_categories = "All categories"
+    around_the_clock = "Around the clock"
+    
+    policy_df = pd.DataFrame({
+        'Priority': [ref.priorities.name(row[0]) for row in policies.rows],
+        'Category': [ref.categories.name(row[1], all_categories) for row in policies.rows],
+        'Response (hours)': [row[2] / 60 for row in policies.rows],
+        'Resolution (hours)': [row[3] / 60 for row in policies.rows],
+        'Hours': [policies.calendar_names.name(row[4], around_the_clock) for row in policies.rows],
+    })
+    
+    with st.form("sla_policies_form"):
+        edited = st.data_editor(
+            policy_df,
+            num_rows="dynamic",
+            use_container_width=True,
+            column_config={
+                'Priority': st.column_config.SelectboxColumn(options=ref.priorities.names, required=True),
+                'Category': st.column_config.SelectboxColumn(options=[all_categories] + ref.categories.names, required=True),
+                'Response (hours)': st.column_config.NumberColumn(min_value=0.25, step=0.25, required=True),
+                'Resolution (hours)': st.column_config.NumberColumn(min_value=0.25, step=0.25, required=True),
+                'Hours': st.column_config.SelectboxColumn(options=[around_the_clock] + policies.calendar_names.names, required=True),
+            },
+            key="sla_policy_editor",
+        )
+        submitted = st.form_submit_button("Save and Recompute Open Tickets")
+    
+    if submitted:
+        edited = edited.dropna()
+        scopes = list(zip(edited['Priority'], edited['Category']))
+        if len(set(scopes)) != len(scopes):
+            st.error("Each priority and category combination can only have one policy")
+            return
+        if (edited['Resolution (hours)'] < edited['Response (hours)']).any():
+            st.error("Resolution time cannot be shorter than response time")
+            return
+        
+        rows = [
+            (ref.priorities.id(priority),
+             None if category == all_categories else ref.categories.id(category),
+             round(response_hours * 60),
+             round(resolution_hours * 60),
+             policies.calendar_names.id(hours))
+            for priority, category, response_hours, resolution_hours, hours in edited.itertuples(index=False)
+        ]
+        
+        def save_policies(conn):
+            conn.execute("DELETE FROM sla_policies")
+            conn.executemany('''
+                INSERT INTO sla_policies (priority_id, category_id, response_minutes, resolution_minutes, calendar_id)
+                VALUES (?, ?, ?, ?, ?)
+            ''', rows)
+        write_queue.call(save_policies, DB_PATH)
+        
+        updated = recompute_sla_due_dates()
+        st.success(f"SLA policies saved. {updated} open tickets have new due dates.")
+    
+    # Business calendars
+    st.markdown("---")
+    st.subheader("Business Calendars")
+    st.caption("Working days are day names (Mon, Tue, ...); holidays are dates as YYYY-MM-DD, comma separated.")
+    
+    calendar_df = pd.DataFrame({
+        'id': [row[0] for row in policies.calendar_rows],
+        'Name': [row[1] for row in policies.calendar_rows],
+        'Opens': [time(row[2] // 60, row[2] % 60) for row in policies.calendar_rows],
+        'Closes': [time(min(row[3], 1439) // 60, min(row[3], 1439) % 60) for row in policies.calendar_rows],
+        'Working days': [business_calendar.format_workdays(business_calendar.parse_workdays(row[4]))
+                         for row in policies.calendar_rows],
+        'Holidays': [', '.join(day.isoformat() for day in sorted(policies.holidays.get(row[0], [])))
+                     for row in policies.calendar_rows],
+    }).astype({'id': 'Int64'})
+    
+    with st.form("sla_calendars_form"):
+        edited_calendars = st.data_editor(
+            calendar_df,
+            num_rows="dynamic",
+            use_container_width=True,
+            column_config={
+                'id': None,
+                'Name': st.column_config.TextColumn(required=True),
+                'Opens': st.column_config.TimeColumn(format="HH:mm", required=True),
+                'Closes': st.column_config.TimeColumn(format="HH:mm", required=True),
+                'Working days': st.column_config.TextColumn(required=True),
+                'Holidays': st.column_config.TextColumn(),
+            },
+            key="sla_calendar_editor",
+        )
+        calendars_submitted = st.form_submit_button("Save Calendars and Recompute Open Tickets")
+    
+    if calendars_submitted:
+        calendars = []
+        for calendar in edited_calendars.dropna(subset=['Name', 'Opens', 'Closes', 'Working days']).itertuples(index=False):
+            try:
+                workdays = [business_calendar.WEEKDAY_NAMES.index(day.strip().title()[:3])
+                            for day in calendar[4].split(',') if day.strip()]
+                holidays = [datetime.strptime(day.strip(), '%Y-%m-%d').date().isoformat()
+                            for day in (calendar[5] or '').split(',') if day.strip()]
+            except ValueError:
+                st.error(f"Could not read the working days or holidays of {calendar[1]}")
+                return
+            opens = calendar[2].hour * 60 + calendar[2].minute
+            closes = calendar[3].hour * 60 + calendar[3].minute
+            if not workdays or opens >= closes:
+                st.error(f"{calendar[1]} needs working days and an opening time before its closing time")
+                return
+            calendar_id = None if pd.isna(calendar[0]) else int(calendar[0])
+            calendars.append((calendar_id, calendar[1].strip(), opens, closes,
+                              ','.join(str(day) for day in sorted(set(workdays))), holidays))
+        
+        names = [calendar[1] for calendar in calendars]
+        if len(set(names)) != len(names):
+            st.error("Calendar names must be unique")
+            return
+        
+        kept_ids = [calendar[0] for calendar in calendars if calendar[0] is not None]
+        removed_ids = [calendar_id for calendar_id in policies.calendars if calendar_id not in kept_ids]
+        
+        def save_calendars(conn):
+            cursor = conn.cursor()
+            for calendar_id in removed_ids:
+                # Policies on a removed calendar fall back to counting around the clock
+                cursor.execute("UPDATE sla_policies SET calendar_id = NULL WHERE calendar_id = ?", (calendar_id,))
+                cursor.execute("DELETE FROM sla_calendar_holidays WHERE calendar_id = ?", (calendar_id,))
+                cursor.execute("DELETE FROM sla_calendars WHERE id = ?", (calendar_id,))
+            
+            for calendar_id, name, opens, closes, workdays, holidays in calendars:
+                if calendar_id is None:
+                    cursor.execute('''
+                        INSERT INTO sla_calendars (name, opens_minute, closes_minute, workdays)
+                        VALUES (?, ?, ?, ?)
+                    ''', (name, opens, closes, workdays))
+                    calendar_id = cursor.lastrowid
+                else:
+                    cursor.execute('''
+                        UPDATE sla_calendars SET name = ?, opens_minute = ?, closes_minute = ?, workdays = ?
+                        WHERE id = ?
+                    ''', (name, opens, closes, workdays, calendar_id))
+                cursor.execute("DELETE FROM sla_calendar_holidays WHERE calendar_id = ?", (calendar_id,))
+                cursor.executemany("INSERT INTO sla_calendar_holidays (calendar_id, day) VALUES (?, ?)",
+                                   [(calendar_id, day) for day in holidays])
+        write_queue.call(save_calendars, DB_PATH)
+        
+        updated = recompute_sla_due_dates()
+        st.success(f"Business calendars saved. {updated} open tickets have new due dates.")
+
+def show_diagnostics():
+    """Show page render timings, query statistics and the slow-query log (admin only)"""
+    st.subheader("Diagnostics")
+    
+    # Rolling render timings per page and role since the process started
+    st.write("**Page Renders**")
+    if render_profiler.ENABLED:
+        col1, col2, col3 = st.columns([2, 1, 1])
+        with col1:
+            st.caption(f"Percentiles over the last {render_profiler.SAMPLES} renders of each page; "
+                       f"renders issuing more than {render_profiler.QUERY_BUDGET} queries are over budget")
+        with col2:
+            st.download_button("Export JSON",
+                               data=json.dumps(render_profiler.snapshot(), indent=2),
+                               file_name=f"render_timings_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+                               mime="application/json")
+        with col3:
+            if st.button("Reset Render Timings"):
+                render_profiler.reset()
+                st.rerun()
+        
+        renders_df = pd.DataFrame(render_profiler.summary())
+        if len(renders_df) > 0:
+            st.dataframe(
+                renders_df.rename(columns={
+                    'page': 'Page', 'role': 'Role', 'renders': 'Renders',
+                    'wall_ms_p50': 'Wall p50 (ms)', 'wall_ms_p95': 'Wall p95 (ms)', 'wall_ms_p99': 'Wall p99 (ms)',
+                    'db_ms_p50': 'DB p50 (ms)', 'db_ms_p95': 'DB p95 (ms)', 'db_ms_p99': 'DB p99 (ms)',
+                    'queries_p50': 'Queries p50', 'queries_max': 'Queries max', 'rows_avg': 'Avg rows',
+                    'over_budget': 'Over budget'
+                }).round(1),
+                use_container_width=True,
+                hide_index=True
+            )
+        else:
+            st.info("No renders recorded yet")
+    else:
+        st.info("Render timing is switched off (TICKETS_RENDER_PROFILE=0)")
+    
+    # cProfile captures taken with "Profile This Page" in the sidebar
+    st.write("**Profiled Renders**")
+    captures = render_profiler.captures()
+    if captures:
+        col1, col2, col3 = st.columns([2, 1, 1])
+        with col1:
+            capture_labels = {capture.id: f"{capture.page} · {timestamps.format_timestamp(capture.at)}"
+                              for capture in captures}
+            capture_id = st.selectbox(
+                "Capture",
+                options=list(capture_labels),
+                format_func=capture_labels.get
+            )
+        capture = render_profiler.get_capture(capture_id)
+        if capture is not None:
+            with col2:
+                st.download_button("Download pstats",
+                                   data=render_profiler.capture_pstats(capture),
+                                   file_name=f"{capture.page}_{capture.at}_{capture.id}.pstats",
+                                   mime="application/octet-stream")
+            with col3:
+                if st.button("Clear Captures"):
+                    render_profiler.clear_captures()
+                    st.rerun()
+            
+            st.caption(f"{capture.role} · {capture.wall_ms:.0f} ms under the profiler · {capture.queries} queries")
+            st.dataframe(
+                pd.DataFrame(render_profiler.capture_summary(capture)).rename(columns={
+                    'function': 'Function', 'calls': 'Calls', 'primitive_calls': 'Primitive calls',
+                    'own_ms': 'Own (ms)', 'cumulative_ms': 'Cumulative (ms)'
+                }).round(2),
+                use_container_width=True,
+                hide_index=True
+            )
+    else:
+        st.info("No profiled renders yet. Use \"Profile This Page\" in the sidebar on the page to profile.")
+    
+    if not query_log.ENABLED:
+        st.info("The query log is switched off (TICKETS_QUERY_LOG=0)")
+        return
+    
+    # Statements ranked across every session since the process started
+    st.write("**Top Statements**")
+    col1, col2, col3 = st.columns([1, 1, 2])
+    with col1:
+        top_n = st.number_input("Statements", min_value=5, max_value=200, value=20, step=5)
+    with col2:
+        order_labels = {"Total time": 'total_seconds', "Calls": 'calls', "Slowest call": 'max_seconds', "Rows": 'rows'}
+        order_by = st.selectbox("Order by", list(order_labels))
+    with col3:
+        st.caption(f"Executions slower than {query_log.SLOW_QUERY_MS:g} ms are kept in the slow-query log below")
+        if st.button("Reset Query Log"):
+            query_log.reset()
+            st.rerun()
+    
+    top_df = pd.DataFrame(query_log.top_statements(int(top_n), order_labels[order_by]))
+    if len(top_df) > 0:
+        st.dataframe(
+            top_df.rename(columns={
+                'sql': 'Statement', 'calls': 'Calls', 'total_ms': 'Total (ms)', 'avg_ms': 'Avg (ms)',
+                'max_ms': 'Max (ms)', 'rows': 'Rows', 'callers': 'Issued by'
+            }).round(2),
+            use_container_width=True,
+            hide_index=True
+        )
+    else:
+        st.info("No statements recorded yet")
+    
+    st.write("**Slow Queries**")
+    slow = query_log.slow_queries()
+    if not slow:
+        st.info("No slow queries recorded")
+    for entry in slow:
+        with st.expander(f"{entry['milliseconds']:.0f} ms · {entry['caller']} · "
+                         f"{timestamps.format_timestamp(entry['at'])}"):
+            st.code(entry['sql'], language="sql")
+            st.write(f"**Rows:** {entry['rows']}")
+            st.code('\n'.join(entry['plan']) or "(no plan)", language="text")
+
 def show_reports():
     """Show reports and analytics"""
     st.subheader("Reports & Analytics")
@@ -2046,38 +2195,23 @@ def show_reports():
         start_date = st.date_input("Start Date", value=datetime.now() - timedelta(days=30))
     with col2:
         end_date = st.date_input("End Date", value=datetime.now())
+    report_days = (start_date.isoformat(), end_date.isoformat())
+    report_range = timestamps.day_range(start_date, end_date)
     
     # Key metrics
     st.subheader("Key Metrics")
     
     # Total tickets in date range
-    total_tickets = pd.read_sql_query('''
-        SELECT COUNT(*) as count FROM tickets 
-        WHERE DATE(created_at) BETWEEN ? AND ?
-    ''', conn, params=(start_date, end_date)).iloc[0]['count']
+    total_tickets = pd.read_sql_query(queries.REPORT_TOTAL, conn, params=report_days).iloc[0]['count']
     
     # Resolved tickets
-    resolved_tickets = pd.read_sql_query('''
-        SELECT COUNT(*) as count FROM tickets 
-        WHERE DATE(created_at) BETWEEN ? AND ? AND status_id IN (
-            SELECT id FROM statuses WHERE name IN ('Resolved', 'Closed')
-        )
-    ''', conn, params=(start_date, end_date)).iloc[0]['count']
+    resolved_tickets = pd.read_sql_query(queries.REPORT_RESOLVED, conn, params=report_days).iloc[0]['count']
     
     # Average resolution time
-    avg_resolution = pd.read_sql_query('''
-        SELECT AVG(julianday(resolved_at) - julianday(created_at)) as avg_days
-        FROM tickets 
-        WHERE DATE(created_at) BETWEEN ? AND ? AND resolved_at IS NOT NULL
-    ''', conn, params=(start_date, end_date)).iloc[0]['avg_days']
+    avg_resolution = pd.read_sql_query(queries.REPORT_AVG_RESOLUTION, conn, params=report_days).iloc[0]['avg_days']
     
     # SLA compliance
-    sla_compliant = pd.read_sql_query('''
-        SELECT COUNT(*) as count FROM tickets 
-        WHERE DATE(created_at) BETWEEN ? AND ? 
-        AND (first_response_at IS NULL OR first_response_at <= sla_response_due)
-        AND (resolved_at IS NULL OR resolved_at <= sla_resolution_due)
-    ''', conn, params=(start_date, end_date)).iloc[0]['count']
+    sla_compliant = pd.read_sql_query(queries.REPORT_SLA_COMPLIANT, conn, params=report_days).iloc[0]['count']
     
     col1, col2, col3, col4 = st.columns(4)
     with col1:
@@ -2095,13 +2229,7 @@ def show_reports():
     
     with col1:
         st.subheader("Tickets by Status")
-        status_data = pd.read_sql_query('''
-            SELECT s.name, COUNT(t.id) as count
-            FROM statuses s
-            LEFT JOIN tickets t ON s.id = t.status_id AND DATE(t.created_at) BETWEEN ? AND ?
-            GROUP BY s.id, s.name
-            ORDER BY s.id
-        ''', conn, params=(start_date, end_date))
+        status_data = pd.read_sql_query(queries.REPORT_STATUS_COUNTS, conn, params=report_days)
         
         if len(status_data) > 0:
             fig = px.pie(status_data, values='count', names='name')
@@ -2109,13 +2237,7 @@ def show_reports():
     
     with col2:
         st.subheader("Tickets by Priority")
-        priority_data = pd.read_sql_query('''
-            SELECT p.name, COUNT(t.id) as count
-            FROM priorities p
-            LEFT JOIN tickets t ON p.id = t.priority_id AND DATE(t.created_at) BETWEEN ? AND ?
-            GROUP BY p.id, p.name
-            ORDER BY p.level
-        ''', conn, params=(start_date, end_date))
+        priority_data = pd.read_sql_query(queries.REPORT_PRIORITY_COUNTS, conn, params=report_days)
         
         if len(priority_data) > 0:
             fig = px.bar(priority_data, x='name', y='count')
@@ -2123,15 +2245,7 @@ def show_reports():
     
     # Time tracking summary
     st.subheader("Time Tracking Summary")
-    time_summary = pd.read_sql_query('''
-        SELECT u.full_name as user, SUM(te.time_spent_minutes) as total_minutes,
-               COUNT(DISTINCT te.ticket_id) as tickets_worked
-        FROM time_entries te
-        JOIN users u ON te.user_id = u.id
-        WHERE DATE(te.created_at) BETWEEN ? AND ?
-        GROUP BY u.id, u.full_name
-        ORDER BY total_minutes DESC
-    ''', conn, params=(start_date, end_date))
+    time_summary = pd.read_sql_query(queries.REPORT_TIME_SUMMARY, conn, params=report_range)
     
     if len(time_summary) > 0:
         time_summary['total_hours'] = time_summary['total_minutes'] / 60
@@ -2141,22 +2255,12 @@ def show_reports():
     
     # Recent tickets table
     st.subheader("Recent Tickets")
-    recent_tickets = pd.read_sql_query('''
-        SELECT t.ticket_number, t.title, s.name as status, p.name as priority,
-               c.name as category, u.full_name as requester, t.created_at
-        FROM tickets t
-        JOIN statuses s ON t.status_id = s.id
-        JOIN priorities p ON t.priority_id = p.id
-        JOIN categories c ON t.category_id = c.id
-        JOIN users u ON t.requester_id = u.id
-        WHERE DATE(t.created_at) BETWEEN ? AND ?
-        ORDER BY t.created_at DESC
-        LIMIT 20
-    ''', conn, params=(start_date, end_date))
+    recent_tickets = pd.read_sql_query(queries.REPORT_RECENT, conn, params=report_range)
     
     conn.close()
     
     if len(recent_tickets) > 0:
+        recent_tickets['created_at'] = recent_tickets['created_at'].map(timestamps.format_timestamp)
         st.dataframe(recent_tickets, use_container_width=True)
     else:
         st.info("No tickets found")
@@ -2178,35 +2282,16 @@ def show_profile():
         st.write(f"**Department:** {user['department'] or 'Not specified'}")
     
     with col2:
-        # Get user statistics
+        # Get user statistics (one row of trigger-maintained counters)
         conn = get_db_connection()
-        
-        # Count tickets created by user
-        tickets_created = pd.read_sql_query(
-            "SELECT COUNT(*) as count FROM tickets WHERE requester_id = ?", 
-            conn, params=(user['id'],)
-        ).iloc[0]['count']
-        
-        # Count tickets assigned to user (if IT staff/admin)
-        tickets_assigned = 0
-        if user['role'] in ['admin', 'it_staff']:
-            tickets_assigned = pd.read_sql_query(
-                "SELECT COUNT(*) as count FROM tickets WHERE assignee_id = ?", 
-                conn, params=(user['id'],)
-            ).iloc[0]['count']
-        
-        # Count time entries
-        time_entries = pd.read_sql_query(
-            "SELECT COUNT(*) as count FROM time_entries WHERE user_id = ?", 
-            conn, params=(user['id'],)
-        ).iloc[0]['count']
-        
+        stats = pd.read_sql_query(queries.USER_STATS, conn, params=(user['id'],)).iloc[0]
         conn.close()
         
-        st.metric("Tickets Created", tickets_created)
+        st.metric("Tickets Created", int(stats['tickets_created']))
         if user['role'] in ['admin', 'it_staff']:
-            st.metric("Tickets Assigned", tickets_assigned)
-        st.metric("Time Entries", time_entries)
+            st.metric("Tickets Assigned", int(stats['tickets_assigned']))
+            st.metric("Open Assigned", int(stats['open_assigned']))
+        st.metric("Time Entries", int(stats['time_entries']))
     
     # Profile editing section
     st.markdown("---")
@@ -2251,18 +2336,17 @@ def show_profile():
                     # Update profile
                     if new_password:
                         # Update with new password
-                        cursor.execute('''
+                        write_queue.write([('''
                             UPDATE users SET email = ?, full_name = ?, department = ?, password_hash = ?
                             WHERE id = ?
-                        ''', (new_email, new_full_name, new_department, hash_password(new_password), user['id']))
+                        ''', (new_email, new_full_name, new_department, hash_password(new_password), user['id']))], DB_PATH)
                     else:
                         # Update without password change
-                        cursor.execute('''
+                        write_queue.write([('''
                             UPDATE users SET email = ?, full_name = ?, department = ?
                             WHERE id = ?
-                        ''', (new_email, new_full_name, new_department, user['id']))
+                        ''', (new_email, new_full_name, new_department, user['id']))], DB_PATH)
                     
-                    conn.commit()
                     
                     # Update session state
                     st.session_state.user['email'] = new_email
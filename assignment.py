@@ -0,0 +1,104 @@
+"""Workload-aware auto-assignment.
+
+New tickets go to the least loaded agent who handles their category (the
+agent_skills table), or to the least loaded IT staff member when nobody has
+that skill. Load is the user_stats.open_assigned counter, which triggers on
+tickets keep current (migration 13), so routing never counts tickets.
+assign_backlog() spreads the unassigned backlog the same way, most urgent
+ticket first, keeping the loads in memory as it goes.
+"""
+import os
+
+import queries
+import timestamps
+import write_queue
+from database import DB_PATH, get_connection
+
+# Set to 0 to leave new tickets unassigned for a dispatcher
+ENABLED = os.environ.get('TICKETS_AUTO_ASSIGN', '1') != '0'
+
+# Tickets assigned per transaction by assign_backlog()
+BACKLOG_CHUNK_SIZE = int(os.environ.get('TICKETS_ASSIGN_CHUNK_SIZE', '500'))
+
+
+def assign_ticket(ticket_id, category_id, db_path=DB_PATH):
+    """Route one unassigned ticket to an agent.
+
+    Returns the agent's user id, or None if nobody is eligible or the
+    ticket was assigned by someone else first.
+    """
+    # Picking and assigning in one write keeps concurrent routing from
+    # reading the same loads
+    def assign(conn):
+        agent = conn.execute(queries.ASSIGNMENT_PICK_AGENT, (category_id, category_id)).fetchone()
+        if agent is None:
+            return None
+        cursor = conn.execute(queries.ASSIGNMENT_ASSIGN, (agent[0], timestamps.now(), ticket_id))
+        return agent[0] if cursor.rowcount else None
+    return write_queue.call(assign, db_path)
+
+
+def assign_backlog(db_path=DB_PATH, chunk_size=BACKLOG_CHUNK_SIZE, progress=None):
+    """Distribute every unassigned open ticket across the eligible agents.
+
+    Tickets are taken in queue order (soonest SLA deadline first) and each
+    goes to the least loaded eligible agent at that point. progress, if
+    given, is called with (tickets processed, tickets to assign) after each
+    chunk. Returns the number of tickets assigned.
+    """
+    conn = get_connection(db_path)
+    try:
+        agents = conn.execute(queries.ASSIGNMENT_AGENTS).fetchall()
+        skills = {}
+        for category_id, user_id in conn.execute(queries.ASSIGNMENT_SKILLS):
+            skills.setdefault(category_id, []).append(user_id)
+        backlog = conn.execute(queries.ASSIGNMENT_BACKLOG).fetchall()
+
+        load = {user_id: open_assigned for user_id, _, open_assigned in agents}
+        it_staff = [user_id for user_id, role, _ in agents if role == 'it_staff']
+        eligible = {category_id: [user_id for user_id in user_ids if user_id in load]
+                    for category_id, user_ids in skills.items()}
+
+        updates = []
+        for ticket_id, category_id in backlog:
+            candidates = eligible.get(category_id) or it_staff
+            if not candidates:
+                continue
+            agent = min(candidates, key=lambda user_id: (load[user_id], user_id))
+            load[agent] += 1
+            updates.append((agent, ticket_id))
+
+        assigned = 0
+        for start in range(0, len(updates), chunk_size):
+            now = timestamps.now()
+            cursor = conn.executemany(queries.ASSIGNMENT_ASSIGN,
+                                      [(agent, now, ticket_id) for agent, ticket_id in updates[start:start + chunk_size]])
+            conn.commit()
+            assigned += cursor.rowcount
+            if progress is not None:
+                progress(min(start + chunk_size, len(updates)), len(updates))
+    finally:
+        conn.close()
+
+    return assigned
+
+
+def skills_by_user(db_path=DB_PATH):
+    """Return {user id: [category ids the agent handles]}"""
+    conn = get_connection(db_path)
+    try:
+        skills = {}
+        for category_id, user_id in conn.execute(queries.ASSIGNMENT_SKILLS):
+            skills.setdefault(user_id, []).append(category_id)
+        return skills
+    finally:
+        conn.close()
+
+
+def set_skills(user_id, category_ids, db_path=DB_PATH):
+    """Replace the categories an agent handles"""
+    def save(conn):
+        conn.execute('DELETE FROM agent_skills WHERE user_id = ?', (user_id,))
+        conn.executemany('INSERT INTO agent_skills (category_id, user_id) VALUES (?, ?)',
+                         [(category_id, user_id) for category_id in category_ids])
+    write_queue.call(save, db_path)
@@ -0,0 +1,226 @@
+"""Time the queries behind each page against a (synthetic) database.
+
+Runs the same SQL, from queries.py, that show_dashboard, show_tickets_list,
+show_ticket_detail, show_reports, show_user_management and
+show_knowledge_base run, on a pooled connection tuned like the app's. The
+parameters come from the data itself: the busiest requester, the ticket
+with the longest comment thread, the last 30 and 365 days of history, and
+so on. Each query is run once to warm the cache, then REPEAT more times,
+and the results are written as JSON so two runs can be compared. With
+--baseline, queries whose median grew by more than --tolerance times are
+reported and the exit status is 1.
+
+Usage: python benchmark.py path/to/bench.db [--repeat 5] [--output results.json]
+       [--baseline previous.json] [--tolerance 1.5]
+
+Generate a database to run against with synthetic_data.py.
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import time
+from datetime import timedelta
+
+import queries
+import timestamps
+from database import get_connection
+from migrations import migrate
+
+REPEAT = 5
+
+# Rows the ticket list asks for: its smallest page size plus the look-ahead
+# row that tells it whether a next page exists (TICKET_PAGE_SIZES in app.py)
+LIST_LIMIT = 26
+
+# Most knowledge base search results shown (KB_SEARCH_RESULT_LIMIT in app.py)
+KB_SEARCH_LIMIT = 50
+
+# Rows counted in the dataset summary
+TABLES = ('users', 'tickets', 'comments', 'time_entries', 'knowledge_base')
+
+
+def page_queries(conn):
+    """Return (page, name, sql, params) for every query benchmarked"""
+    def value(sql):
+        return conn.execute(sql).fetchone()[0]
+
+    requester_id = value('SELECT user_id FROM user_stats ORDER BY tickets_created DESC LIMIT 1')
+    busiest_ticket = value('SELECT ticket_id FROM comments GROUP BY ticket_id ORDER BY COUNT(*) DESC LIMIT 1')
+    newest_ticket = value('SELECT MAX(id) FROM tickets')
+    deep_page = tuple(conn.execute('''
+        SELECT created_at, id FROM tickets ORDER BY created_at DESC, id DESC LIMIT 1 OFFSET 1000
+    ''').fetchone() or (timestamps.now(), 0))
+    network_id = value("SELECT id FROM categories WHERE name = 'Network'")
+    open_id = value("SELECT id FROM statuses WHERE name = 'Open'")
+    high_id = value("SELECT id FROM priorities WHERE name = 'High'")
+
+    # Reports cover the last month and the last year of the data
+    last_day = timestamps.from_epoch(value('SELECT MAX(created_at) FROM tickets') or timestamps.now()).date()
+    report_ranges = {}
+    for label, days in (('30d', 30), ('365d', 365)):
+        first_day = last_day - timedelta(days=days - 1)
+        report_ranges[label] = ((first_day.isoformat(), last_day.isoformat()),
+                                timestamps.day_range(first_day, last_day))
+
+    checks = [
+        ('dashboard', 'staff', *queries.dashboard_query()),
+        ('dashboard', 'requester', *queries.dashboard_query(requester_id)),
+        ('tickets_list', 'completed_count', queries.COMPLETED_COUNT, ()),
+        ('tickets_list', 'completed_count_for_requester', queries.COMPLETED_COUNT_FOR_REQUESTER, (requester_id,)),
+    ]
+
+    list_variants = {
+        'all': {},
+        'status': {'status_id': open_id},
+        'priority': {'priority_id': high_id},
+        'category': {'category_id': network_id},
+        'completed': {'show_completed': True},
+        'next_page': {'after': deep_page, 'show_completed': True},
+    }
+    for scope, scope_requester in (('staff', None), ('requester', requester_id)):
+        for variant, filters in list_variants.items():
+            sql, params = queries.ticket_list_query(requester_id=scope_requester, limit=LIST_LIMIT, **filters)
+            checks.append(('tickets_list', f'{scope}.{variant}', sql, params))
+        for term in ('printer', 'vendor reply'):
+            sql, params = queries.ticket_search_query(term, requester_id=scope_requester,
+                                                      include_internal=scope_requester is None,
+                                                      show_completed=True, limit=LIST_LIMIT)
+            checks.append(('tickets_list', f'{scope}.search.{term.replace(" ", "_")}', sql, params))
+
+    for label, ticket_id in (('busiest', busiest_ticket), ('newest', newest_ticket)):
+        checks += [
+            ('ticket_detail', f'{label}.ticket', queries.TICKET_DETAIL, (ticket_id,)),
+            ('ticket_detail', f'{label}.time_entries', queries.TICKET_TIME_ENTRIES, (ticket_id,)),
+            ('ticket_detail', f'{label}.comments', queries.TICKET_COMMENTS, (ticket_id,)),
+        ]
+
+    for label, (report_days, report_range) in report_ranges.items():
+        checks += [
+            ('reports', f'{label}.total', queries.REPORT_TOTAL, report_days),
+            ('reports', f'{label}.resolved', queries.REPORT_RESOLVED, report_days),
+            ('reports', f'{label}.avg_resolution', queries.REPORT_AVG_RESOLUTION, report_days),
+            ('reports', f'{label}.sla_compliant', queries.REPORT_SLA_COMPLIANT, report_days),
+            ('reports', f'{label}.status_counts', queries.REPORT_STATUS_COUNTS, report_days),
+            ('reports', f'{label}.priority_counts', queries.REPORT_PRIORITY_COUNTS, report_days),
+            ('reports', f'{label}.time_summary', queries.REPORT_TIME_SUMMARY, report_range),
+            ('reports', f'{label}.recent', queries.REPORT_RECENT, report_range),
+        ]
+
+    checks += [
+        ('user_management', 'users', queries.USER_LIST_WITH_STATS, ()),
+        ('user_management', 'skills', queries.ASSIGNMENT_SKILLS, ()),
+        ('knowledge_base', 'all', *queries.knowledge_base_query()),
+        ('knowledge_base', 'category', *queries.knowledge_base_query(category_id=network_id)),
+        ('knowledge_base', 'search', *queries.knowledge_base_query('vpn', limit=KB_SEARCH_LIMIT)),
+    ]
+    return checks
+
+
+def time_query(conn, sql, params, repeat=REPEAT):
+    """Run a query once to warm up and then repeat times; returns its timings in ms"""
+    def run():
+        start = time.perf_counter()
+        rows = conn.cursor(sqlite3.Cursor).execute(sql, params).fetchall()
+        return (time.perf_counter() - start) * 1000, len(rows)
+
+    first_ms, rows = run()
+    runs = sorted(run()[0] for _ in range(repeat))
+    return {
+        'rows': rows,
+        'first_ms': first_ms,
+        'min_ms': runs[0],
+        'median_ms': statistics.median(runs),
+        'p95_ms': runs[min(int(len(runs) * 0.95), len(runs) - 1)],
+        'max_ms': runs[-1],
+    }
+
+
+def run_benchmark(db_path, repeat=REPEAT, progress=None):
+    """Benchmark every page query; returns the JSON-ready results"""
+    migrate(db_path)
+    conn = get_connection(db_path)
+    try:
+        dataset = {table: conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0] for table in TABLES}
+        checks = page_queries(conn)
+        results = []
+        for number, (page, name, sql, params) in enumerate(checks, 1):
+            result = {'page': page, 'name': name}
+            result.update(time_query(conn, sql, tuple(params), repeat))
+            results.append(result)
+            if progress is not None:
+                progress(number, len(checks))
+    finally:
+        conn.close()
+
+    return {
+        'generated_at': timestamps.now(),
+        'db_path': os.path.abspath(db_path),
+        'db_bytes': os.path.getsize(db_path),
+        'sqlite_version': sqlite3.sqlite_version,
+        'python_version': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'dataset': dataset,
+        'queries': results,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Return the queries whose median grew by more than tolerance times over the baseline"""
+    previous = {(entry['page'], entry['name']): entry for entry in baseline['queries']}
+    regressions = []
+    for entry in results['queries']:
+        before = previous.get((entry['page'], entry['name']))
+        if before is None or before['median_ms'] <= 0:
+            continue
+        ratio = entry['median_ms'] / before['median_ms']
+        if ratio > tolerance:
+            regressions.append({'page': entry['page'], 'name': entry['name'], 'ratio': ratio,
+                                'median_ms': entry['median_ms'], 'baseline_median_ms': before['median_ms']})
+    return regressions
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Benchmark the page queries')
+    parser.add_argument('db_path', help='database to benchmark, e.g. one made by synthetic_data.py')
+    parser.add_argument('--repeat', type=int, default=REPEAT, help='timed runs per query after the warm-up')
+    parser.add_argument('--output', help='write the JSON results here instead of to stdout')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=1.5,
+                        help='median slowdown (times) above which a query counts as a regression')
+    args = parser.parse_args(argv[1:])
+
+    def report_progress(done, total):
+        print(f"\r{done}/{total} queries", end='', file=sys.stderr, flush=True)
+    results = run_benchmark(args.db_path, args.repeat, report_progress)
+    print(file=sys.stderr)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.tolerance)
+        results['baseline'] = os.path.abspath(args.baseline)
+        results['regressions'] = regressions
+
+    for entry in results['queries']:
+        print(f"{entry['page']:<16} {entry['name']:<40} {entry['median_ms']:>9.2f} ms {entry['rows']:>7} rows",
+              file=sys.stderr)
+    for regression in regressions:
+        print(f"REGRESSION {regression['page']}.{regression['name']}: {regression['baseline_median_ms']:.2f} ms"
+              f" -> {regression['median_ms']:.2f} ms ({regression['ratio']:.1f}x)", file=sys.stderr)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(output + '\n')
+    else:
+        print(output)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,81 @@
+"""Bulk ticket updates over everything that matches the ticket list filters.
+
+Rather than collecting ticket ids and sending them back in one huge IN
+list, each chunk is a single UPDATE whose WHERE clause is the list's own
+filter, limited to the next chunk of ids. Every chunk commits on its own,
+so other sessions get the write lock between chunks and a batch of
+thousands of tickets never blocks them for long.
+"""
+import os
+
+import queries
+import timestamps
+from database import DB_PATH, get_connection
+
+# Tickets updated per transaction
+CHUNK_SIZE = int(os.environ.get('TICKETS_BULK_CHUNK_SIZE', '500'))
+
+# Columns a bulk update may set
+BULK_COLUMNS = ('status_id', 'priority_id', 'assignee_id')
+
+
+def count_matching(match, db_path=DB_PATH):
+    """Dry run: how many tickets a bulk update with these filters would touch.
+
+    match holds the ticket list filters (see queries.ticket_match_clauses).
+    """
+    query, params = queries.bulk_count_query(**match)
+    conn = get_connection(db_path)
+    try:
+        return conn.execute(query, params).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def update_matching(changes, match, db_path=DB_PATH, chunk_size=CHUNK_SIZE, progress=None):
+    """Apply changes ({column: value}) to every ticket matching the filters.
+
+    Tickets are walked in id order, chunk_size per transaction, so tickets
+    that still match after being updated are not visited twice. progress,
+    if given, is called with (tickets updated, tickets expected) after each
+    chunk; the expected total comes from a count taken up front. Returns
+    the number of tickets updated. Moving tickets to a completed status
+    stamps resolved_at on those that were not resolved before.
+    """
+    unknown = set(changes) - set(BULK_COLUMNS)
+    if unknown:
+        raise ValueError(f"Cannot bulk update {', '.join(sorted(unknown))}")
+    if not changes:
+        return 0
+
+    total = count_matching(match, db_path)
+
+    updated = 0
+    last_id = 0
+    conn = get_connection(db_path)
+    try:
+        changes = dict(changes)
+        if 'status_id' in changes:
+            status = conn.execute(queries.STATUS_NAME, (changes['status_id'],)).fetchone()
+            if status is not None and status[0] in queries.COMPLETED_STATUSES:
+                changes['resolved_at'] = timestamps.now()
+        columns = list(changes)
+        query, match_params = queries.bulk_update_query(columns, **match)
+        values = [changes[column] for column in columns]
+
+        while True:
+            params = values + [timestamps.now(), last_id] + match_params + [chunk_size]
+            ids = [row[0] for row in conn.execute(query, params).fetchall()]
+            conn.commit()
+            if not ids:
+                break
+            updated += len(ids)
+            last_id = max(ids)
+            if progress is not None:
+                progress(updated, max(total, updated))
+            if len(ids) < chunk_size:
+                break
+    finally:
+        conn.close()
+
+    return updated
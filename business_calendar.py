@@ -0,0 +1,127 @@
+"""Working-time arithmetic for SLA deadlines.
+
+A BusinessCalendar knows its daily opening hours, working weekdays and
+holidays. It precomputes, for a window of days, the epoch each day opens and
+closes and the cumulative working seconds before each day. Adding N working
+minutes to a timestamp is then two binary searches over those arrays rather
+than a walk through the calendar, for one ticket (bisect) or a whole column
+of tickets (numpy.searchsorted). The window grows on demand.
+"""
+import bisect
+import threading
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+import timestamps
+
+# Days covered either side of today when a calendar is first built
+INITIAL_PAST_DAYS = 400
+INITIAL_FUTURE_DAYS = 400
+
+WEEKDAY_NAMES = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+
+class BusinessCalendar:
+    """Opening hours (minutes after local midnight), working weekdays (Monday=0) and holidays"""
+
+    def __init__(self, opens_minute, closes_minute, workdays, holidays=()):
+        if not workdays or not 0 <= opens_minute < closes_minute <= 24 * 60:
+            raise ValueError("A business calendar needs working days and an opening time before its closing time")
+        self.opens_minute = opens_minute
+        self.closes_minute = closes_minute
+        self.workdays = frozenset(workdays)
+        self.holidays = frozenset(holidays)
+        # Pages share calendars across threads and a lookup may grow the window
+        self._lock = threading.Lock()
+        today = date.today()
+        self._build(today - timedelta(days=INITIAL_PAST_DAYS), today + timedelta(days=INITIAL_FUTURE_DAYS))
+
+    def add_minutes(self, start, minutes):
+        """Return the epoch reached after working `minutes` from epoch `start`"""
+        with self._lock:
+            self._cover(start, start)
+            target = self._working_seconds_at(start) + minutes * 60
+            while target > self._cumulative[-1]:
+                self._extend()
+            # First day whose working time, added to everything before it, reaches the target
+            day = bisect.bisect_left(self._cumulative, target, 1) - 1
+            return self._opens[day] + (target - self._cumulative[day])
+
+    def add_minutes_array(self, starts, minutes):
+        """Vectorized add_minutes() over float arrays; NaN in either gives NaN"""
+        starts = np.asarray(starts, dtype=float)
+        minutes = np.asarray(minutes, dtype=float)
+        result = np.full(starts.shape, np.nan)
+        valid = ~(np.isnan(starts) | np.isnan(minutes))
+        if not valid.any():
+            return result
+
+        starts, minutes = starts[valid], minutes[valid]
+        with self._lock:
+            self._cover(starts.min(), starts.max())
+            day = np.searchsorted(self._day_starts_array, starts, side='right') - 1
+            worked_today = np.clip(starts - self._opens_array[day], 0, self._lengths_array[day])
+            targets = self._cumulative_array[day] + worked_today + minutes * 60
+            while targets.max() > self._cumulative[-1]:
+                self._extend()
+
+            day = np.searchsorted(self._cumulative_array[1:], targets, side='left')
+            result[valid] = self._opens_array[day] + (targets - self._cumulative_array[day])
+        return result
+
+    def is_working_day(self, day):
+        """True if a date is a working weekday and not a holiday"""
+        return day.weekday() in self.workdays and day not in self.holidays
+
+    def _working_seconds_at(self, moment):
+        """Working seconds between the start of the window and an epoch"""
+        day = bisect.bisect_right(self._day_starts, moment) - 1
+        worked_today = min(max(moment - self._opens[day], 0), self._closes[day] - self._opens[day])
+        return self._cumulative[day] + worked_today
+
+    def _cover(self, first, last):
+        """Make sure the window spans the days of two epochs"""
+        first_day = min(timestamps.from_epoch(first).date() - timedelta(days=1), self._first_day)
+        last_day = max(timestamps.from_epoch(last).date() + timedelta(days=366), self._last_day)
+        if first_day < self._first_day or timestamps.from_epoch(last).date() >= self._last_day:
+            self._build(first_day, last_day)
+
+    def _extend(self):
+        self._build(self._first_day, self._last_day + timedelta(days=max(366, (self._last_day - self._first_day).days)))
+
+    def _build(self, first_day, last_day):
+        day_starts, opens, closes = [], [], []
+        cumulative = [0]
+        day = first_day
+        while day <= last_day:
+            midnight = datetime.combine(day, datetime.min.time())
+            day_starts.append(timestamps.to_epoch(midnight))
+            if self.is_working_day(day):
+                # Computed per day from local wall-clock time, so DST shifts are respected
+                opens.append(timestamps.to_epoch(midnight + timedelta(minutes=self.opens_minute)))
+                closes.append(timestamps.to_epoch(midnight + timedelta(minutes=self.closes_minute)))
+            else:
+                opens.append(day_starts[-1])
+                closes.append(day_starts[-1])
+            cumulative.append(cumulative[-1] + closes[-1] - opens[-1])
+            day += timedelta(days=1)
+
+        self._first_day, self._last_day = first_day, last_day
+        self._day_starts, self._opens, self._closes = day_starts, opens, closes
+        # cumulative[i] is the working time before day i; it has one more entry than there are days
+        self._cumulative = cumulative
+        self._day_starts_array = np.array(day_starts, dtype=float)
+        self._opens_array = np.array(opens, dtype=float)
+        self._lengths_array = np.array(closes, dtype=float) - self._opens_array
+        self._cumulative_array = np.array(cumulative, dtype=float)
+
+
+def parse_workdays(text):
+    """'0,1,2,3,4' -> {0, 1, 2, 3, 4}"""
+    return {int(part) for part in text.split(',') if part.strip()}
+
+
+def format_workdays(workdays):
+    """{0, 1, 2, 3, 4} -> 'Mon, Tue, Wed, Thu, Fri'"""
+    return ', '.join(WEEKDAY_NAMES[day] for day in sorted(workdays))
@@ -0,0 +1,178 @@
+"""Process-wide SQLite connection management.
+
+Connections are opened once, tuned with the pragmas below and then recycled
+through a small pool, so a page render no longer pays for ``connect()`` and
+pragma setup on every widget interaction. Calling ``close()`` on a pooled
+connection rolls back anything left uncommitted and hands it back to the
+pool instead of closing it.
+"""
+import os
+import sqlite3
+import threading
+
+import query_log
+
+DB_PATH = os.environ.get('TICKETS_DB_PATH', 'tickets.db')
+
+# Maximum number of idle connections kept open between uses
+POOL_SIZE = int(os.environ.get('TICKETS_DB_POOL_SIZE', '8'))
+
+# How long a connection waits on a locked database before raising
+BUSY_TIMEOUT_MS = int(os.environ.get('TICKETS_DB_BUSY_TIMEOUT_MS', '5000'))
+
+# Page cache per connection (KiB) and memory-mapped I/O window (bytes)
+CACHE_SIZE_KB = int(os.environ.get('TICKETS_DB_CACHE_SIZE_KB', '16384'))
+MMAP_SIZE = int(os.environ.get('TICKETS_DB_MMAP_SIZE', str(256 * 1024 * 1024)))
+
+
+class PooledConnection(sqlite3.Connection):
+    """SQLite connection whose close() returns it to its pool"""
+
+    pool = None
+
+    def cursor(self, factory=None):
+        # Statements are timed by the query log unless it is switched off
+        if factory is None:
+            factory = query_log.InstrumentedCursor if query_log.ENABLED else sqlite3.Cursor
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def close(self):
+        if self.pool is None:
+            super().close()
+        else:
+            self.pool.release(self)
+
+    def discard(self):
+        """Really close the underlying connection"""
+        super().close()
+
+
+class ConnectionPool:
+    """Thread-safe pool of tuned connections to one database file"""
+
+    def __init__(self, db_path, size=POOL_SIZE):
+        self.db_path = db_path
+        self.size = size
+        self._idle = []
+        # id(conn) -> (conn, ident of the thread that checked it out)
+        self._in_use = {}
+        self._lock = threading.Lock()
+        self._created = 0
+
+    def acquire(self):
+        """Check out a connection for the calling thread"""
+        with self._lock:
+            self._reclaim_orphans()
+            conn = self._idle.pop() if self._idle else None
+
+        if conn is None:
+            conn = self._open()
+
+        with self._lock:
+            self._in_use[id(conn)] = (conn, threading.get_ident())
+        return conn
+
+    def release(self, conn):
+        """Return a connection to the pool, discarding any open transaction"""
+        with self._lock:
+            # Closing twice must not put the same connection in the pool twice
+            if self._in_use.pop(id(conn), None) is None:
+                return
+
+        if conn.in_transaction:
+            conn.rollback()
+
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+
+        conn.discard()
+
+    def close_all(self):
+        """Close every idle connection (checked-out ones close on release)"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.discard()
+
+    def stats(self):
+        """Return a snapshot of pool usage"""
+        with self._lock:
+            threads = {ident for _, ident in self._in_use.values()}
+            return {
+                'db_path': self.db_path,
+                'size': self.size,
+                'idle': len(self._idle),
+                'in_use': len(self._in_use),
+                'threads': len(threads),
+                'created': self._created,
+            }
+
+    def _open(self):
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,
+            factory=PooledConnection,
+        )
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('PRAGMA synchronous = NORMAL')
+        conn.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}')
+        conn.execute('PRAGMA foreign_keys = ON')
+        conn.execute(f'PRAGMA cache_size = -{CACHE_SIZE_KB}')
+        conn.execute(f'PRAGMA mmap_size = {MMAP_SIZE}')
+        conn.execute('PRAGMA temp_store = MEMORY')
+        conn.pool = self
+
+        with self._lock:
+            self._created += 1
+        return conn
+
+    def _reclaim_orphans(self):
+        """Take back connections whose owning thread exited without closing them.
+
+        Streamlit runs each script rerun on its own thread and st.rerun()
+        unwinds the page by raising, so a page that never reaches its
+        close() call would otherwise leak the connection. Caller holds the lock.
+        """
+        if not self._in_use:
+            return
+        alive = {thread.ident for thread in threading.enumerate()}
+        for key, (conn, ident) in list(self._in_use.items()):
+            if ident in alive:
+                continue
+            del self._in_use[key]
+            if conn.in_transaction:
+                conn.rollback()
+            if len(self._idle) < self.size:
+                self._idle.append(conn)
+            else:
+                conn.discard()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path=DB_PATH):
+    """Return the process-wide pool for a database file"""
+    key = os.path.abspath(db_path)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = _pools[key] = ConnectionPool(db_path)
+    return pool
+
+
+def get_connection(db_path=DB_PATH):
+    """Check out a pooled connection; call close() to give it back"""
+    return get_pool(db_path).acquire()
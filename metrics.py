@@ -0,0 +1,166 @@
+"""Application metrics in the Prometheus text format.
+
+Counters, gauges and histograms are updated from page code, the query log
+and the SLA worker, so an update has to stay cheap under contention. An
+update only appends an event to a deque, which is thread-safe without a
+lock. Events are folded into the totals by whichever thread finds
+DRAIN_AT of them waiting and gets the drain lock without blocking, and by
+render() before every scrape. Only the thread holding the drain lock ever
+touches the totals. metrics_exporter.py serves render() over HTTP.
+
+Set TICKETS_METRICS=0 to turn every update into a no-op.
+"""
+import bisect
+import collections
+import os
+import threading
+
+ENABLED = os.environ.get('TICKETS_METRICS', '1') != '0'
+
+# Waiting events that make an updating thread fold them into the totals
+DRAIN_AT = 4096
+
+_events = collections.deque()
+_drain_lock = threading.Lock()
+_registry = []
+
+
+class Metric:
+    """A named metric with optional labels; labels are passed positionally"""
+
+    type = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        # Unlabelled metrics are exported from the start, even at zero
+        if not self.labels:
+            self._values[()] = self._initial()
+        _registry.append(self)
+
+    def _initial(self):
+        return 0
+
+    def _emit(self, labels, value):
+        if not ENABLED:
+            return
+        _events.append((self, labels, value))
+        if len(_events) >= DRAIN_AT and _drain_lock.acquire(blocking=False):
+            try:
+                _drain()
+            finally:
+                _drain_lock.release()
+
+    def _label_text(self, labels, extra=''):
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labels, labels)]
+        if extra:
+            pairs.append(extra)
+        return '{' + ','.join(pairs) + '}' if pairs else ''
+
+    def _samples(self):
+        for labels, value in sorted(self._values.items()):
+            yield f'{self.name}{self._label_text(labels)} {_number(value)}'
+
+
+class Counter(Metric):
+    """Monotonic total, e.g. logins"""
+
+    type = 'counter'
+
+    def inc(self, *labels, amount=1):
+        self._emit(labels, amount)
+
+    def _apply(self, labels, amount):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    """Value that is set rather than added to, e.g. the open backlog"""
+
+    type = 'gauge'
+
+    def set(self, value, *labels):
+        self._emit(labels, value)
+
+    def _apply(self, labels, value):
+        self._values[labels] = value
+
+
+class Histogram(Metric):
+    """Observations counted into cumulative buckets, with their sum and count"""
+
+    type = 'histogram'
+
+    def __init__(self, name, help_text, buckets, labels=()):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help_text, labels)
+
+    def _initial(self):
+        # [per-bucket counts (the last is +Inf), sum]
+        return [[0] * (len(self.buckets) + 1), 0.0]
+
+    def observe(self, value, *labels):
+        self._emit(labels, value)
+
+    def _apply(self, labels, value):
+        entry = self._values.get(labels)
+        if entry is None:
+            entry = self._values[labels] = self._initial()
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    def _samples(self):
+        for labels, (counts, total) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else _number(bound)
+                bucket_labels = self._label_text(labels, 'le="' + le + '"')
+                yield f'{self.name}_bucket{bucket_labels} {cumulative}'
+            yield f'{self.name}_sum{self._label_text(labels)} {_number(total)}'
+            yield f'{self.name}_count{self._label_text(labels)} {cumulative}'
+
+
+def _drain():
+    """Fold waiting events into the totals (caller holds _drain_lock)"""
+    popleft = _events.popleft
+    while True:
+        try:
+            metric, labels, value = popleft()
+        except IndexError:
+            return
+        metric._apply(labels, value)
+
+
+def render():
+    """Return every metric in the Prometheus text exposition format"""
+    lines = []
+    with _drain_lock:
+        _drain()
+        for metric in _registry:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            lines.extend(metric._samples())
+    return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+LOGINS = Counter('tickets_logins_total', 'Sign-in attempts by outcome', ['result'])
+TICKETS_CREATED = Counter('tickets_created_total', 'Tickets created')
+COMMENTS_POSTED = Counter('tickets_comments_posted_total', 'Comments posted by visibility', ['visibility'])
+DB_STATEMENT_SECONDS = Histogram(
+    'tickets_db_statement_seconds', 'SQLite statement time, including fetching its rows',
+    [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5])
+SQLITE_BUSY = Counter('tickets_sqlite_busy_total', 'Statements that gave up waiting on a locked database')
+SLA_BREACHES = Counter('tickets_sla_breaches_total', 'Tickets escalated by this process\'s SLA worker')
+OPEN_TICKETS = Gauge('tickets_open', 'Tickets not Resolved or Closed, by priority', ['priority'])
+SLA_BREACHED_OPEN = Gauge('tickets_sla_breached_open', 'Tickets not Resolved or Closed that have breached their SLA')
@@ -0,0 +1,83 @@
+"""HTTP endpoint serving the metrics (metrics.py) for Prometheus to scrape.
+
+start() runs a small HTTP server on a daemon thread, once per process. Each
+scrape of /metrics refreshes the gauges that come from the database, the
+open backlog by priority (off the daily_ticket_stats rollup) and the SLA
+breaches still open (off the escalation index), and then returns every
+metric. The server listens on localhost unless TICKETS_METRICS_ADDRESS
+says otherwise. Set TICKETS_METRICS_PORT=0 to leave it off.
+"""
+import http.server
+import os
+import threading
+
+import metrics
+import queries
+from database import DB_PATH, get_connection
+
+# Port the exporter listens on; 0 switches it off
+PORT = int(os.environ.get('TICKETS_METRICS_PORT', '9464'))
+
+# Interface the exporter binds to
+ADDRESS = os.environ.get('TICKETS_METRICS_ADDRESS', '127.0.0.1')
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class MetricsHandler(http.server.BaseHTTPRequestHandler):
+    """Answers GET /metrics with the Prometheus text format"""
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = collect(self.server.db_path).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes every few seconds would flood the app's log
+        pass
+
+
+def collect(db_path=DB_PATH):
+    """Refresh the gauges read from the database and return every metric"""
+    conn = get_connection(db_path)
+    try:
+        for priority, count in conn.execute(queries.METRICS_OPEN_BY_PRIORITY):
+            metrics.OPEN_TICKETS.set(count, priority)
+        breached = conn.execute(queries.METRICS_SLA_BREACHED_OPEN).fetchone()[0]
+    finally:
+        conn.close()
+    metrics.SLA_BREACHED_OPEN.set(breached)
+    return metrics.render()
+
+
+_server = None
+_started = False
+_server_lock = threading.Lock()
+
+
+def start(db_path=DB_PATH):
+    """Start the process-wide exporter (a no-op once tried).
+
+    Returns the server, or None when metrics are off or the port is taken,
+    e.g. by another app process that is already exporting.
+    """
+    global _server, _started
+    if not metrics.ENABLED or not PORT:
+        return None
+    if not _started:
+        with _server_lock:
+            if not _started:
+                _started = True
+                try:
+                    _server = http.server.ThreadingHTTPServer((ADDRESS, PORT), MetricsHandler)
+                except OSError:
+                    return None
+                _server.db_path = db_path
+                threading.Thread(target=_server.serve_forever, name='metrics-exporter', daemon=True).start()
+    return _server
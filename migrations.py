@@ -0,0 +1,901 @@
+"""Versioned schema migrations for the ticketing database.
+
+The schema version is stored in SQLite's ``PRAGMA user_version``. Each
+migration is a numbered function that runs inside its own write transaction
+and bumps the version when it commits, so a database is only ever touched by
+the migrations it has not seen yet.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+
+# Registered migrations as (version, description, function), in version order
+MIGRATIONS = []
+
+# Databases already brought up to date by this process
+_migrated = set()
+_migrate_lock = threading.Lock()
+
+
+def migration(version, description):
+    """Register a function as the migration for a schema version"""
+    def decorator(func):
+        if MIGRATIONS and version != MIGRATIONS[-1][0] + 1:
+            raise ValueError(f"Migration {version} is out of sequence")
+        MIGRATIONS.append((version, description, func))
+        return func
+    return decorator
+
+
+def latest_version():
+    """Return the schema version the registered migrations lead to"""
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def get_schema_version(conn):
+    """Read the schema version stored in the database"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(db_path):
+    """Apply pending migrations to the database once per process.
+
+    Subsequent calls for the same database return without opening a
+    connection, so this is safe to call from every Streamlit rerun.
+    """
+    key = os.path.abspath(db_path)
+    if key in _migrated:
+        return
+
+    with _migrate_lock:
+        if key in _migrated:
+            return
+
+        conn = sqlite3.connect(db_path, isolation_level=None)
+        try:
+            # Cheap read-only check first; only take the write lock if needed
+            if get_schema_version(conn) < latest_version():
+                _apply_pending(conn)
+        finally:
+            conn.close()
+
+        _migrated.add(key)
+
+
+def _apply_pending(conn):
+    """Run every migration newer than the stored version, one transaction each"""
+    for version, description, func in MIGRATIONS:
+        # BEGIN IMMEDIATE serializes concurrent processes racing to migrate
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if get_schema_version(conn) >= version:
+                conn.execute('ROLLBACK')
+                continue
+            func(conn.cursor())
+            conn.execute(f'PRAGMA user_version = {int(version)}')
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+
+@migration(1, 'Base schema and default data')
+def _create_base_schema(cursor):
+    # Users table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            full_name TEXT NOT NULL,
+            role TEXT NOT NULL CHECK (role IN ('admin', 'it_staff', 'user')),
+            department TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Categories table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS categories (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            description TEXT
+        )
+    ''')
+
+    # Priorities table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS priorities (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            level INTEGER UNIQUE NOT NULL,
+            color TEXT NOT NULL
+        )
+    ''')
+
+    # Statuses table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS statuses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            description TEXT
+        )
+    ''')
+
+    # Tickets table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS tickets (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ticket_number TEXT UNIQUE NOT NULL,
+            title TEXT NOT NULL,
+            description TEXT NOT NULL,
+            status_id INTEGER,
+            priority_id INTEGER,
+            category_id INTEGER,
+            requester_id INTEGER,
+            assignee_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            resolved_at TIMESTAMP,
+            sla_response_due TIMESTAMP,
+            sla_resolution_due TIMESTAMP,
+            first_response_at TIMESTAMP,
+            escalated_at TIMESTAMP,
+            FOREIGN KEY (status_id) REFERENCES statuses(id),
+            FOREIGN KEY (priority_id) REFERENCES priorities(id),
+            FOREIGN KEY (category_id) REFERENCES categories(id),
+            FOREIGN KEY (requester_id) REFERENCES users(id),
+            FOREIGN KEY (assignee_id) REFERENCES users(id)
+        )
+    ''')
+
+    # Comments table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS comments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ticket_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            content TEXT NOT NULL,
+            is_internal BOOLEAN DEFAULT FALSE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (ticket_id) REFERENCES tickets(id) ON DELETE CASCADE,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    ''')
+
+    # Time tracking table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS time_entries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ticket_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            description TEXT,
+            time_spent_minutes INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (ticket_id) REFERENCES tickets(id) ON DELETE CASCADE,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    ''')
+
+    # Knowledge base table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS knowledge_base (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT UNIQUE NOT NULL,
+            content TEXT NOT NULL,
+            category_id INTEGER,
+            tags TEXT,
+            is_public BOOLEAN DEFAULT TRUE,
+            created_by INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (category_id) REFERENCES categories(id),
+            FOREIGN KEY (created_by) REFERENCES users(id)
+        )
+    ''')
+
+    # Insert default data
+    cursor.execute('''
+        INSERT OR IGNORE INTO categories (name, description) VALUES
+        ('Hardware', 'Issues related to computer hardware, printers, etc.'),
+        ('Software', 'Software installation, configuration, or bugs'),
+        ('Network', 'Network connectivity and infrastructure issues'),
+        ('Email', 'Email client and server issues'),
+        ('Security', 'Security-related concerns and access issues'),
+        ('Account', 'User account management and access'),
+        ('Other', 'Miscellaneous issues')
+    ''')
+
+    cursor.execute('''
+        INSERT OR IGNORE INTO priorities (name, level, color) VALUES
+        ('Low', 1, '#10B981'),
+        ('Medium', 2, '#F59E0B'),
+        ('High', 3, '#EF4444'),
+        ('Critical', 4, '#DC2626')
+    ''')
+
+    cursor.execute('''
+        INSERT OR IGNORE INTO statuses (name, description) VALUES
+        ('Open', 'New ticket awaiting assignment'),
+        ('In Progress', 'Ticket is being worked on'),
+        ('Pending User', 'Waiting for user response'),
+        ('Pending Vendor', 'Waiting for vendor response'),
+        ('Resolved', 'Issue has been resolved'),
+        ('Closed', 'Ticket is closed')
+    ''')
+
+    # Create demo users for all roles
+    admin_password = hashlib.sha256('admin123'.encode()).hexdigest()
+    it_staff_password = hashlib.sha256('itstaff123'.encode()).hexdigest()
+    user_password = hashlib.sha256('user123'.encode()).hexdigest()
+
+    cursor.execute('''
+        INSERT OR IGNORE INTO users (username, password_hash, email, full_name, role, department)
+        VALUES
+        ('admin', ?, 'admin@company.com', 'Admin User', 'admin', 'IT'),
+        ('itstaff', ?, 'itstaff@company.com', 'IT Staff User', 'it_staff', 'IT'),
+        ('user', ?, 'user@company.com', 'Regular User', 'user', 'Sales')
+    ''', (admin_password, it_staff_password, user_password))
+
+    # Insert default knowledge base entries (only if they don't exist)
+    cursor.execute('''
+        INSERT OR IGNORE INTO knowledge_base (title, content, category_id, tags, created_by) VALUES
+        ('How to Reset Your Password', 'To reset your password:\n1. Go to the login page\n2. Click "Forgot Password"\n3. Enter your email address\n4. Check your email for reset instructions\n5. Follow the link and create a new password', 6, 'password,reset,login', 1),
+        ('Common Printer Issues', 'Common printer problems and solutions:\n\n1. Printer not responding:\n   - Check power and USB connections\n   - Restart the printer\n   - Reinstall printer drivers\n\n2. Print quality issues:\n   - Clean print heads\n   - Replace ink/toner cartridges\n   - Check paper quality', 1, 'printer,hardware,troubleshooting', 1),
+        ('VPN Connection Guide', 'How to connect to company VPN:\n\n1. Download VPN client from IT portal\n2. Install and launch the application\n3. Enter your credentials\n4. Select appropriate server location\n5. Click Connect\n\nIf issues persist, contact IT support.', 3, 'vpn,network,remote', 1)
+    ''')
+
+    # Clean up duplicate knowledge base entries left by older versions
+    cursor.execute('''
+        DELETE FROM knowledge_base
+        WHERE id NOT IN (
+            SELECT MIN(id)
+            FROM knowledge_base
+            GROUP BY title
+        )
+    ''')
+
+
+@migration(2, 'Secondary indexes for the hot page queries')
+def _create_query_indexes(cursor):
+    # Ticket lists and dashboard: per-requester and per-filter lookups that
+    # come back already ordered by created_at
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tickets_created ON tickets (created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tickets_requester_created ON tickets (requester_id, created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tickets_requester_status ON tickets (requester_id, status_id, created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tickets_status_created ON tickets (status_id, created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tickets_priority_created ON tickets (priority_id, created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tickets_category_created ON tickets (category_id, created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tickets_assignee_status ON tickets (assignee_id, status_id)')
+
+    # Dashboard SLA alerts
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tickets_sla_response_due ON tickets (sla_response_due)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tickets_sla_resolution_due ON tickets (sla_resolution_due)')
+
+    # Reports filter on DATE(created_at), which can only use an expression index
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tickets_created_date ON tickets (DATE(created_at))')
+
+    # Ticket detail comment thread and time log
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_comments_ticket_created ON comments (ticket_id, created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_time_entries_ticket_created ON time_entries (ticket_id, created_at)')
+
+    # Per-user totals, the time tracking log and the time report
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_time_entries_user_created ON time_entries (user_id, created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_time_entries_created ON time_entries (created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_time_entries_created_date ON time_entries (DATE(created_at))')
+
+
+@migration(3, 'Full-text index over the knowledge base')
+def _create_knowledge_base_fts(cursor):
+    # External-content FTS5 table: the text stays in knowledge_base and the
+    # index only stores tokens, kept in sync by the triggers below
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS knowledge_base_fts USING fts5(
+            title, content, tags,
+            content='knowledge_base', content_rowid='id',
+            tokenize='porter unicode61', prefix='2 3'
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS knowledge_base_fts_insert AFTER INSERT ON knowledge_base BEGIN
+            INSERT INTO knowledge_base_fts (rowid, title, content, tags)
+            VALUES (new.id, new.title, new.content, new.tags);
+        END
+    ''')
+
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS knowledge_base_fts_delete AFTER DELETE ON knowledge_base BEGIN
+            INSERT INTO knowledge_base_fts (knowledge_base_fts, rowid, title, content, tags)
+            VALUES ('delete', old.id, old.title, old.content, old.tags);
+        END
+    ''')
+
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS knowledge_base_fts_update AFTER UPDATE OF title, content, tags ON knowledge_base BEGIN
+            INSERT INTO knowledge_base_fts (knowledge_base_fts, rowid, title, content, tags)
+            VALUES ('delete', old.id, old.title, old.content, old.tags);
+            INSERT INTO knowledge_base_fts (rowid, title, content, tags)
+            VALUES (new.id, new.title, new.content, new.tags);
+        END
+    ''')
+
+    # Index the articles that already exist
+    cursor.execute("INSERT INTO knowledge_base_fts (knowledge_base_fts) VALUES ('rebuild')")
+
+
+@migration(4, 'Full-text index over tickets and comments')
+def _create_ticket_search_fts(cursor):
+    # Ticket titles and descriptions
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS tickets_fts USING fts5(
+            title, description,
+            content='tickets', content_rowid='id',
+            tokenize='porter unicode61', prefix='2 3'
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS tickets_fts_insert AFTER INSERT ON tickets BEGIN
+            INSERT INTO tickets_fts (rowid, title, description)
+            VALUES (new.id, new.title, new.description);
+        END
+    ''')
+
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS tickets_fts_delete AFTER DELETE ON tickets BEGIN
+            INSERT INTO tickets_fts (tickets_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+        END
+    ''')
+
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS tickets_fts_update AFTER UPDATE OF title, description ON tickets BEGIN
+            INSERT INTO tickets_fts (tickets_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+            INSERT INTO tickets_fts (rowid, title, description)
+            VALUES (new.id, new.title, new.description);
+        END
+    ''')
+
+    # Comment threads (comments are never edited, only added and removed)
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS comments_fts USING fts5(
+            content,
+            content='comments', content_rowid='id',
+            tokenize='porter unicode61', prefix='2 3'
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS comments_fts_insert AFTER INSERT ON comments BEGIN
+            INSERT INTO comments_fts (rowid, content) VALUES (new.id, new.content);
+        END
+    ''')
+
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS comments_fts_delete AFTER DELETE ON comments BEGIN
+            INSERT INTO comments_fts (comments_fts, rowid, content)
+            VALUES ('delete', old.id, old.content);
+        END
+    ''')
+
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS comments_fts_update AFTER UPDATE OF content ON comments BEGIN
+            INSERT INTO comments_fts (comments_fts, rowid, content)
+            VALUES ('delete', old.id, old.content);
+            INSERT INTO comments_fts (rowid, content) VALUES (new.id, new.content);
+        END
+    ''')
+
+    # Index what already exists
+    cursor.execute("INSERT INTO tickets_fts (tickets_fts) VALUES ('rebuild')")
+    cursor.execute("INSERT INTO comments_fts (comments_fts) VALUES ('rebuild')")
+
+
+@migration(5, 'Version counter for cached reference data')
+def _create_reference_data_version(cursor):
+    # Single-row counter bumped by any change to the lookup tables or to the
+    # user fields the staff list shows, so cached copies know to reload
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS reference_data_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('INSERT OR IGNORE INTO reference_data_version (id, version) VALUES (1, 0)')
+
+    bump = 'UPDATE reference_data_version SET version = version + 1 WHERE id = 1;'
+    for table in ('statuses', 'priorities', 'categories', 'users'):
+        for event in ('INSERT', 'DELETE'):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_reference_{event.lower()} AFTER {event} ON {table} BEGIN
+                    {bump}
+                END
+            ''')
+
+    for table, columns in (('statuses', 'name'),
+                           ('priorities', 'name, level'),
+                           ('categories', 'name'),
+                           ('users', 'full_name, role')):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_reference_update AFTER UPDATE OF {columns} ON {table} BEGIN
+                {bump}
+            END
+        ''')
+
+
+@migration(6, "Index comments by author for the ticket picker")
+def _create_comment_author_index(cursor):
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_comments_user_created ON comments (user_id, created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tickets_assignee_updated ON tickets (assignee_id, updated_at)')
+
+
+# Epoch seconds for "now", used as the default of the integer timestamp columns
+_EPOCH_NOW = "(CAST(strftime('%s', 'now') AS INTEGER))"
+
+
+@migration(7, 'Store ticket, comment and time entry timestamps as epoch seconds')
+def _convert_timestamps_to_epoch(cursor):
+    # CURRENT_TIMESTAMP columns hold UTC text; the SLA due dates were written
+    # from datetime.now() and so hold local time
+    _rebuild_with_epoch_columns(cursor, 'tickets', f'''
+        CREATE TABLE {{table}} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ticket_number TEXT UNIQUE NOT NULL,
+            title TEXT NOT NULL,
+            description TEXT NOT NULL,
+            status_id INTEGER,
+            priority_id INTEGER,
+            category_id INTEGER,
+            requester_id INTEGER,
+            assignee_id INTEGER,
+            created_at INTEGER DEFAULT {_EPOCH_NOW},
+            updated_at INTEGER DEFAULT {_EPOCH_NOW},
+            resolved_at INTEGER,
+            sla_response_due INTEGER,
+            sla_resolution_due INTEGER,
+            first_response_at INTEGER,
+            escalated_at INTEGER,
+            FOREIGN KEY (status_id) REFERENCES statuses(id),
+            FOREIGN KEY (priority_id) REFERENCES priorities(id),
+            FOREIGN KEY (category_id) REFERENCES categories(id),
+            FOREIGN KEY (requester_id) REFERENCES users(id),
+            FOREIGN KEY (assignee_id) REFERENCES users(id)
+        )
+    ''', utc_columns=('created_at', 'updated_at', 'resolved_at', 'first_response_at', 'escalated_at'),
+        local_columns=('sla_response_due', 'sla_resolution_due'))
+
+    _rebuild_with_epoch_columns(cursor, 'comments', f'''
+        CREATE TABLE {{table}} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ticket_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            content TEXT NOT NULL,
+            is_internal BOOLEAN DEFAULT FALSE,
+            created_at INTEGER DEFAULT {_EPOCH_NOW},
+            FOREIGN KEY (ticket_id) REFERENCES tickets(id) ON DELETE CASCADE,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    ''', utc_columns=('created_at',))
+
+    _rebuild_with_epoch_columns(cursor, 'time_entries', f'''
+        CREATE TABLE {{table}} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ticket_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            description TEXT,
+            time_spent_minutes INTEGER NOT NULL,
+            created_at INTEGER DEFAULT {_EPOCH_NOW},
+            FOREIGN KEY (ticket_id) REFERENCES tickets(id) ON DELETE CASCADE,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    ''', utc_columns=('created_at',))
+
+
+def _rebuild_with_epoch_columns(cursor, table, create_sql, utc_columns, local_columns=()):
+    """Recreate a table from create_sql, converting timestamp text to epoch seconds.
+
+    SQLite cannot change a column's type or default in place, so the rows are
+    copied into a new table that then takes the old one's name. Its indexes
+    and triggers (including the full-text sync triggers) are recreated from
+    their stored definitions; rowids are kept, so the FTS indexes stay valid.
+    The migration connection has foreign keys off, so dropping the old table
+    leaves the rows that reference it alone.
+    """
+    columns = [row[1] for row in cursor.execute(f'PRAGMA table_info({table})')]
+    dependents = cursor.execute('''
+        SELECT name, sql FROM sqlite_master
+        WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL
+    ''', (table,)).fetchall()
+    sequence = cursor.execute('SELECT seq FROM sqlite_sequence WHERE name = ?', (table,)).fetchone()
+
+    converted = []
+    for column in columns:
+        if column in utc_columns:
+            converted.append(_epoch_expression(column))
+        elif column in local_columns:
+            converted.append(_epoch_expression(column, local=True))
+        else:
+            converted.append(column)
+
+    cursor.execute(create_sql.format(table=f'{table}_new'))
+    cursor.execute(f'''
+        INSERT INTO {table}_new ({', '.join(columns)})
+        SELECT {', '.join(converted)} FROM {table}
+    ''')
+    cursor.execute(f'DROP TABLE {table}')
+    cursor.execute(f'ALTER TABLE {table}_new RENAME TO {table}')
+
+    # Keep AUTOINCREMENT from reusing the ids of deleted rows
+    if sequence is not None:
+        cursor.execute('DELETE FROM sqlite_sequence WHERE name = ?', (table,))
+        cursor.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)', (table, sequence[0]))
+
+    for name, sql in dependents:
+        # Indexes on DATE(created_at) mean nothing once the column is an integer
+        if name.endswith('_created_date'):
+            continue
+        cursor.execute(sql)
+
+
+def _epoch_expression(column, local=False):
+    """SQL converting a timestamp text column to epoch seconds, leaving numbers as they are"""
+    modifier = ", 'utc'" if local else ''
+    return (f"CASE WHEN typeof({column}) = 'text' "
+            f"THEN CAST(strftime('%s', {column}{modifier}) AS INTEGER) ELSE {column} END")
+
+
+@migration(8, 'Per-day ticket rollup for reports')
+def _create_daily_ticket_stats(cursor):
+    # One row per local calendar day the tickets were created on and per
+    # priority, category and status; 0 stands in for a missing id
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS daily_ticket_stats (
+            day TEXT NOT NULL,
+            priority_id INTEGER NOT NULL,
+            category_id INTEGER NOT NULL,
+            status_id INTEGER NOT NULL,
+            ticket_count INTEGER NOT NULL DEFAULT 0,
+            resolved_count INTEGER NOT NULL DEFAULT 0,
+            resolution_seconds INTEGER NOT NULL DEFAULT 0,
+            sla_compliant_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, priority_id, category_id, status_id)
+        ) WITHOUT ROWID
+    ''')
+
+    # Every ticket write moves the ticket's contribution from its old row to
+    # its new one, so the rollup never needs rebuilding
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS daily_ticket_stats_insert AFTER INSERT ON tickets BEGIN
+            {_daily_ticket_stats_upsert('new', 1)}
+        END
+    ''')
+
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS daily_ticket_stats_delete AFTER DELETE ON tickets BEGIN
+            {_daily_ticket_stats_upsert('old', -1)}
+        END
+    ''')
+
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS daily_ticket_stats_update
+        AFTER UPDATE OF created_at, priority_id, category_id, status_id, resolved_at,
+                        first_response_at, sla_response_due, sla_resolution_due ON tickets BEGIN
+            {_daily_ticket_stats_upsert('old', -1)}
+            {_daily_ticket_stats_upsert('new', 1)}
+        END
+    ''')
+
+    # Roll up the tickets that already exist
+    day, priority_id, category_id, status_id, resolved, resolution_seconds, sla_compliant = (
+        _daily_ticket_stats_values('tickets'))
+    cursor.execute(f'''
+        INSERT INTO daily_ticket_stats
+        SELECT {day}, {priority_id}, {category_id}, {status_id}, COUNT(*),
+               SUM({resolved}), SUM({resolution_seconds}), SUM({sla_compliant})
+        FROM tickets
+        GROUP BY 1, 2, 3, 4
+    ''')
+
+
+def _daily_ticket_stats_values(row):
+    """SQL for a ticket row's rollup key and measures, row being new, old or tickets"""
+    return (
+        f"date({row}.created_at, 'unixepoch', 'localtime')",
+        f"COALESCE({row}.priority_id, 0)",
+        f"COALESCE({row}.category_id, 0)",
+        f"COALESCE({row}.status_id, 0)",
+        f"({row}.resolved_at IS NOT NULL)",
+        f"COALESCE({row}.resolved_at - {row}.created_at, 0)",
+        # Same test as the SLA compliance report; a missing due date never complies
+        f"COALESCE(({row}.first_response_at IS NULL OR {row}.first_response_at <= {row}.sla_response_due)"
+        f" AND ({row}.resolved_at IS NULL OR {row}.resolved_at <= {row}.sla_resolution_due), 0)",
+    )
+
+
+def _daily_ticket_stats_upsert(row, sign):
+    """Trigger statement adding (sign=1) or removing (sign=-1) a ticket's contribution"""
+    day, priority_id, category_id, status_id, resolved, resolution_seconds, sla_compliant = (
+        _daily_ticket_stats_values(row))
+    return f'''
+            INSERT INTO daily_ticket_stats (day, priority_id, category_id, status_id, ticket_count,
+                                            resolved_count, resolution_seconds, sla_compliant_count)
+            VALUES ({day}, {priority_id}, {category_id}, {status_id}, {sign},
+                    {sign} * {resolved}, {sign} * {resolution_seconds}, {sign} * {sla_compliant})
+            ON CONFLICT (day, priority_id, category_id, status_id) DO UPDATE SET
+                ticket_count = ticket_count + excluded.ticket_count,
+                resolved_count = resolved_count + excluded.resolved_count,
+                resolution_seconds = resolution_seconds + excluded.resolution_seconds,
+                sla_compliant_count = sla_compliant_count + excluded.sla_compliant_count;'''
+
+
+@migration(9, 'Indexes for SLA escalation')
+def _create_sla_escalation_indexes(cursor):
+    # Deadlines still waiting to be checked; tickets drop out of these as soon
+    # as they are escalated, responded to or resolved
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_tickets_pending_response ON tickets (sla_response_due)
+        WHERE escalated_at IS NULL AND first_response_at IS NULL AND sla_response_due IS NOT NULL
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_tickets_pending_resolution ON tickets (sla_resolution_due)
+        WHERE escalated_at IS NULL AND resolved_at IS NULL AND sla_resolution_due IS NOT NULL
+    ''')
+
+    # Dashboard SLA alerts
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_tickets_escalated ON tickets (escalated_at)
+        WHERE escalated_at IS NOT NULL
+    ''')
+
+
+@migration(10, 'SLA policies by priority and category')
+def _create_sla_policies(cursor):
+    # A policy with no category applies to every category of its priority
+    # that has no policy of its own
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sla_policies (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            priority_id INTEGER NOT NULL,
+            category_id INTEGER,
+            response_minutes INTEGER NOT NULL CHECK (response_minutes > 0),
+            resolution_minutes INTEGER NOT NULL CHECK (resolution_minutes > 0),
+            FOREIGN KEY (priority_id) REFERENCES priorities(id),
+            FOREIGN KEY (category_id) REFERENCES categories(id)
+        )
+    ''')
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_sla_policies_scope
+        ON sla_policies (priority_id, COALESCE(category_id, 0))
+    ''')
+
+    # Same single-row counter as the reference data, for the cached policies
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sla_policy_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('INSERT OR IGNORE INTO sla_policy_version (id, version) VALUES (1, 0)')
+    for event in ('INSERT', 'UPDATE', 'DELETE'):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS sla_policies_version_{event.lower()} AFTER {event} ON sla_policies BEGIN
+                UPDATE sla_policy_version SET version = version + 1 WHERE id = 1;
+            END
+        ''')
+
+    # The rules calculate_sla_dates() used to hardcode, in hours
+    default_hours = [
+        ('Low', 24, 72),
+        ('Medium', 8, 24),
+        ('High', 4, 12),
+        ('Critical', 1, 4),
+    ]
+    for priority, response_hours, resolution_hours in default_hours:
+        cursor.execute('''
+            INSERT OR IGNORE INTO sla_policies (priority_id, category_id, response_minutes, resolution_minutes)
+            SELECT id, NULL, ?, ? FROM priorities WHERE name = ?
+        ''', (response_hours * 60, resolution_hours * 60, priority))
+
+
+@migration(11, 'Business-hours calendars for SLA policies')
+def _create_sla_calendars(cursor):
+    # Opening hours are minutes after local midnight; workdays are Python
+    # weekday numbers (Monday = 0), comma separated
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sla_calendars (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            opens_minute INTEGER NOT NULL,
+            closes_minute INTEGER NOT NULL,
+            workdays TEXT NOT NULL DEFAULT '0,1,2,3,4',
+            CHECK (0 <= opens_minute AND opens_minute < closes_minute AND closes_minute <= 1440)
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sla_calendar_holidays (
+            calendar_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            PRIMARY KEY (calendar_id, day),
+            FOREIGN KEY (calendar_id) REFERENCES sla_calendars(id) ON DELETE CASCADE
+        )
+    ''')
+
+    # A policy without a calendar counts wall-clock time, around the clock
+    cursor.execute('ALTER TABLE sla_policies ADD COLUMN calendar_id INTEGER REFERENCES sla_calendars(id)')
+
+    # Calendars are part of the cached policies
+    for table in ('sla_calendars', 'sla_calendar_holidays'):
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_version_{event.lower()} AFTER {event} ON {table} BEGIN
+                    UPDATE sla_policy_version SET version = version + 1 WHERE id = 1;
+                END
+            ''')
+
+    # Monday to Friday, 09:00 to 17:00
+    cursor.execute('''
+        INSERT OR IGNORE INTO sla_calendars (name, opens_minute, closes_minute, workdays)
+        VALUES ('Business hours', 540, 1020, '0,1,2,3,4')
+    ''')
+
+    # Low priority work waits for the next working day: its one-day response
+    # and three-day resolution become one and three business days (8 and 24
+    # working hours) instead of running through nights and weekends. Higher
+    # priorities keep counting around the clock
+    cursor.execute('''
+        UPDATE sla_policies
+        SET calendar_id = (SELECT id FROM sla_calendars WHERE name = 'Business hours'),
+            response_minutes = 8 * 60, resolution_minutes = 24 * 60
+        WHERE category_id IS NULL AND priority_id = (SELECT id FROM priorities WHERE name = 'Low')
+          AND response_minutes = 24 * 60 AND resolution_minutes = 72 * 60
+    ''')
+
+
+@migration(12, 'Index open tickets by their next SLA deadline')
+def _create_queue_index(cursor):
+    # The next deadline is the response due date until someone responds, then
+    # the resolution due date. queries.SLA_NEXT_DUE must stay word-for-word
+    # the same expression for SQLite to use this index
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_tickets_queue ON tickets (
+            assignee_id,
+            (CASE WHEN first_response_at IS NULL AND sla_response_due IS NOT NULL
+                  THEN sla_response_due ELSE sla_resolution_due END)
+        )
+        WHERE resolved_at IS NULL
+    ''')
+
+
+# Status test for an open ticket, row being new, old or tickets
+_OPEN_STATUS = "(SELECT name FROM statuses WHERE id = {row}.status_id) NOT IN ('Resolved', 'Closed')"
+
+
+@migration(13, 'Per-agent workload counters and category skills for auto-assignment')
+def _create_assignment_tables(cursor):
+    # Live per-user counters, moved by the triggers below on every ticket
+    # write rather than recounted
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_stats (
+            user_id INTEGER PRIMARY KEY,
+            open_assigned INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+    ''')
+
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS user_stats_open_assigned_insert AFTER INSERT ON tickets BEGIN
+            {_user_stats_upsert('new.assignee_id', 'open_assigned', 1, _OPEN_STATUS.format(row='new'))}
+        END
+    ''')
+
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS user_stats_open_assigned_delete AFTER DELETE ON tickets BEGIN
+            {_user_stats_upsert('old.assignee_id', 'open_assigned', -1, _OPEN_STATUS.format(row='old'))}
+        END
+    ''')
+
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS user_stats_open_assigned_update AFTER UPDATE OF assignee_id, status_id ON tickets
+        WHEN old.assignee_id IS NOT new.assignee_id OR old.status_id IS NOT new.status_id BEGIN
+            {_user_stats_upsert('old.assignee_id', 'open_assigned', -1, _OPEN_STATUS.format(row='old'))}
+            {_user_stats_upsert('new.assignee_id', 'open_assigned', 1, _OPEN_STATUS.format(row='new'))}
+        END
+    ''')
+
+    cursor.execute(f'''
+        INSERT INTO user_stats (user_id, open_assigned)
+        SELECT assignee_id, COUNT(*) FROM tickets
+        WHERE assignee_id IS NOT NULL AND {_OPEN_STATUS.format(row='tickets')}
+        GROUP BY assignee_id
+    ''')
+
+    # Categories each agent handles; auto-assignment prefers these agents
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS agent_skills (
+            category_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            PRIMARY KEY (category_id, user_id),
+            FOREIGN KEY (category_id) REFERENCES categories(id) ON DELETE CASCADE,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+    ''')
+
+
+def _user_stats_upsert(user_id, column, delta, condition=None):
+    """Trigger statement adding delta to one user_stats counter, optionally only when condition holds"""
+    where = f"{user_id} IS NOT NULL" + (f" AND {condition}" if condition else "")
+    return f'''
+            INSERT INTO user_stats (user_id, {column})
+            SELECT {user_id}, {delta} WHERE {where}
+            ON CONFLICT (user_id) DO UPDATE SET {column} = {column} + excluded.{column};'''
+
+
+@migration(14, 'Per-user activity counters for user management and profiles')
+def _add_user_activity_stats(cursor):
+    for column in ('tickets_created', 'tickets_assigned', 'time_entries'):
+        cursor.execute(f'ALTER TABLE user_stats ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0')
+
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS user_stats_tickets_insert AFTER INSERT ON tickets BEGIN
+            {_user_stats_upsert('new.requester_id', 'tickets_created', 1)}
+            {_user_stats_upsert('new.assignee_id', 'tickets_assigned', 1)}
+        END
+    ''')
+
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS user_stats_tickets_delete AFTER DELETE ON tickets BEGIN
+            {_user_stats_upsert('old.requester_id', 'tickets_created', -1)}
+            {_user_stats_upsert('old.assignee_id', 'tickets_assigned', -1)}
+        END
+    ''')
+
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS user_stats_tickets_requester_update AFTER UPDATE OF requester_id ON tickets
+        WHEN old.requester_id IS NOT new.requester_id BEGIN
+            {_user_stats_upsert('old.requester_id', 'tickets_created', -1)}
+            {_user_stats_upsert('new.requester_id', 'tickets_created', 1)}
+        END
+    ''')
+
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS user_stats_tickets_assignee_update AFTER UPDATE OF assignee_id ON tickets
+        WHEN old.assignee_id IS NOT new.assignee_id BEGIN
+            {_user_stats_upsert('old.assignee_id', 'tickets_assigned', -1)}
+            {_user_stats_upsert('new.assignee_id', 'tickets_assigned', 1)}
+        END
+    ''')
+
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS user_stats_time_entries_insert AFTER INSERT ON time_entries BEGIN
+            {_user_stats_upsert('new.user_id', 'time_entries', 1)}
+        END
+    ''')
+
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS user_stats_time_entries_delete AFTER DELETE ON time_entries BEGIN
+            {_user_stats_upsert('old.user_id', 'time_entries', -1)}
+        END
+    ''')
+
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS user_stats_time_entries_update AFTER UPDATE OF user_id ON time_entries
+        WHEN old.user_id IS NOT new.user_id BEGIN
+            {_user_stats_upsert('old.user_id', 'time_entries', -1)}
+            {_user_stats_upsert('new.user_id', 'time_entries', 1)}
+        END
+    ''')
+
+    # Count what already exists
+    for column, table, user_column in (('tickets_created', 'tickets', 'requester_id'),
+                                       ('tickets_assigned', 'tickets', 'assignee_id'),
+                                       ('time_entries', 'time_entries', 'user_id')):
+        cursor.execute(f'''
+            INSERT INTO user_stats (user_id, {column})
+            SELECT {user_column}, COUNT(*) FROM {table} WHERE {user_column} IS NOT NULL GROUP BY {user_column}
+            ON CONFLICT (user_id) DO UPDATE SET {column} = excluded.{column}
+        ''')
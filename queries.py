@@ -0,0 +1,728 @@
+"""SQL behind the hot pages.
+
+The pages in app.py, the query-plan check in query_plans.py and any
+benchmarks build their statements from here, so they all exercise exactly
+the same SQL. Nothing in this module touches Streamlit or pandas.
+"""
+import re
+
+# Statuses that count as finished work
+COMPLETED_STATUSES = ('Resolved', 'Closed')
+
+STATUS_NAME = 'SELECT name FROM statuses WHERE id = ?'
+
+# Dashboard
+DASHBOARD_STATUS_COUNTS = '''
+    SELECT s.name, COUNT(t.id) as count
+    FROM statuses s
+    LEFT JOIN tickets t ON s.id = t.status_id
+    GROUP BY s.id, s.name
+    ORDER BY s.id
+'''
+
+DASHBOARD_STATUS_COUNTS_FOR_REQUESTER = '''
+    SELECT s.name, COUNT(t.id) as count
+    FROM statuses s
+    LEFT JOIN tickets t ON s.id = t.status_id AND t.requester_id = ?
+    GROUP BY s.id, s.name
+    ORDER BY s.id
+'''
+
+# Open tickets the SLA worker has escalated, read off the escalation index
+DASHBOARD_SLA_VIOLATIONS = '''
+    SELECT t.ticket_number, t.title, t.sla_response_due, t.sla_resolution_due,
+           t.first_response_at, t.escalated_at, s.name as status, p.name as priority
+    FROM tickets t
+    JOIN statuses s ON t.status_id = s.id
+    JOIN priorities p ON t.priority_id = p.id
+    WHERE t.escalated_at IS NOT NULL
+      AND s.name NOT IN ('Resolved', 'Closed')
+    ORDER BY t.escalated_at ASC
+'''
+
+DASHBOARD_RECENT = '''
+    SELECT t.ticket_number, t.title, s.name as status, t.created_at
+    FROM tickets t
+    JOIN statuses s ON t.status_id = s.id
+    ORDER BY t.created_at DESC
+    LIMIT 5
+'''
+
+DASHBOARD_RECENT_FOR_REQUESTER = '''
+    SELECT t.ticket_number, t.title, s.name as status, t.created_at
+    FROM tickets t
+    JOIN statuses s ON t.status_id = s.id
+    WHERE t.requester_id = ?
+    ORDER BY t.created_at DESC
+    LIMIT 5
+'''
+
+
+def dashboard_query(requester_id=None):
+    """Build the single statement that returns the whole dashboard payload.
+
+    The status counts, SLA violations (staff only) and recent tickets come
+    back as JSON arrays in one row, so a dashboard render is one round trip
+    read from one snapshot. The total is the sum of the status counts.
+    """
+    if requester_id is None:
+        status_counts, recent, params = DASHBOARD_STATUS_COUNTS, DASHBOARD_RECENT, []
+        sla_violations = f'''(
+            SELECT json_group_array(json_object(
+                'ticket_number', ticket_number, 'title', title, 'priority', priority))
+            FROM ({DASHBOARD_SLA_VIOLATIONS}))'''
+    else:
+        status_counts = DASHBOARD_STATUS_COUNTS_FOR_REQUESTER
+        recent = DASHBOARD_RECENT_FOR_REQUESTER
+        params = [requester_id, requester_id]
+        sla_violations = 'NULL'
+
+    sql = f'''
+        SELECT
+            (SELECT json_group_array(json_object('name', name, 'count', count))
+             FROM ({status_counts})) as status_counts,
+            {sla_violations} as sla_violations,
+            (SELECT json_group_array(json_object(
+                 'ticket_number', ticket_number, 'title', title,
+                 'status', status, 'created_at', created_at))
+             FROM ({recent})) as recent
+    '''
+    return sql, params
+
+
+# Full-text search
+def fts_match_expression(search_term, column=None):
+    """Turn free text into a safe FTS5 MATCH expression.
+
+    Every word becomes a quoted prefix term and all of them must match, so
+    user input can never be parsed as FTS5 query syntax. Pass column to only
+    match within that column. Returns None when the text contains no
+    searchable words.
+    """
+    words = re.findall(r'\w+', search_term or '')
+    if not words:
+        return None
+    expression = ' '.join(f'"{word}"*' for word in words)
+    if column:
+        expression = f'{column} : ({expression})'
+    return expression
+
+
+# Ticket list
+COMPLETED_COUNT = '''
+    SELECT COUNT(*) as count FROM tickets t
+    JOIN statuses s ON t.status_id = s.id
+    WHERE s.name IN ('Resolved', 'Closed')
+'''
+
+COMPLETED_COUNT_FOR_REQUESTER = '''
+    SELECT COUNT(*) as count FROM tickets t
+    JOIN statuses s ON t.status_id = s.id
+    WHERE s.name IN ('Resolved', 'Closed') AND t.requester_id = ?
+'''
+
+
+def ticket_filter_clauses(requester_id=None, status_id=None, priority_id=None,
+                          category_id=None, show_completed=False):
+    """Build the WHERE conditions shared by the ticket list and ticket search.
+
+    Expects tickets aliased as t and statuses as s. Returns SQL starting with
+    " AND ..." (or an empty string) and its parameters.
+    """
+    clauses = ''
+    params = []
+
+    if requester_id is not None:
+        clauses += " AND t.requester_id = ?"
+        params.append(requester_id)
+
+    if status_id is not None:
+        clauses += " AND t.status_id = ?"
+        params.append(status_id)
+    elif not show_completed:
+        # Hide completed tickets by default for all users
+        clauses += " AND s.name NOT IN ('Resolved', 'Closed')"
+
+    # A requester's own tickets are best found through the requester index;
+    # the unary + stops SQLite from picking the much wider priority or
+    # category index instead
+    column_prefix = '+' if requester_id is not None else ''
+
+    if priority_id is not None:
+        clauses += f" AND {column_prefix}t.priority_id = ?"
+        params.append(priority_id)
+
+    if category_id is not None:
+        clauses += f" AND {column_prefix}t.category_id = ?"
+        params.append(category_id)
+
+    return clauses, params
+
+
+def ticket_list_query(requester_id=None, status_id=None, priority_id=None,
+                      category_id=None, show_completed=False, after=None, limit=None):
+    """Build one page of the ticket list query and its parameters.
+
+    Pass requester_id to restrict the list to one requester's tickets (the
+    "My Tickets" view for the user role). The list is keyset-paginated on
+    (created_at, id), newest first: ``after`` is the (created_at, id) of the
+    last row on the previous page, so each page is read straight off the
+    index without re-reading the pages before it. Only the columns the list
+    displays are selected.
+    """
+    clauses, params = ticket_filter_clauses(requester_id, status_id, priority_id,
+                                            category_id, show_completed)
+    query = '''
+        SELECT t.id, t.ticket_number, t.title, s.name as status, t.created_at
+        FROM tickets t
+        JOIN statuses s ON t.status_id = s.id
+        WHERE 1=1
+    ''' + clauses
+
+    if after is not None:
+        query += " AND (t.created_at, t.id) < (?, ?)"
+        params.extend(after)
+
+    query += " ORDER BY t.created_at DESC, t.id DESC"
+
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+
+    return query, params
+
+
+def ticket_search_query(search_term, requester_id=None, status_id=None, priority_id=None,
+                        category_id=None, show_completed=False, include_internal=False,
+                        after=None, limit=None):
+    """Build one page of a full-text ticket search and its parameters.
+
+    Matches the search term against ticket titles and descriptions and
+    against comment threads, then ranks each ticket by its best BM25 hit.
+    Internal comments only count when include_internal is set (staff), and
+    the usual list filters, including the requester-only rule for the user
+    role, apply on top. Pages are keyset-paginated on (rank, id); ``after``
+    is the (rank, id) of the last row on the previous page. Returns
+    (None, None) when the term contains nothing searchable.
+    """
+    match = fts_match_expression(search_term)
+    if match is None:
+        return None, None
+
+    clauses, filter_params = ticket_filter_clauses(requester_id, status_id, priority_id,
+                                                   category_id, show_completed)
+    query = f'''
+        WITH hits AS ({_search_hits(include_internal)}),
+        ranked AS (
+            SELECT ticket_id, MIN(rank) AS rank
+            FROM hits
+            GROUP BY ticket_id
+        )
+        SELECT t.id, t.ticket_number, t.title, s.name as status, t.created_at, r.rank
+        FROM ranked r
+        JOIN tickets t ON t.id = r.ticket_id
+        JOIN statuses s ON t.status_id = s.id
+        WHERE 1=1
+    ''' + clauses
+    params = [match, match] + filter_params
+
+    if after is not None:
+        query += " AND (r.rank, t.id) > (?, ?)"
+        params.extend(after)
+
+    query += " ORDER BY r.rank, t.id"
+
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+
+    return query, params
+
+
+def _search_hits(include_internal):
+    """SQL for (ticket_id, rank) full-text hits; takes the match expression twice"""
+    internal_clause = '' if include_internal else ' AND c.is_internal = 0'
+    return f'''
+            SELECT rowid AS ticket_id, bm25(tickets_fts, 10.0, 1.0) AS rank
+            FROM tickets_fts
+            WHERE tickets_fts MATCH ?
+            UNION ALL
+            SELECT c.ticket_id, bm25(comments_fts) AS rank
+            FROM comments_fts
+            JOIN comments c ON c.id = comments_fts.rowid
+            WHERE comments_fts MATCH ?{internal_clause}
+        '''
+
+
+# Bulk operations (bulk_update.py)
+def ticket_match_clauses(search_term=None, include_internal=False, **filters):
+    """WHERE conditions for every ticket the list would show, across all pages.
+
+    Takes the ticket list filters plus the search box; a search term with
+    nothing searchable in it is ignored, as it is by the list. Expects
+    tickets aliased as t and statuses as s.
+    """
+    clauses, params = ticket_filter_clauses(**filters)
+    match = fts_match_expression(search_term) if search_term else None
+    if match is not None:
+        clauses += f" AND t.id IN (SELECT ticket_id FROM ({_search_hits(include_internal)}))"
+        params = params + [match, match]
+    return clauses, params
+
+
+def bulk_count_query(**match):
+    """Build the dry-run count of the tickets a bulk update would touch"""
+    clauses, params = ticket_match_clauses(**match)
+    query = '''
+        SELECT COUNT(*)
+        FROM tickets t
+        JOIN statuses s ON t.status_id = s.id
+        WHERE 1=1
+    ''' + clauses
+    return query, params
+
+
+def bulk_update_query(columns, **match):
+    """Build one chunk of a bulk update over the matching tickets.
+
+    Sets each of columns plus updated_at on the next matching tickets after
+    an id, in id order, and returns the updated ids. resolved_at is only set
+    on tickets that have none yet. Parameters are the column values,
+    updated_at and the last id of the previous chunk, then the match
+    parameters returned here, then the chunk size.
+    """
+    clauses, params = ticket_match_clauses(**match)
+    assignments = ', '.join("resolved_at = COALESCE(resolved_at, ?)" if column == 'resolved_at' else f"{column} = ?"
+                            for column in columns)
+    query = f'''
+        UPDATE tickets SET {assignments}, updated_at = ?
+        WHERE id IN (
+            SELECT t.id
+            FROM tickets t
+            JOIN statuses s ON t.status_id = s.id
+            WHERE t.id > ?{clauses}
+            ORDER BY t.id
+            LIMIT ?
+        )
+        RETURNING id
+    '''
+    return query, params
+
+
+# Ticket detail
+TICKET_DETAIL = '''
+    SELECT t.id, t.ticket_number, t.title, t.description, t.created_at, t.updated_at, t.resolved_at,
+           t.sla_response_due, t.sla_resolution_due, t.first_response_at, t.escalated_at,
+           s.name as status, p.name as priority, c.name as category,
+           u.full_name as requester, u.email as requester_email,
+           t.assignee_id, u2.full_name as assignee, u2.email as assignee_email
+    FROM tickets t
+    JOIN statuses s ON t.status_id = s.id
+    JOIN priorities p ON t.priority_id = p.id
+    JOIN categories c ON t.category_id = c.id
+    JOIN users u ON t.requester_id = u.id
+    LEFT JOIN users u2 ON t.assignee_id = u2.id
+    WHERE t.id = ?
+'''
+
+TICKET_TIME_ENTRIES = '''
+    SELECT te.description, te.time_spent_minutes, te.created_at, u.full_name as user_name
+    FROM time_entries te
+    JOIN users u ON te.user_id = u.id
+    WHERE te.ticket_id = ?
+    ORDER BY te.created_at DESC
+'''
+
+TICKET_COMMENTS = '''
+    SELECT c.content, c.is_internal, c.created_at, u.full_name as author
+    FROM comments c
+    JOIN users u ON c.user_id = u.id
+    WHERE c.ticket_id = ?
+    ORDER BY c.created_at ASC
+'''
+
+# Ticket picker
+# The tickets a user most recently logged time on, commented on or was
+# assigned; each branch reads at most ? rows off its (user, time) index
+TICKET_PICKER_RECENT = '''
+    WITH touched AS (
+        SELECT * FROM (
+            SELECT ticket_id, created_at AS touched_at FROM time_entries
+            WHERE user_id = ? ORDER BY created_at DESC LIMIT ?
+        )
+        UNION ALL
+        SELECT * FROM (
+            SELECT ticket_id, created_at AS touched_at FROM comments
+            WHERE user_id = ? ORDER BY created_at DESC LIMIT ?
+        )
+        UNION ALL
+        SELECT * FROM (
+            SELECT id AS ticket_id, updated_at AS touched_at FROM tickets
+            WHERE assignee_id = ? ORDER BY updated_at DESC LIMIT ?
+        )
+    )
+    SELECT t.id, t.ticket_number, t.title
+    FROM touched
+    JOIN tickets t ON t.id = touched.ticket_id
+    GROUP BY t.id
+    ORDER BY MAX(touched.touched_at) DESC
+    LIMIT ?
+'''
+
+# Range scan of the unique ticket_number index
+TICKET_PICKER_BY_NUMBER = '''
+    SELECT id, ticket_number, title FROM tickets
+    WHERE ticket_number >= ? AND ticket_number < ?
+    ORDER BY ticket_number DESC
+    LIMIT ?
+'''
+
+TICKET_PICKER_BY_TITLE = '''
+    SELECT t.id, t.ticket_number, t.title
+    FROM tickets_fts
+    JOIN tickets t ON t.id = tickets_fts.rowid
+    WHERE tickets_fts MATCH ?
+    ORDER BY bm25(tickets_fts)
+    LIMIT ?
+'''
+
+
+def ticket_picker_recent_params(user_id, limit):
+    """Parameters for TICKET_PICKER_RECENT"""
+    return (user_id, limit, user_id, limit, user_id, limit, limit)
+
+
+def ticket_number_range(prefix):
+    """Return the [low, high) ticket_number range that starts with prefix"""
+    prefix = prefix.strip().upper()
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+# SLA escalation (sla_worker.py)
+# The soonest unchecked deadlines, each read in order off its partial index
+SLA_PENDING_RESPONSE = '''
+    SELECT sla_response_due, id FROM tickets
+    WHERE escalated_at IS NULL AND first_response_at IS NULL AND sla_response_due IS NOT NULL
+    ORDER BY sla_response_due
+    LIMIT ?
+'''
+
+SLA_PENDING_RESOLUTION = '''
+    SELECT sla_resolution_due, id FROM tickets
+    WHERE escalated_at IS NULL AND resolved_at IS NULL AND sla_resolution_due IS NOT NULL
+      AND status_id NOT IN (SELECT id FROM statuses WHERE name IN ('Resolved', 'Closed'))
+    ORDER BY sla_resolution_due
+    LIMIT ?
+'''
+
+# Takes (escalated_at, ticket id, now, now); re-checks the breach so a ticket
+# answered or resolved since its deadline was loaded is left alone
+SLA_ESCALATE = '''
+    UPDATE tickets SET escalated_at = ?
+    WHERE id = ? AND escalated_at IS NULL
+      AND ((sla_response_due <= ? AND first_response_at IS NULL)
+           OR (sla_resolution_due <= ? AND status_id NOT IN (
+                   SELECT id FROM statuses WHERE name IN ('Resolved', 'Closed'))))
+'''
+
+
+# Work queue (work_queue.py)
+# A ticket's next SLA deadline; must match the idx_tickets_queue expression
+SLA_NEXT_DUE = (
+    "(CASE WHEN first_response_at IS NULL AND sla_response_due IS NOT NULL"
+    " THEN sla_response_due ELSE sla_resolution_due END)"
+)
+
+# Open tickets for one assignee (or, with IS NULL, the unassigned pool):
+# those with a deadline soonest first and, on a tie, the higher priority
+# first, then those without one oldest first. Each half reads the queue index
+_QUEUE_OPEN = """
+    FROM tickets t
+    JOIN statuses s ON t.status_id = s.id
+    JOIN priorities p ON t.priority_id = p.id
+    WHERE t.assignee_id {assignee} AND t.resolved_at IS NULL
+      AND s.name NOT IN ('Resolved', 'Closed')
+"""
+
+_QUEUE_COLUMNS = f"""
+    SELECT t.id, t.ticket_number, t.title, s.name as status, p.name as priority,
+           p.level as priority_level, t.created_at, {SLA_NEXT_DUE} as next_due
+"""
+
+
+def queue_query(assignee_id, limit):
+    """Build an assignee's queue, most urgent first, and its parameters"""
+    open_tickets = _QUEUE_OPEN.format(assignee='= ?')
+    sql = f'''
+        SELECT * FROM (
+            {_QUEUE_COLUMNS} {open_tickets} AND {SLA_NEXT_DUE} IS NOT NULL
+            ORDER BY {SLA_NEXT_DUE}, p.level DESC
+            LIMIT ?
+        )
+        UNION ALL
+        SELECT * FROM (
+            {_QUEUE_COLUMNS} {open_tickets} AND {SLA_NEXT_DUE} IS NULL
+            ORDER BY t.created_at
+            LIMIT ?
+        )
+        LIMIT ?
+    '''
+    return sql, [assignee_id, limit, assignee_id, limit, limit]
+
+
+# The most urgent unassigned ticket; run inside the claiming UPDATE
+QUEUE_NEXT_UNASSIGNED = f'''
+    SELECT t.id {_QUEUE_OPEN.format(assignee='IS NULL')} AND {SLA_NEXT_DUE} IS NOT NULL
+    ORDER BY {SLA_NEXT_DUE}, p.level DESC
+    LIMIT 1
+'''
+
+QUEUE_NEXT_UNASSIGNED_WITHOUT_SLA = f'''
+    SELECT t.id {_QUEUE_OPEN.format(assignee='IS NULL')} AND {SLA_NEXT_DUE} IS NULL
+    ORDER BY t.created_at
+    LIMIT 1
+'''
+
+# Takes (assignee, updated_at); the assignee_id IS NULL re-check means a
+# ticket claimed by someone else in the meantime is never taken over
+QUEUE_CLAIM = """
+    UPDATE tickets SET assignee_id = ?, updated_at = ?
+    WHERE id = ({next_ticket}) AND assignee_id IS NULL
+    RETURNING id, ticket_number
+"""
+
+
+# Auto-assignment (assignment.py)
+# Staff eligible for a category: those with the skill or, when nobody has
+# it, every IT staff member. Least loaded first. Takes (category, category)
+ASSIGNMENT_PICK_AGENT = """
+    SELECT u.id
+    FROM users u
+    LEFT JOIN user_stats us ON us.user_id = u.id
+    WHERE u.role IN ('admin', 'it_staff')
+      AND (u.id IN (SELECT user_id FROM agent_skills WHERE category_id = ?)
+           OR (u.role = 'it_staff'
+               AND NOT EXISTS (SELECT 1 FROM agent_skills WHERE category_id IS ?)))
+    ORDER BY COALESCE(us.open_assigned, 0), u.id
+    LIMIT 1
+"""
+
+ASSIGNMENT_AGENTS = """
+    SELECT u.id, u.role, COALESCE(us.open_assigned, 0) as open_assigned
+    FROM users u
+    LEFT JOIN user_stats us ON us.user_id = u.id
+    WHERE u.role IN ('admin', 'it_staff')
+"""
+
+ASSIGNMENT_SKILLS = "SELECT category_id, user_id FROM agent_skills"
+
+# Unassigned open tickets in My Queue order
+ASSIGNMENT_BACKLOG = f"""
+    SELECT t.id, t.category_id
+    FROM tickets t
+    JOIN statuses s ON t.status_id = s.id
+    JOIN priorities p ON t.priority_id = p.id
+    WHERE t.assignee_id IS NULL AND t.resolved_at IS NULL
+      AND s.name NOT IN ('Resolved', 'Closed')
+    ORDER BY {SLA_NEXT_DUE} IS NULL, {SLA_NEXT_DUE}, p.level DESC, t.created_at
+"""
+
+# Takes (assignee, updated_at, ticket); never overrides a manual assignment
+ASSIGNMENT_ASSIGN = """
+    UPDATE tickets SET assignee_id = ?, updated_at = ?
+    WHERE id = ? AND assignee_id IS NULL
+"""
+
+
+# User management and profile; counters kept by triggers (migrations 13-14)
+USER_LIST_WITH_STATS = """
+    SELECT u.id, u.username, u.email, u.full_name, u.role, u.department, u.created_at,
+           COALESCE(us.tickets_created, 0) as tickets_created,
+           COALESCE(us.tickets_assigned, 0) as tickets_assigned,
+           COALESCE(us.open_assigned, 0) as open_assigned,
+           COALESCE(us.time_entries, 0) as time_entries
+    FROM users u
+    LEFT JOIN user_stats us ON us.user_id = u.id
+    ORDER BY u.created_at DESC
+"""
+
+USER_STATS = """
+    SELECT COALESCE(MAX(tickets_created), 0) as tickets_created,
+           COALESCE(MAX(tickets_assigned), 0) as tickets_assigned,
+           COALESCE(MAX(open_assigned), 0) as open_assigned,
+           COALESCE(MAX(time_entries), 0) as time_entries
+    FROM user_stats
+    WHERE user_id = ?
+"""
+
+
+# SLA policies (sla.py)
+SLA_POLICY_VERSION = "SELECT version FROM sla_policy_version WHERE id = 1"
+
+SLA_POLICIES = '''
+    SELECT priority_id, category_id, response_minutes, resolution_minutes, calendar_id
+    FROM sla_policies
+    ORDER BY priority_id, category_id
+'''
+
+SLA_CALENDARS = '''
+    SELECT id, name, opens_minute, closes_minute, workdays
+    FROM sla_calendars
+    ORDER BY name
+'''
+
+SLA_CALENDAR_HOLIDAYS = "SELECT calendar_id, day FROM sla_calendar_holidays ORDER BY calendar_id, day"
+
+# Tickets whose due dates follow the policies: everything not yet completed
+SLA_OPEN_TICKETS = '''
+    SELECT id, priority_id, category_id, created_at, sla_response_due, sla_resolution_due
+    FROM tickets
+    WHERE status_id NOT IN (SELECT id FROM statuses WHERE name IN ('Resolved', 'Closed'))
+'''
+
+SLA_UPDATE_DUE_DATES = "UPDATE tickets SET sla_response_due = ?, sla_resolution_due = ? WHERE id = ?"
+
+
+# Metrics exporter (metrics_exporter.py)
+# Tickets not in a completed status, per priority, summed over the
+# daily_ticket_stats rollup
+METRICS_OPEN_BY_PRIORITY = '''
+    SELECT p.name, COALESCE(d.count, 0) as count
+    FROM priorities p
+    LEFT JOIN (
+        SELECT priority_id, SUM(ticket_count) as count FROM daily_ticket_stats
+        WHERE status_id NOT IN (SELECT id FROM statuses WHERE name IN ('Resolved', 'Closed'))
+        GROUP BY priority_id
+    ) d ON p.id = d.priority_id
+    ORDER BY p.level
+'''
+
+# Escalated tickets not in a completed status, read off the escalation index
+METRICS_SLA_BREACHED_OPEN = '''
+    SELECT COUNT(*) FROM tickets
+    WHERE escalated_at IS NOT NULL
+      AND status_id NOT IN (SELECT id FROM statuses WHERE name IN ('Resolved', 'Closed'))
+'''
+
+
+# Reports
+# The key metrics and charts read the daily_ticket_stats rollup and take the
+# first and last local day of the range as 'YYYY-MM-DD' text, so a year costs
+# a few hundred rollup rows rather than a pass over every ticket
+REPORT_TOTAL = '''
+    SELECT COALESCE(SUM(ticket_count), 0) as count FROM daily_ticket_stats
+    WHERE day BETWEEN ? AND ?
+'''
+
+REPORT_RESOLVED = '''
+    SELECT COALESCE(SUM(ticket_count), 0) as count FROM daily_ticket_stats
+    WHERE day BETWEEN ? AND ? AND status_id IN (
+        SELECT id FROM statuses WHERE name IN ('Resolved', 'Closed')
+    )
+'''
+
+REPORT_AVG_RESOLUTION = '''
+    SELECT SUM(resolution_seconds) / 86400.0 / NULLIF(SUM(resolved_count), 0) as avg_days
+    FROM daily_ticket_stats
+    WHERE day BETWEEN ? AND ?
+'''
+
+REPORT_SLA_COMPLIANT = '''
+    SELECT COALESCE(SUM(sla_compliant_count), 0) as count FROM daily_ticket_stats
+    WHERE day BETWEEN ? AND ?
+'''
+
+REPORT_STATUS_COUNTS = '''
+    SELECT s.name, COALESCE(d.count, 0) as count
+    FROM statuses s
+    LEFT JOIN (
+        SELECT status_id, SUM(ticket_count) as count FROM daily_ticket_stats
+        WHERE day BETWEEN ? AND ?
+        GROUP BY status_id
+    ) d ON s.id = d.status_id
+    ORDER BY s.id
+'''
+
+REPORT_PRIORITY_COUNTS = '''
+    SELECT p.name, COALESCE(d.count, 0) as count
+    FROM priorities p
+    LEFT JOIN (
+        SELECT priority_id, SUM(ticket_count) as count FROM daily_ticket_stats
+        WHERE day BETWEEN ? AND ?
+        GROUP BY priority_id
+    ) d ON p.id = d.priority_id
+    ORDER BY p.level
+'''
+
+# The time summary and recent tickets read the base tables and take the
+# [start, end) epoch bounds from timestamps.day_range
+REPORT_TIME_SUMMARY = '''
+    SELECT u.full_name as user, SUM(te.time_spent_minutes) as total_minutes,
+           COUNT(DISTINCT te.ticket_id) as tickets_worked
+    FROM time_entries te
+    JOIN users u ON te.user_id = u.id
+    WHERE te.created_at >= ? AND te.created_at < ?
+    GROUP BY u.id, u.full_name
+    ORDER BY total_minutes DESC
+'''
+
+REPORT_RECENT = '''
+    SELECT t.ticket_number, t.title, s.name as status, p.name as priority,
+           c.name as category, u.full_name as requester, t.created_at
+    FROM tickets t
+    JOIN statuses s ON t.status_id = s.id
+    JOIN priorities p ON t.priority_id = p.id
+    JOIN categories c ON t.category_id = c.id
+    JOIN users u ON t.requester_id = u.id
+    WHERE t.created_at >= ? AND t.created_at < ?
+    ORDER BY t.created_at DESC
+    LIMIT 20
+'''
+
+
+# Knowledge base
+def knowledge_base_query(search_term=None, category_id=None, limit=None):
+    """Build the knowledge base article query and its parameters.
+
+    With a search term, articles come from the FTS5 index ranked by BM25
+    (title and tag matches weigh more than body matches) together with a
+    highlighted snippet of the matching content; without one they are listed
+    newest first.
+    """
+    match = fts_match_expression(search_term)
+    if match:
+        query = '''
+            SELECT kb.id, kb.title, kb.content, kb.tags, kb.created_at,
+                   c.name as category, u.full_name as author,
+                   snippet(knowledge_base_fts, 1, '**', '**', '…', 24) as snippet,
+                   bm25(knowledge_base_fts, 10.0, 1.0, 5.0) as rank
+            FROM knowledge_base_fts
+            JOIN knowledge_base kb ON kb.id = knowledge_base_fts.rowid
+            LEFT JOIN categories c ON kb.category_id = c.id
+            LEFT JOIN users u ON kb.created_by = u.id
+            WHERE knowledge_base_fts MATCH ? AND kb.is_public = 1
+        '''
+        params = [match]
+    else:
+        query = '''
+            SELECT kb.id, kb.title, kb.content, kb.tags, kb.created_at,
+                   c.name as category, u.full_name as author,
+                   NULL as snippet, NULL as rank
+            FROM knowledge_base kb
+            LEFT JOIN categories c ON kb.category_id = c.id
+            LEFT JOIN users u ON kb.created_by = u.id
+            WHERE kb.is_public = 1
+        '''
+        params = []
+
+    if category_id is not None:
+        query += " AND kb.category_id = ?"
+        params.append(category_id)
+
+    query += " ORDER BY rank" if match else " ORDER BY kb.created_at DESC"
+
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+
+    return query, params
@@ -0,0 +1,266 @@
+"""Per-statement query statistics and a slow-query log.
+
+Pooled connections (database.py) hand out InstrumentedCursor, so every
+statement run through them, whether from pd.read_sql_query or
+conn.execute, is timed here. SQLite does most of a query's work while rows
+are being fetched, so a statement's time covers its execute call and every
+fetch that follows. The statistics are aggregated per normalized SQL text,
+along with the page function that issued them. An execution that runs past
+SLOW_QUERY_MS goes into a bounded slow-query log with its EXPLAIN QUERY
+PLAN. Every execution also feeds the statement latency histogram, and busy
+errors the busy counter, in metrics.py.
+
+A page render can also open a RenderCounters on its thread
+(begin_render/end_render); every statement recorded on that thread until
+it closes adds its time and rows to the counters, which is how
+render_profiler.py gets each render's DB time and query count.
+"""
+import collections
+import functools
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+import metrics
+import timestamps
+
+ENABLED = os.environ.get('TICKETS_QUERY_LOG', '1') != '0'
+
+# Executions slower than this (milliseconds) go into the slow-query log
+SLOW_QUERY_MS = float(os.environ.get('TICKETS_SLOW_QUERY_MS', '100'))
+
+# Slow executions kept, newest first
+SLOW_LOG_SIZE = int(os.environ.get('TICKETS_SLOW_LOG_SIZE', '200'))
+
+# Source files skipped when looking for the code that issued a statement
+_LIBRARY_FILES = (os.path.abspath(__file__), os.path.join(os.path.dirname(os.path.abspath(__file__)), 'database.py'))
+
+
+class StatementStats:
+    """Running totals for one normalized statement"""
+
+    __slots__ = ('sql', 'calls', 'total_seconds', 'max_seconds', 'rows', 'callers')
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.calls = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.rows = 0
+        self.callers = collections.Counter()
+
+
+class RenderCounters:
+    """DB time, statements and rows recorded on one thread during a render"""
+
+    __slots__ = ('seconds', 'statements', 'rows')
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.statements = 0
+        self.rows = 0
+
+
+_stats = {}
+_slow_log = collections.deque(maxlen=SLOW_LOG_SIZE)
+_lock = threading.Lock()
+_render = threading.local()
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that reports each statement's time and rows to the query log"""
+
+    _execution = None
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        except sqlite3.OperationalError as exc:
+            _count_busy(exc)
+            raise
+        finally:
+            self._begin(sql, parameters, time.perf_counter() - start, max(self.rowcount, 0))
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        seq_of_parameters = list(seq_of_parameters)
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        except sqlite3.OperationalError as exc:
+            _count_busy(exc)
+            raise
+        finally:
+            first = seq_of_parameters[0] if seq_of_parameters else ()
+            self._begin(sql, first, time.perf_counter() - start, max(self.rowcount, 0))
+            self._finish()
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(time.perf_counter() - start, row is not None, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(time.perf_counter() - start, len(rows), not rows)
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(time.perf_counter() - start, len(rows), True)
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(time.perf_counter() - start, 0, True)
+            raise
+        self._fetched(time.perf_counter() - start, 1, False)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        # conn.execute(...).fetchone() never exhausts its cursor; it is
+        # recorded when the cursor is dropped
+        self._finish()
+
+    def _begin(self, sql, parameters, seconds, rows):
+        # [sql, parameters, seconds, rows, caller]
+        self._execution = [sql, parameters, seconds, rows, _caller()]
+
+    def _fetched(self, seconds, rows, exhausted):
+        execution = self._execution
+        if execution is not None:
+            execution[2] += seconds
+            execution[3] += rows
+            if exhausted:
+                self._finish()
+
+    def _finish(self):
+        execution, self._execution = self._execution, None
+        if execution is not None:
+            record(*execution, connection=self.connection)
+
+
+def record(sql, parameters, seconds, rows, caller, connection=None):
+    """Add one finished execution to the statistics (and the slow log if slow)"""
+    counters = getattr(_render, 'counters', None)
+    if counters is not None:
+        counters.seconds += seconds
+        counters.statements += 1
+        counters.rows += rows
+    metrics.DB_STATEMENT_SECONDS.observe(seconds)
+
+    normalized = normalize(sql)
+    with _lock:
+        stats = _stats.get(normalized)
+        if stats is None:
+            stats = _stats[normalized] = StatementStats(normalized)
+        stats.calls += 1
+        stats.total_seconds += seconds
+        stats.max_seconds = max(stats.max_seconds, seconds)
+        stats.rows += rows
+        stats.callers[caller] += 1
+
+    if seconds * 1000 >= SLOW_QUERY_MS:
+        entry = {
+            'at': timestamps.now(),
+            'sql': normalized,
+            'milliseconds': seconds * 1000,
+            'rows': rows,
+            'caller': caller,
+            'plan': explain(connection, sql, parameters) if connection is not None else [],
+        }
+        with _lock:
+            _slow_log.appendleft(entry)
+
+
+def _count_busy(exc):
+    """Count a statement that gave up waiting on a locked database"""
+    if str(exc).startswith(('database is locked', 'database table is locked')):
+        metrics.SQLITE_BUSY.inc()
+
+
+def begin_render():
+    """Start counting this thread's statements; returns the RenderCounters"""
+    counters = _render.counters = RenderCounters()
+    return counters
+
+
+def end_render():
+    """Stop counting this thread's statements"""
+    _render.counters = None
+
+
+def explain(connection, sql, parameters=()):
+    """Return the EXPLAIN QUERY PLAN lines for a statement, indented by depth"""
+    try:
+        rows = connection.cursor(sqlite3.Cursor).execute('EXPLAIN QUERY PLAN ' + sql, parameters).fetchall()
+    except sqlite3.Error as exc:
+        return [f'(no plan: {exc})']
+    depth = {0: -1}
+    lines = []
+    for node_id, parent_id, _, detail in rows:
+        depth[node_id] = depth.get(parent_id, -1) + 1
+        lines.append('  ' * depth[node_id] + detail)
+    return lines
+
+
+@functools.lru_cache(maxsize=1024)
+def normalize(sql):
+    """Collapse a statement's whitespace so the same SQL always aggregates together"""
+    return ' '.join(sql.split())
+
+
+def _caller():
+    """Name of the page function (show_*) that issued a statement, else the nearest app function"""
+    frame = sys._getframe(2)
+    fallback = None
+    while frame is not None:
+        code = frame.f_code
+        if code.co_name.startswith('show_'):
+            return code.co_name
+        if fallback is None and code.co_filename not in _LIBRARY_FILES and 'site-packages' not in code.co_filename:
+            fallback = f"{os.path.splitext(os.path.basename(code.co_filename))[0]}.{code.co_name}"
+        frame = frame.f_back
+    return fallback or 'unknown'
+
+
+def top_statements(limit=20, order_by='total_seconds'):
+    """Return the statements with the highest order_by, as dicts"""
+    with _lock:
+        stats = sorted(_stats.values(), key=lambda entry: getattr(entry, order_by), reverse=True)[:limit]
+        return [{
+            'sql': entry.sql,
+            'calls': entry.calls,
+            'total_ms': entry.total_seconds * 1000,
+            'avg_ms': entry.total_seconds * 1000 / entry.calls,
+            'max_ms': entry.max_seconds * 1000,
+            'rows': entry.rows,
+            'callers': ', '.join(name for name, _ in entry.callers.most_common(3)),
+        } for entry in stats]
+
+
+def slow_queries():
+    """Return the slow-query log, newest first"""
+    with _lock:
+        return list(_slow_log)
+
+
+def reset():
+    """Forget all statistics and slow queries"""
+    with _lock:
+        _stats.clear()
+        _slow_log.clear()
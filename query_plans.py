@@ -0,0 +1,164 @@
+"""Check that the hot page queries are served by indexes.
+
+Runs EXPLAIN QUERY PLAN on every query behind show_dashboard,
+show_tickets_list, show_ticket_detail and show_reports and fails if any of
+them scans one of the large tables. Only SEARCH steps count as using an
+index; a SCAN of a large table fails even through an index, unless the
+query and index are listed in ALLOWED_SCANS.
+
+Usage: python query_plans.py [path/to/tickets.db]
+"""
+import re
+import sqlite3
+import sys
+from datetime import date, timedelta
+
+import queries
+import timestamps
+from database import DB_PATH
+from migrations import migrate
+
+# Tables that grow with usage; the small lookup tables may be scanned freely
+LARGE_TABLES = ('tickets', 'comments', 'time_entries')
+
+# Full index scans that are fine, by query name: the scan either stops after
+# the LIMIT rows it returns or is an on-demand count that has to visit every
+# matching ticket anyway
+_NEWEST_FIRST = ('idx_tickets_created',)
+_BULK_COUNT = ('idx_tickets_assignee_status',)
+ALLOWED_SCANS = {
+    # Newest-first walks of the created_at index, cut off by LIMIT
+    'dashboard.recent': _NEWEST_FIRST,
+    'dashboard.payload': _NEWEST_FIRST,
+    'tickets_list.staff.all': _NEWEST_FIRST,
+    'tickets_list.staff.completed': _NEWEST_FIRST,
+    # Bulk change dry-run over every open (or every) ticket; only runs when
+    # an admin asks for it, never on a plain page render
+    'tickets_list.bulk_count.all': _BULK_COUNT,
+    'tickets_list.bulk_count.completed': _BULK_COUNT,
+}
+
+_TABLE_REF = re.compile(r'\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', re.IGNORECASE)
+_SQL_KEYWORDS = {'on', 'where', 'join', 'left', 'inner', 'group', 'order', 'limit'}
+
+
+def hot_queries():
+    """Return (name, sql, params) for every query the check covers"""
+    end = date.today()
+    start = end - timedelta(days=30)
+    report_days = (start.isoformat(), end.isoformat())
+    report_range = timestamps.day_range(start, end)
+
+    checks = [
+        ('dashboard.status_counts', queries.DASHBOARD_STATUS_COUNTS, ()),
+        ('dashboard.status_counts_for_requester', queries.DASHBOARD_STATUS_COUNTS_FOR_REQUESTER, (1,)),
+        ('dashboard.sla_violations', queries.DASHBOARD_SLA_VIOLATIONS, ()),
+        ('dashboard.recent', queries.DASHBOARD_RECENT, ()),
+        ('dashboard.recent_for_requester', queries.DASHBOARD_RECENT_FOR_REQUESTER, (1,)),
+        ('dashboard.payload', *queries.dashboard_query()),
+        ('dashboard.payload_for_requester', *queries.dashboard_query(1)),
+        ('tickets_list.completed_count', queries.COMPLETED_COUNT, ()),
+        ('tickets_list.completed_count_for_requester', queries.COMPLETED_COUNT_FOR_REQUESTER, (1,)),
+        ('ticket_detail.ticket', queries.TICKET_DETAIL, (1,)),
+        ('ticket_detail.time_entries', queries.TICKET_TIME_ENTRIES, (1,)),
+        ('ticket_detail.comments', queries.TICKET_COMMENTS, (1,)),
+        ('my_queue.tickets', *queries.queue_query(1, 50)),
+        ('my_queue.claim', queries.QUEUE_CLAIM.format(next_ticket=queries.QUEUE_NEXT_UNASSIGNED), (1, 0)),
+        ('my_queue.claim_without_sla',
+         queries.QUEUE_CLAIM.format(next_ticket=queries.QUEUE_NEXT_UNASSIGNED_WITHOUT_SLA), (1, 0)),
+        ('reports.total', queries.REPORT_TOTAL, report_days),
+        ('reports.resolved', queries.REPORT_RESOLVED, report_days),
+        ('reports.avg_resolution', queries.REPORT_AVG_RESOLUTION, report_days),
+        ('reports.sla_compliant', queries.REPORT_SLA_COMPLIANT, report_days),
+        ('reports.status_counts', queries.REPORT_STATUS_COUNTS, report_days),
+        ('reports.priority_counts', queries.REPORT_PRIORITY_COUNTS, report_days),
+        ('reports.time_summary', queries.REPORT_TIME_SUMMARY, report_range),
+        ('reports.recent', queries.REPORT_RECENT, report_range),
+        ('metrics.open_by_priority', queries.METRICS_OPEN_BY_PRIORITY, ()),
+        ('metrics.sla_breached_open', queries.METRICS_SLA_BREACHED_OPEN, ()),
+    ]
+
+    # Ticket list, for both roles and each filter on its own
+    list_variants = {
+        'all': {},
+        'status': {'status_id': 1},
+        'priority': {'priority_id': 1},
+        'category': {'category_id': 1},
+        'completed': {'show_completed': True},
+        'next_page': {'after': (timestamps.now(), 1000), 'limit': 26},
+    }
+    for requester_id, scope in ((None, 'staff'), (1, 'requester')):
+        for variant, filters in list_variants.items():
+            sql, params = queries.ticket_list_query(requester_id=requester_id, **filters)
+            checks.append((f'tickets_list.{scope}.{variant}', sql, tuple(params)))
+
+    # Dry-run count for bulk changes over the filter result
+    for variant, filters in list_variants.items():
+        if variant != 'next_page':
+            checks.append((f'tickets_list.bulk_count.{variant}', *queries.bulk_count_query(**filters)))
+
+    return checks
+
+
+def table_aliases(sql):
+    """Map each alias (or bare table name) used in a query to its table"""
+    aliases = {}
+    for table, alias in _TABLE_REF.findall(sql):
+        aliases[table] = table
+        if alias and alias.lower() not in _SQL_KEYWORDS:
+            aliases[alias] = table
+    return aliases
+
+
+def unindexed_scans(conn, sql, params=(), allowed_indexes=()):
+    """Return the plan lines that scan a large table, other than through allowed_indexes"""
+    aliases = table_aliases(sql)
+    offending = []
+    for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params):
+        detail = row[3]
+        match = re.match(r'SCAN (\w+)(?: USING (?:COVERING )?INDEX (\w+))?', detail)
+        if not match or (match.group(2) is not None and match.group(2) in allowed_indexes):
+            continue
+        if aliases.get(match.group(1), match.group(1)) in LARGE_TABLES:
+            offending.append(detail)
+    return offending
+
+
+def check_query_plans(conn):
+    """Return {query name: offending plan lines} for queries that miss an index"""
+    failures = {}
+    for name, sql, params in hot_queries():
+        offending = unindexed_scans(conn, sql, params, ALLOWED_SCANS.get(name, ()))
+        if offending:
+            failures[name] = offending
+    return failures
+
+
+def main(argv):
+    db_path = argv[1] if len(argv) > 1 else DB_PATH
+    migrate(db_path)
+
+    conn = sqlite3.connect(db_path)
+    try:
+        for name, sql, params in hot_queries():
+            plan = [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params)]
+            print(f"{name}:")
+            for line in plan:
+                print(f"    {line}")
+
+        failures = check_query_plans(conn)
+    finally:
+        conn.close()
+
+    if failures:
+        print(f"\n{len(failures)} queries scan a large table:")
+        for name, lines in failures.items():
+            print(f"  {name}: {'; '.join(lines)}")
+        return 1
+
+    print("\nAll hot queries use an index.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
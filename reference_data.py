@@ -0,0 +1,89 @@
+"""Cached reference data: statuses, priorities, categories and the staff list.
+
+These tables are tiny and rarely change, yet almost every page needs them.
+They are loaded once per process into LookupTable objects with O(1) id/name
+lookups. Triggers bump a version counter on any change to them (migration 5),
+and the cache reloads as soon as it sees a newer version, so edits made by an
+admin, from any session or process, show up on the next rerun.
+"""
+import os
+import threading
+
+from database import DB_PATH, get_connection
+
+
+class LookupTable:
+    """Rows of a small id/name table in display order, with O(1) lookups both ways"""
+
+    def __init__(self, rows):
+        self.ids = [row[0] for row in rows]
+        self.names = [row[1] for row in rows]
+        self._name_by_id = dict(rows)
+        self._id_by_name = {name: id_ for id_, name in rows}
+
+    def name(self, id_, default=None):
+        """Return the name for an id"""
+        return self._name_by_id.get(id_, default)
+
+    def id(self, name, default=None):
+        """Return the id for a name"""
+        return self._id_by_name.get(name, default)
+
+    def index(self, id_):
+        """Return the position of an id in display order (for selectbox defaults)"""
+        return self.ids.index(id_)
+
+    def __contains__(self, id_):
+        return id_ in self._name_by_id
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class ReferenceData:
+    """One consistent snapshot of every lookup table"""
+
+    def __init__(self, version, statuses, priorities, categories, staff):
+        self.version = version
+        self.statuses = statuses
+        self.priorities = priorities
+        self.categories = categories
+        self.staff = staff
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def get_reference_data(db_path=DB_PATH):
+    """Return the cached reference data, reloading it if it has changed"""
+    key = os.path.abspath(db_path)
+    conn = get_connection(db_path)
+    try:
+        # Read the version before the data: a change landing in between makes
+        # us cache newer data under an older version, which only costs a reload
+        version = conn.execute('SELECT version FROM reference_data_version WHERE id = 1').fetchone()[0]
+        cached = _cache.get(key)
+        if cached is not None and cached.version == version:
+            return cached
+
+        with _cache_lock:
+            cached = _cache.get(key)
+            if cached is None or cached.version != version:
+                cached = _cache[key] = _load(conn, version)
+        return cached
+    finally:
+        conn.close()
+
+
+def _load(conn, version):
+    def rows(sql):
+        return [(row[0], row[1]) for row in conn.execute(sql)]
+
+    return ReferenceData(
+        version=version,
+        statuses=LookupTable(rows("SELECT id, name FROM statuses ORDER BY id")),
+        priorities=LookupTable(rows("SELECT id, name FROM priorities ORDER BY level")),
+        categories=LookupTable(rows("SELECT id, name FROM categories ORDER BY name")),
+        staff=LookupTable(rows("SELECT id, full_name FROM users WHERE role IN ('admin', 'it_staff') ORDER BY full_name")),
+    )
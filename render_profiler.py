@@ -0,0 +1,196 @@
+"""Per-page render timings.
+
+dashboard_page() wraps its page router in profile(), which times the whole
+rerun of the page and, through query_log's per-thread render counters, the
+time spent in SQLite, the statements issued and the rows fetched. Samples
+are kept per (page, role) in bounded deques, so summary() reports rolling
+percentiles over the most recent renders. Renders that issue more than
+QUERY_BUDGET statements are counted as over budget.
+
+Only statements run on the rendering thread are counted. Writes handed to
+the writer thread (write_queue.py) show up in the wall time the page spends
+waiting for them, not in its DB time. With the query log switched off
+(TICKETS_QUERY_LOG=0) only wall time is recorded.
+
+An admin can also ask for one render to run under cProfile
+(profile(..., capture=True)). The capture is kept in memory under an
+increasing capture id, for the Diagnostics page to summarise and offer as a
+pstats file.
+Captured renders are left out of the timing samples, since the profiler
+slows them down; renders that are not captured never touch cProfile.
+"""
+import collections
+import contextlib
+import cProfile
+import itertools
+import marshal
+import os
+import pstats
+import threading
+import time
+
+import query_log
+import timestamps
+
+ENABLED = os.environ.get('TICKETS_RENDER_PROFILE', '1') != '0'
+
+# Renders kept per page and role for the percentiles
+SAMPLES = int(os.environ.get('TICKETS_RENDER_SAMPLES', '500'))
+
+# Statements a single render should stay within
+QUERY_BUDGET = int(os.environ.get('TICKETS_QUERY_BUDGET', '25'))
+
+# cProfile captures kept, oldest dropped first
+CAPTURES = int(os.environ.get('TICKETS_PROFILE_CAPTURES', '20'))
+
+# One render: wall ms, DB ms, statements, rows
+Sample = collections.namedtuple('Sample', 'wall_ms db_ms queries rows')
+
+# One cProfile'd render; stats is the profiler's raw stats dict
+Capture = collections.namedtuple('Capture', 'id page role at wall_ms queries stats')
+
+_samples = {}
+_renders = collections.Counter()
+_over_budget = collections.Counter()
+_captures = {}
+_capture_ids = itertools.count(1)
+_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def profile(page, role, capture=False):
+    """Time the body as one render of page by a user with role.
+
+    With capture=True the render runs under cProfile and is stored as a
+    Capture instead of a timing sample.
+    """
+    if not ENABLED and not capture:
+        yield
+        return
+    profiler = cProfile.Profile() if capture else None
+    counters = query_log.begin_render()
+    start = time.perf_counter()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        # st.rerun() leaves the page by raising, and that render still counts
+        if profiler is not None:
+            profiler.disable()
+        wall = time.perf_counter() - start
+        query_log.end_render()
+        if profiler is not None:
+            profiler.create_stats()
+            store_capture(Capture(next(_capture_ids), page, role, timestamps.now(), wall * 1000,
+                                  counters.statements, profiler.stats))
+        else:
+            record(page, role, Sample(wall * 1000, counters.seconds * 1000, counters.statements, counters.rows))
+
+
+def record(page, role, sample):
+    """Add one render's sample"""
+    key = (page, role)
+    with _lock:
+        samples = _samples.get(key)
+        if samples is None:
+            samples = _samples[key] = collections.deque(maxlen=SAMPLES)
+        samples.append(sample)
+        _renders[key] += 1
+        _over_budget[key] += sample.queries > QUERY_BUDGET
+
+
+def summary():
+    """Return one dict per (page, role) with rolling percentiles, slowest p95 first"""
+    with _lock:
+        snapshot = [(key, list(samples), _renders[key], _over_budget[key]) for key, samples in _samples.items()]
+
+    rows = []
+    for (page, role), samples, renders, over_budget in snapshot:
+        wall = sorted(sample.wall_ms for sample in samples)
+        db = sorted(sample.db_ms for sample in samples)
+        queries = sorted(sample.queries for sample in samples)
+        rows.append({
+            'page': page,
+            'role': role,
+            'renders': renders,
+            'wall_ms_p50': _percentile(wall, 0.50),
+            'wall_ms_p95': _percentile(wall, 0.95),
+            'wall_ms_p99': _percentile(wall, 0.99),
+            'db_ms_p50': _percentile(db, 0.50),
+            'db_ms_p95': _percentile(db, 0.95),
+            'db_ms_p99': _percentile(db, 0.99),
+            'queries_p50': _percentile(queries, 0.50),
+            'queries_max': queries[-1],
+            'rows_avg': sum(sample.rows for sample in samples) / len(samples),
+            'over_budget': over_budget,
+        })
+    rows.sort(key=lambda row: row['wall_ms_p95'], reverse=True)
+    return rows
+
+
+def snapshot():
+    """Return the summary with its settings, ready for json.dumps"""
+    return {
+        'generated_at': timestamps.now(),
+        'samples_per_page': SAMPLES,
+        'query_budget': QUERY_BUDGET,
+        'pages': summary(),
+    }
+
+
+def store_capture(capture):
+    """Keep a capture under its id, dropping the oldest past CAPTURES"""
+    with _lock:
+        _captures[capture.id] = capture
+        while len(_captures) > CAPTURES:
+            del _captures[next(iter(_captures))]
+
+
+def captures():
+    """Return the stored captures, newest first"""
+    with _lock:
+        return list(reversed(_captures.values()))
+
+
+def get_capture(capture_id):
+    """Return the capture with capture_id, or None"""
+    with _lock:
+        return _captures.get(capture_id)
+
+
+def clear_captures():
+    """Forget all captures"""
+    with _lock:
+        _captures.clear()
+
+
+def capture_summary(capture, limit=30):
+    """Return a capture's functions with the most cumulative time, as dicts"""
+    functions = sorted(capture.stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+    return [{
+        'function': pstats.func_std_string(func),
+        'calls': calls,
+        'primitive_calls': primitive_calls,
+        'own_ms': own_seconds * 1000,
+        'cumulative_ms': cumulative_seconds * 1000,
+    } for func, (primitive_calls, calls, own_seconds, cumulative_seconds, _) in functions]
+
+
+def capture_pstats(capture):
+    """Return a capture in the file format pstats.Stats() loads"""
+    return marshal.dumps(capture.stats)
+
+
+def reset():
+    """Forget all render samples"""
+    with _lock:
+        _samples.clear()
+        _renders.clear()
+        _over_budget.clear()
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
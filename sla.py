@@ -0,0 +1,172 @@
+"""SLA policies and due-date calculation.
+
+Response and resolution targets live in the sla_policies table, keyed by
+priority and optionally category (migration 10), and are counted either
+around the clock or in the working hours of a business calendar (migration
+11, business_calendar.py). They are cached per process like the reference
+data: a trigger-maintained version counter tells the cache when to reload.
+When the policies change, recompute_open_tickets() re-baselines the due
+dates of every open ticket in one vectorized pass and writes them back in
+chunked executemany batches.
+"""
+import os
+import threading
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+import queries
+from business_calendar import BusinessCalendar, parse_workdays
+from database import DB_PATH, get_connection
+from reference_data import LookupTable
+
+# Tickets written back per transaction when due dates are recomputed
+RECOMPUTE_CHUNK_SIZE = int(os.environ.get('TICKETS_SLA_RECOMPUTE_CHUNK_SIZE', '5000'))
+
+
+class SLAPolicies:
+    """One version of the SLA policies and their calendars, with O(1) lookups by priority and category"""
+
+    def __init__(self, version, rows, calendar_rows=(), holiday_rows=()):
+        self.version = version
+        self.rows = rows
+        self._targets = {(priority_id, category_id): (response, resolution, calendar_id)
+                         for priority_id, category_id, response, resolution, calendar_id in rows}
+
+        holidays = {}
+        for calendar_id, day in holiday_rows:
+            holidays.setdefault(calendar_id, []).append(date.fromisoformat(day))
+        self.calendar_names = LookupTable([(row[0], row[1]) for row in calendar_rows])
+        self.calendar_rows = calendar_rows
+        self.holidays = holidays
+        self.calendars = {
+            calendar_id: BusinessCalendar(opens_minute, closes_minute, parse_workdays(workdays),
+                                          holidays.get(calendar_id, ()))
+            for calendar_id, _, opens_minute, closes_minute, workdays in calendar_rows
+        }
+
+    def targets(self, priority_id, category_id=None):
+        """Return (response minutes, resolution minutes, calendar id) for a ticket, or None without a policy.
+
+        A policy for the ticket's category wins over its priority's default.
+        """
+        return (self._targets.get((priority_id, category_id))
+                or self._targets.get((priority_id, None)))
+
+    def due_dates(self, priority_id, category_id, start):
+        """Return the (response, resolution) due epochs for a ticket opened at start"""
+        targets = self.targets(priority_id, category_id)
+        if targets is None:
+            return None, None
+        response, resolution, calendar_id = targets
+        calendar = self.calendars.get(calendar_id)
+        if calendar is None:
+            return start + response * 60, start + resolution * 60
+        return calendar.add_minutes(start, response), calendar.add_minutes(start, resolution)
+
+    def due_date_arrays(self, priority_ids, category_ids, starts):
+        """Vectorized due_dates() over whole columns.
+
+        Returns two float arrays of due epochs, NaN where no policy applies.
+        """
+        tickets = pd.DataFrame({
+            'priority_id': np.asarray(priority_ids, dtype=float),
+            'category_id': np.asarray(category_ids, dtype=float),
+        })
+        policies = pd.DataFrame(self.rows, columns=['priority_id', 'category_id', 'response', 'resolution',
+                                                    'calendar_id']).astype(float)
+        specific = policies[policies['category_id'].notna()]
+        default = policies[policies['category_id'].isna()].drop(columns='category_id')
+
+        matched = tickets.merge(specific, on=['priority_id', 'category_id'], how='left')
+        fallback = tickets.merge(default, on='priority_id', how='left')
+        use_fallback = matched['response'].isna().to_numpy()
+        response = np.where(use_fallback, fallback['response'], matched['response'])
+        resolution = np.where(use_fallback, fallback['resolution'], matched['resolution'])
+        calendar_ids = np.where(use_fallback, fallback['calendar_id'], matched['calendar_id'])
+
+        starts = np.asarray(starts, dtype=float)
+        response_due = starts + response * 60
+        resolution_due = starts + resolution * 60
+
+        # Tickets on a business calendar are redone one calendar at a time
+        for calendar_id, calendar in self.calendars.items():
+            on_calendar = calendar_ids == calendar_id
+            if on_calendar.any():
+                response_due[on_calendar] = calendar.add_minutes_array(starts[on_calendar], response[on_calendar])
+                resolution_due[on_calendar] = calendar.add_minutes_array(starts[on_calendar], resolution[on_calendar])
+        return response_due, resolution_due
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def get_sla_policies(db_path=DB_PATH):
+    """Return the cached SLA policies, reloading them if they have changed"""
+    key = os.path.abspath(db_path)
+    conn = get_connection(db_path)
+    try:
+        version = conn.execute(queries.SLA_POLICY_VERSION).fetchone()[0]
+        cached = _cache.get(key)
+        if cached is not None and cached.version == version:
+            return cached
+
+        with _cache_lock:
+            cached = _cache.get(key)
+            if cached is None or cached.version != version:
+                cached = _cache[key] = SLAPolicies(
+                    version,
+                    conn.execute(queries.SLA_POLICIES).fetchall(),
+                    conn.execute(queries.SLA_CALENDARS).fetchall(),
+                    conn.execute(queries.SLA_CALENDAR_HOLIDAYS).fetchall(),
+                )
+        return cached
+    finally:
+        conn.close()
+
+
+def recompute_open_tickets(db_path=DB_PATH, chunk_size=RECOMPUTE_CHUNK_SIZE, progress=None):
+    """Re-apply the current policies to every open ticket's SLA due dates.
+
+    Due dates are computed for all open tickets at once, only tickets whose
+    dates actually change are written, and the writes go out chunk_size rows
+    per transaction so other sessions are never locked out for long.
+    progress, if given, is called with (tickets written, tickets to write)
+    after each chunk. Returns the number of tickets updated.
+    """
+    policies = get_sla_policies(db_path)
+    conn = get_connection(db_path)
+    try:
+        tickets = pd.read_sql_query(queries.SLA_OPEN_TICKETS, conn)
+        response_due, resolution_due = policies.due_date_arrays(
+            tickets['priority_id'], tickets['category_id'], tickets['created_at'])
+
+        current_response = tickets['sla_response_due'].to_numpy(dtype=float)
+        current_resolution = tickets['sla_resolution_due'].to_numpy(dtype=float)
+        changed = ~(_same(response_due, current_response) & _same(resolution_due, current_resolution))
+
+        updates = list(zip(_nullable_ints(response_due[changed]),
+                           _nullable_ints(resolution_due[changed]),
+                           tickets['id'].to_numpy()[changed].tolist()))
+
+        for start in range(0, len(updates), chunk_size):
+            conn.executemany(queries.SLA_UPDATE_DUE_DATES, updates[start:start + chunk_size])
+            conn.commit()
+            if progress is not None:
+                progress(min(start + chunk_size, len(updates)), len(updates))
+    finally:
+        conn.close()
+
+    return len(updates)
+
+
+def _same(a, b):
+    """Element-wise equality that treats two NaNs as equal"""
+    return (a == b) | (np.isnan(a) & np.isnan(b))
+
+
+def _nullable_ints(values):
+    """Float array to a list of ints, with None for NaN"""
+    return [None if np.isnan(value) else int(value) for value in values.tolist()]
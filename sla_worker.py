@@ -0,0 +1,158 @@
+"""Background SLA escalation.
+
+A daemon thread keeps a min-heap of the soonest response and resolution
+deadlines, read in order off the pending-deadline indexes (migration 9). It
+sleeps until the earliest deadline passes, then stamps ``escalated_at`` on
+every ticket that is due in one batched update. The heap is reloaded
+periodically, when it runs dry and whenever notify() is called, which picks
+up new tickets and changed deadlines from any session or process.
+"""
+import heapq
+import os
+import threading
+
+import metrics
+import queries
+import timestamps
+from database import DB_PATH, get_connection
+
+# Set to 0 to run without the worker (e.g. when another process runs it)
+ENABLED = os.environ.get('TICKETS_SLA_WORKER', '1') != '0'
+
+# Deadlines of each kind held in memory at once
+HEAP_SIZE = int(os.environ.get('TICKETS_SLA_HEAP_SIZE', '1000'))
+
+# Longest the worker sleeps before reloading deadlines from the database
+RELOAD_SECONDS = int(os.environ.get('TICKETS_SLA_RELOAD_SECONDS', '60'))
+
+
+class SLAWorker(threading.Thread):
+    """Escalates tickets as their SLA deadlines pass"""
+
+    def __init__(self, db_path):
+        super().__init__(name='sla-worker', daemon=True)
+        self.db_path = db_path
+        self._heap = []
+        # Last deadline loaded from a query that hit HEAP_SIZE (the earlier of
+        # the two); later deadlines are waiting behind it in the database
+        self._reload_after = None
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._lock = threading.Lock()
+        self._escalated = 0
+        self._last_run = None
+        self._last_error = None
+
+    def notify(self):
+        """Reload deadlines now (call after creating tickets or changing SLA dates)"""
+        self._wakeup.set()
+
+    def stop(self):
+        """Stop the worker once it finishes its current batch"""
+        self._stopping = True
+        self._wakeup.set()
+
+    def stats(self):
+        """Return a snapshot of the worker's state"""
+        with self._lock:
+            return {
+                'db_path': self.db_path,
+                'pending': len(self._heap),
+                'next_deadline': self._heap[0][0] if self._heap else None,
+                'escalated': self._escalated,
+                'last_run': self._last_run,
+                'last_error': self._last_error,
+            }
+
+    def run(self):
+        while not self._stopping:
+            try:
+                self._reload()
+                self._run_until_reload()
+            except Exception as exc:  # keep escalating after a transient failure
+                with self._lock:
+                    self._last_error = repr(exc)
+                self._wakeup.wait(RELOAD_SECONDS)
+                self._wakeup.clear()
+
+    def _run_until_reload(self):
+        """Escalate deadlines as they pass until it is time to reload the heap"""
+        reload_at = timestamps.now() + RELOAD_SECONDS
+        while not self._stopping:
+            now = timestamps.now()
+            due = []
+            with self._lock:
+                while self._heap and self._heap[0][0] <= now:
+                    due.append(heapq.heappop(self._heap)[1])
+            if due:
+                self._escalate(due, now)
+
+            if self._reload_after is not None and now >= self._reload_after:
+                return
+            wake_at = min(self._heap[0][0], reload_at) if self._heap else reload_at
+            if self._reload_after is not None:
+                wake_at = min(wake_at, self._reload_after)
+            if wake_at <= now and not due:
+                return
+
+            if self._wakeup.wait(max(wake_at - now, 0)):
+                self._wakeup.clear()
+                return
+            if timestamps.now() >= reload_at:
+                return
+
+    def _reload(self):
+        conn = get_connection(self.db_path)
+        try:
+            response = conn.execute(queries.SLA_PENDING_RESPONSE, (HEAP_SIZE,)).fetchall()
+            resolution = conn.execute(queries.SLA_PENDING_RESOLUTION, (HEAP_SIZE,)).fetchall()
+        finally:
+            conn.close()
+
+        heap = response + resolution
+        heapq.heapify(heap)
+        marks = [rows[-1][0] for rows in (response, resolution) if len(rows) == HEAP_SIZE]
+        with self._lock:
+            self._heap = heap
+            self._reload_after = min(marks) if marks else None
+
+    def _escalate(self, ticket_ids, now):
+        conn = get_connection(self.db_path)
+        try:
+            cursor = conn.executemany(queries.SLA_ESCALATE,
+                                      [(now, ticket_id, now, now) for ticket_id in set(ticket_ids)])
+            conn.commit()
+            escalated = cursor.rowcount
+        finally:
+            conn.close()
+
+        metrics.SLA_BREACHES.inc(amount=escalated)
+        with self._lock:
+            self._escalated += escalated
+            self._last_run = now
+
+
+_workers = {}
+_workers_lock = threading.Lock()
+
+
+def start(db_path=DB_PATH):
+    """Start the process-wide worker for a database (a no-op once running)"""
+    if not ENABLED:
+        return None
+    key = os.path.abspath(db_path)
+    worker = _workers.get(key)
+    if worker is None:
+        with _workers_lock:
+            worker = _workers.get(key)
+            if worker is None:
+                worker = _workers[key] = SLAWorker(db_path)
+                worker.start()
+    return worker
+
+
+def notify(db_path=DB_PATH):
+    """Ask the worker for a database to reload its deadlines"""
+    worker = _workers.get(os.path.abspath(db_path))
+    if worker is not None:
+        worker.notify()
@@ -0,0 +1,353 @@
+"""Deterministic synthetic dataset for scale testing.
+
+Fills a freshly migrated database with requesters, IT staff, agent skills,
+tickets, comments, time entries and knowledge base articles at a chosen
+scale (10k, 100k or 1M tickets, or any count). Everything is drawn from one
+seeded random generator and dated back from midnight UTC on a fixed end
+date, so the same seed, scale and end date always produce the same rows on
+any machine. (The daily_ticket_stats rollup still buckets tickets by the
+local day, as it does in the app.) Rows go in
+through executemany in chunks, and the existing triggers keep the
+full-text indexes, the daily_ticket_stats rollup and the user_stats
+counters in step, exactly as they would be for tickets created in the app.
+
+SLA due dates follow the default policies in calendar time (business-hours
+calendars are not applied). A ticket is escalated when its history breaches
+one of them, as the SLA worker would have done.
+
+Usage: python synthetic_data.py path/to/bench.db [--scale 100k] [--seed 1]
+       [--end YYYY-MM-DD]
+"""
+import argparse
+import hashlib
+import random
+import sqlite3
+import sys
+import time
+from datetime import date, datetime, timezone
+
+import timestamps
+from migrations import migrate
+
+SCALES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+
+DEFAULT_SEED = 1
+
+# Tickets are dated back from this day, so a seed always gives the same data
+DEFAULT_END = date(2025, 1, 1)
+
+# Days of history the tickets are spread over
+HISTORY_DAYS = 730
+
+# Rows per executemany call
+CHUNK_SIZE = 10_000
+
+# Every generated account signs in with this password
+PASSWORD = 'password123'
+
+FIRST_NAMES = ['Alex', 'Sam', 'Jordan', 'Taylor', 'Morgan', 'Casey', 'Riley', 'Jamie', 'Avery', 'Quinn',
+               'Maria', 'Wei', 'Priya', 'Omar', 'Elena', 'Kenji', 'Fatima', 'Lucas', 'Amara', 'Noah']
+LAST_NAMES = ['Smith', 'Garcia', 'Chen', 'Patel', 'Kim', 'Nguyen', 'Silva', 'Müller', 'Okafor', 'Rossi',
+              'Johansson', 'Haddad', 'Kowalski', 'Tanaka', 'Brown', 'Lopez', 'Singh', 'Dubois', 'Ivanova', 'Reyes']
+DEPARTMENTS = ['Sales', 'Marketing', 'Finance', 'HR', 'Operations', 'Engineering', 'Legal', 'Support']
+
+# Category name: (relative frequency, ticket subjects)
+TOPICS = {
+    'Hardware': (25, ['Printer not printing', 'Laptop battery drains quickly', 'Monitor flickering',
+                      'Docking station not detected', 'Keyboard keys sticking', 'Scanner jams']),
+    'Software': (25, ['Excel crashes on startup', 'Cannot install update', 'License expired for design suite',
+                      'Application freezes when saving', 'Browser extension blocked', 'Driver install fails']),
+    'Network': (15, ['VPN disconnects every hour', 'WiFi slow on third floor', 'Cannot reach shared drive',
+                     'DNS lookups failing', 'Remote desktop times out']),
+    'Email': (12, ['Outlook not syncing', 'Emails stuck in outbox', 'Calendar invites missing',
+                   'Mailbox full warning', 'Shared mailbox access']),
+    'Security': (8, ['Phishing email reported', 'Suspicious login alert', 'Antivirus quarantine',
+                     'Lost badge access', 'Encryption key request']),
+    'Account': (10, ['Password reset request', 'Account locked out', 'New hire account setup',
+                     'Group membership change', 'MFA device replacement']),
+    'Other': (5, ['Meeting room display', 'Phone extension move', 'Software recommendation request']),
+}
+DETAILS = ['It started after the latest update.', 'This happens several times a day.',
+           'A restart fixes it for a while.', 'Colleagues on the same team see it too.',
+           'The error message mentions a timeout.', 'It blocks a customer deadline this week.',
+           'I already tried reconnecting the cable.', 'It only happens when working from home.',
+           'The device is about three years old.', 'Screenshots are available on request.']
+REPLIES = ['Thanks, looking into this now.', 'Can you confirm the exact error message?',
+           'I have pushed a fix, please try again.', 'Still seeing the problem this morning.',
+           'Escalated to the vendor, waiting for their reply.', 'Restarted the service on our side.',
+           'That worked, thank you!', 'Scheduled a visit to your desk tomorrow.',
+           'Replaced the cable and the issue is gone.', 'Reset completed, please sign in again.']
+INTERNAL_NOTES = ['Known issue with the current driver build.', 'Checked logs, nothing unusual.',
+                  'Vendor ticket opened.', 'Likely the same root cause as last week.']
+WORK = ['Remote troubleshooting', 'On-site visit', 'Reinstalled software', 'Configuration change',
+        'Vendor call', 'Hardware replacement']
+
+# Priority name: relative frequency
+PRIORITY_WEIGHTS = {'Low': 30, 'Medium': 45, 'High': 20, 'Critical': 5}
+
+# Status of a ticket that is still open: relative frequency
+OPEN_STATUS_WEIGHTS = {'Open': 35, 'In Progress': 40, 'Pending User': 15, 'Pending Vendor': 10}
+
+
+def scaled_counts(tickets):
+    """Return how many of each row to generate for a ticket count"""
+    return {
+        'tickets': tickets,
+        'requesters': max(100, tickets // 25),
+        'staff': max(10, tickets // 2000),
+        'articles': max(50, tickets // 100),
+    }
+
+
+def generate(db_path, tickets, seed=DEFAULT_SEED, end=DEFAULT_END, progress=None):
+    """Fill a database with a synthetic dataset; returns the rows written per table.
+
+    The database is migrated first and must not contain tickets yet.
+    progress, if given, is called with (tickets written, tickets) after each
+    chunk.
+    """
+    migrate(db_path)
+    conn = sqlite3.connect(db_path)
+    try:
+        if conn.execute('SELECT COUNT(*) FROM tickets').fetchone()[0]:
+            raise ValueError(f"{db_path} already has tickets; generate into a fresh database")
+        conn.execute('PRAGMA synchronous = OFF')
+        conn.execute('PRAGMA cache_size = -262144')
+        return _Generator(conn, random.Random(seed), scaled_counts(tickets), end).run(progress)
+    finally:
+        conn.close()
+
+
+class _Generator:
+    def __init__(self, conn, rng, counts, end):
+        self.conn = conn
+        self.rng = rng
+        self.counts = counts
+        self.end = timestamps.to_epoch(datetime.combine(end, datetime.min.time(), tzinfo=timezone.utc))
+        self.start = self.end - HISTORY_DAYS * 86400
+
+        def ids(table):
+            return dict(conn.execute(f'SELECT name, id FROM {table}'))
+        self.categories = ids('categories')
+        self.priorities = ids('priorities')
+        self.statuses = ids('statuses')
+        self.pick_category = _picker({name: topic[0] for name, topic in TOPICS.items()})
+        self.pick_priority = _picker(PRIORITY_WEIGHTS)
+        self.pick_open_status = _picker(OPEN_STATUS_WEIGHTS)
+        self.policies = {priority_id: (response * 60, resolution * 60) for priority_id, response, resolution in conn.execute(
+            'SELECT priority_id, response_minutes, resolution_minutes FROM sla_policies WHERE category_id IS NULL')}
+
+    def run(self, progress):
+        written = {'users': self._users(), 'agent_skills': self._skills()}
+        written['knowledge_base'] = self._articles()
+        written.update(self._tickets(progress))
+        return written
+
+    def _users(self):
+        rng = self.rng
+        password_hash = hashlib.sha256(PASSWORD.encode()).hexdigest()
+        created_at = _format_utc(self.start - 86400)
+        next_id = self.conn.execute('SELECT COALESCE(MAX(id), 0) + 1 FROM users').fetchone()[0]
+
+        rows = []
+        for role, prefix, count in (('user', 'user', self.counts['requesters']),
+                                    ('it_staff', 'agent', self.counts['staff'])):
+            for number in range(1, count + 1):
+                first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+                username = f'{prefix}{number:06d}'
+                department = 'IT' if role == 'it_staff' else rng.choice(DEPARTMENTS)
+                rows.append((next_id + len(rows), username, password_hash, f'{username}@example.com',
+                             f'{first} {last}', role, department, created_at))
+        self.conn.executemany('''
+            INSERT INTO users (id, username, password_hash, email, full_name, role, department, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+        self.conn.commit()
+
+        self.requesters = [row[0] for row in rows if row[5] == 'user']
+        self.staff = [row[0] for row in rows if row[5] == 'it_staff']
+        # A few requesters raise most tickets, and a few agents carry more than the rest
+        self.requester_weights = _cumulative([1 / rank ** 0.7 for rank in range(1, len(self.requesters) + 1)])
+        self.staff_weights = _cumulative([1 / rank ** 0.5 for rank in range(1, len(self.staff) + 1)])
+        return len(rows)
+
+    def _skills(self):
+        category_ids = sorted(self.categories.values())
+        rows = [(category_id, user_id) for user_id in self.staff
+                for category_id in self.rng.sample(category_ids, self.rng.randint(1, 3))]
+        self.conn.executemany('INSERT INTO agent_skills (category_id, user_id) VALUES (?, ?)', rows)
+        self.conn.commit()
+        return len(rows)
+
+    def _articles(self):
+        rng = self.rng
+        created_at = _format_utc(self.start)
+        rows = []
+        for number in range(1, self.counts['articles'] + 1):
+            category = rng.choice(list(TOPICS))
+            subject = rng.choice(TOPICS[category][1])
+            steps = '\n'.join(f'{step}. {rng.choice(REPLIES)}' for step in range(1, rng.randint(3, 6)))
+            rows.append((f'{subject}: fix {number}', f'How to resolve "{subject.lower()}":\n{steps}',
+                         self.categories[category], ','.join(subject.lower().split()[:3]),
+                         rng.random() < 0.9, rng.choice(self.staff), created_at, created_at))
+        self.conn.executemany('''
+            INSERT INTO knowledge_base (title, content, category_id, tags, is_public, created_by, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+        self.conn.commit()
+        return len(rows)
+
+    def _tickets(self, progress):
+        total = self.counts['tickets']
+        next_id = self.conn.execute('SELECT COALESCE(MAX(id), 0) + 1 FROM tickets').fetchone()[0]
+        written = {'tickets': 0, 'comments': 0, 'time_entries': 0}
+
+        # Tickets are created in time order, so ids follow created_at as in the app
+        created = sorted(self.rng.randint(self.start, self.end - 1) for _ in range(total))
+        for chunk_start in range(0, total, CHUNK_SIZE):
+            tickets, comments, time_entries = [], [], []
+            for offset, created_at in enumerate(created[chunk_start:chunk_start + CHUNK_SIZE]):
+                self._ticket(next_id + chunk_start + offset, created_at, tickets, comments, time_entries)
+
+            self.conn.executemany('''
+                INSERT INTO tickets (id, ticket_number, title, description, status_id, priority_id, category_id,
+                                     requester_id, assignee_id, created_at, updated_at, resolved_at,
+                                     sla_response_due, sla_resolution_due, first_response_at, escalated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', tickets)
+            self.conn.executemany('''
+                INSERT INTO comments (ticket_id, user_id, content, is_internal, created_at) VALUES (?, ?, ?, ?, ?)
+            ''', comments)
+            self.conn.executemany('''
+                INSERT INTO time_entries (ticket_id, user_id, description, time_spent_minutes, created_at)
+                VALUES (?, ?, ?, ?, ?)
+            ''', time_entries)
+            self.conn.commit()
+
+            written['tickets'] += len(tickets)
+            written['comments'] += len(comments)
+            written['time_entries'] += len(time_entries)
+            if progress is not None:
+                progress(written['tickets'], total)
+        return written
+
+    def _ticket(self, ticket_id, created_at, tickets, comments, time_entries):
+        rng = self.rng
+        category = self.pick_category(rng)
+        priority = self.pick_priority(rng)
+        priority_id = self.priorities[priority]
+        response_seconds, resolution_seconds = self.policies[priority_id]
+        response_due = created_at + response_seconds
+        resolution_due = created_at + resolution_seconds
+
+        # Older tickets are almost all finished; recent ones are mostly open
+        age = self.end - created_at
+        resolved_share = 0.97 if age > 30 * 86400 else 0.8 if age > 7 * 86400 else 0.4
+        resolved_at = None
+        if rng.random() < resolved_share:
+            resolved_at = created_at + int(rng.expovariate(1 / (resolution_seconds * 0.7))) + 60
+            if resolved_at >= self.end:
+                resolved_at = None
+        if resolved_at is not None:
+            status = 'Resolved' if rng.random() < 0.7 else 'Closed'
+        else:
+            status = self.pick_open_status(rng)
+
+        assignee_id = None
+        if status != 'Open' or rng.random() < 0.6:
+            assignee_id = rng.choices(self.staff, cum_weights=self.staff_weights)[0]
+
+        first_response_at = None
+        if assignee_id is not None and (status != 'Open' or rng.random() < 0.5):
+            first_response_at = created_at + int(rng.expovariate(1 / (response_seconds * 0.6))) + 60
+            first_response_at = min(first_response_at, resolved_at or self.end - 1)
+
+        # Escalated at the first deadline the ticket's history breached
+        breaches = []
+        if response_due < (first_response_at or resolved_at or self.end):
+            breaches.append(response_due)
+        if resolution_due < (resolved_at or self.end):
+            breaches.append(resolution_due)
+        escalated_at = min(breaches) if breaches else None
+
+        requester_id = rng.choices(self.requesters, cum_weights=self.requester_weights)[0]
+        subject = rng.choice(TOPICS[category][1])
+        finished = resolved_at or self.end - 1
+        day = _format_utc(created_at, '%Y%m%d')
+        tickets.append((
+            ticket_id, f'TKT-{day}-{ticket_id:08X}', subject,
+            ' '.join(rng.sample(DETAILS, rng.randint(1, 3))),
+            self.statuses[status], priority_id, self.categories[category], requester_id, assignee_id,
+            created_at, max(created_at, first_response_at or 0, resolved_at or 0), resolved_at,
+            response_due, resolution_due, first_response_at, escalated_at,
+        ))
+
+        # A short thread between the requester and the agent
+        for _ in range(rng.choice((0, 1, 1, 2, 2, 3, 4, 6))):
+            at = rng.randint(created_at, finished)
+            if assignee_id is not None and rng.random() < 0.5:
+                internal = rng.random() < 0.25
+                comments.append((ticket_id, assignee_id,
+                                 rng.choice(INTERNAL_NOTES if internal else REPLIES), internal, at))
+            else:
+                comments.append((ticket_id, requester_id, rng.choice(REPLIES), False, at))
+
+        if assignee_id is not None and status != 'Open':
+            for _ in range(rng.randint(1, 3)):
+                time_entries.append((ticket_id, assignee_id, rng.choice(WORK),
+                                     rng.choice((15, 30, 45, 60, 90, 120, 240)), rng.randint(created_at, finished)))
+
+
+def _format_utc(value, fmt=timestamps.DISPLAY_FORMAT):
+    """Render an epoch timestamp in UTC, so the text does not depend on the machine"""
+    return datetime.fromtimestamp(value, timezone.utc).strftime(fmt)
+
+
+def _cumulative(weights):
+    total = 0
+    cumulative = []
+    for weight in weights:
+        total += weight
+        cumulative.append(total)
+    return cumulative
+
+
+def _picker(weights):
+    """Return pick(rng), choosing a key of weights in proportion to its weight"""
+    keys = list(weights)
+    cumulative = _cumulative(weights.values())
+
+    def pick(rng):
+        return rng.choices(keys, cum_weights=cumulative)[0]
+    return pick
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Generate a synthetic ticketing dataset')
+    parser.add_argument('db_path', help='database to create (must have no tickets yet)')
+    parser.add_argument('--scale', default='10k', help='10k, 100k, 1m or a ticket count')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--end', type=date.fromisoformat, default=DEFAULT_END,
+                        help='day the history ends (YYYY-MM-DD)')
+    args = parser.parse_args(argv[1:])
+
+    tickets = SCALES.get(args.scale.lower()) or int(args.scale)
+    started = time.perf_counter()
+
+    def report_progress(done, total):
+        print(f"\r{done:,}/{total:,} tickets", end='', file=sys.stderr, flush=True)
+    try:
+        written = generate(args.db_path, tickets, args.seed, args.end, report_progress)
+    except ValueError as exc:
+        print(exc, file=sys.stderr)
+        return 1
+
+    print(file=sys.stderr)
+    for table, count in written.items():
+        print(f"{table}: {count:,}")
+    print(f"Generated in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
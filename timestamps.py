@@ -0,0 +1,49 @@
+"""Conversion layer for stored timestamps.
+
+Ticket, comment and time entry timestamps are stored as integer seconds since
+the Unix epoch (UTC), so range filters, SLA checks and durations are plain
+integer comparisons in SQL. Everything that reads or writes those columns
+goes through the helpers here; they are only turned into text for display.
+"""
+import time
+from datetime import datetime, timedelta
+
+DISPLAY_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def now():
+    """Current time as an epoch timestamp"""
+    return int(time.time())
+
+
+def to_epoch(value):
+    """Convert a datetime (naive means local time) to an epoch timestamp"""
+    if value is None:
+        return None
+    return int(value.timestamp())
+
+
+def from_epoch(value):
+    """Convert an epoch timestamp to a local naive datetime"""
+    if _is_missing(value):
+        return None
+    return datetime.fromtimestamp(int(value))
+
+
+def format_timestamp(value, fmt=DISPLAY_FORMAT, default=''):
+    """Render an epoch timestamp in local time, or default when it is unset"""
+    if _is_missing(value):
+        return default
+    return datetime.fromtimestamp(int(value)).strftime(fmt)
+
+
+def day_range(start_date, end_date):
+    """Return the [start, end) epoch bounds covering two local dates inclusive"""
+    start = datetime.combine(start_date, datetime.min.time())
+    end = datetime.combine(end_date, datetime.min.time()) + timedelta(days=1)
+    return to_epoch(start), to_epoch(end)
+
+
+def _is_missing(value):
+    # pandas hands back NaN for NULLs in an otherwise integer column
+    return value is None or value != value
@@ -0,0 +1,52 @@
+"""Agent work queue: open tickets ordered by how soon they breach their SLA.
+
+A ticket's next deadline is its response due date until it gets a first
+response, then its resolution due date; idx_tickets_queue (migration 12)
+keeps open tickets sorted by assignee and that deadline. Claiming the next
+ticket is a single UPDATE that picks the most urgent unassigned ticket and
+re-checks that it is still unassigned. It runs on the single writer
+(write_queue.py), inside its BEGIN IMMEDIATE transaction, so concurrent
+claims queue up behind one another and never take the same one.
+"""
+import queries
+import timestamps
+import write_queue
+from database import DB_PATH
+
+_CLAIM_ORDER = (
+    queries.QUEUE_CLAIM.format(next_ticket=queries.QUEUE_NEXT_UNASSIGNED),
+    queries.QUEUE_CLAIM.format(next_ticket=queries.QUEUE_NEXT_UNASSIGNED_WITHOUT_SLA),
+)
+
+
+def claim_next(agent_id, db_path=DB_PATH):
+    """Assign the most urgent unassigned open ticket to an agent.
+
+    Tickets with an SLA deadline come first, soonest deadline first, then
+    those without one, oldest first. Returns (ticket id, ticket number), or
+    None when nothing is left to claim.
+    """
+    def claim(conn):
+        for claim_sql in _CLAIM_ORDER:
+            claimed = conn.execute(claim_sql, (agent_id, timestamps.now())).fetchone()
+            if claimed is not None:
+                return tuple(claimed)
+        return None
+    return write_queue.call(claim, db_path)
+
+
+def time_to_breach(next_due, now=None):
+    """Describe how long until a deadline, e.g. '2h 15m left' or 'overdue by 40m'"""
+    if next_due is None or next_due != next_due:
+        return 'No SLA'
+    remaining = int(next_due) - (timestamps.now() if now is None else now)
+    minutes = abs(remaining) // 60
+    days, minutes = divmod(minutes, 24 * 60)
+    hours, minutes = divmod(minutes, 60)
+    if days:
+        text = f"{days}d {hours}h"
+    elif hours:
+        text = f"{hours}h {minutes}m"
+    else:
+        text = f"{minutes}m"
+    return f"{text} left" if remaining >= 0 else f"overdue by {text}"
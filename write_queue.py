@@ -0,0 +1,215 @@
+"""Single-writer queue for page writes.
+
+SQLite allows one writer at a time, so sessions that each open a transaction
+and commit end up fighting over the write lock. Instead, page writes are
+handed to one writer thread per database. The writer drains whatever is
+waiting, up to BATCH_SIZE writes, runs each inside its own savepoint of a
+single BEGIN IMMEDIATE transaction and commits them together (a group
+commit). Callers get their result, or the write's own exception, back
+through a Future. A failing write is rolled back to its savepoint without
+affecting the rest of the batch.
+
+Set TICKETS_WRITE_QUEUE=0 to run writes inline on the calling thread
+instead (same API, one transaction per write).
+"""
+import collections
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from database import DB_PATH, get_connection
+
+ENABLED = os.environ.get('TICKETS_WRITE_QUEUE', '1') != '0'
+
+# Most writes committed together in one transaction
+BATCH_SIZE = int(os.environ.get('TICKETS_WRITE_BATCH_SIZE', '64'))
+
+# Seconds a caller waits for its write before giving up
+WRITE_TIMEOUT = float(os.environ.get('TICKETS_WRITE_TIMEOUT', '30'))
+
+# Recent write latencies kept for the percentiles in stats()
+LATENCY_SAMPLES = 1000
+
+# Result of one statement: the inserted rowid and the number of rows changed
+WriteResult = collections.namedtuple('WriteResult', 'lastrowid rowcount')
+
+
+class WriteQueue(threading.Thread):
+    """Writer thread that applies queued writes to one database in group commits"""
+
+    def __init__(self, db_path):
+        super().__init__(name='write-queue', daemon=True)
+        self.db_path = db_path
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._latencies = collections.deque(maxlen=LATENCY_SAMPLES)
+        self._writes = 0
+        self._failed = 0
+        self._batches = 0
+        self._largest_batch = 0
+
+    def submit(self, func):
+        """Queue func(conn) to run on the writer; returns a Future for its result"""
+        future = Future()
+        self._queue.put((func, future, time.perf_counter()))
+        return future
+
+    def stop(self):
+        """Stop the writer once the writes queued so far are committed"""
+        self._queue.put(None)
+
+    def stats(self):
+        """Return a snapshot of queue depth, throughput and write latency (ms)"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            return {
+                'db_path': self.db_path,
+                'queue_depth': self._queue.qsize(),
+                'writes': self._writes,
+                'failed': self._failed,
+                'batches': self._batches,
+                'avg_batch_size': self._writes / self._batches if self._batches else 0,
+                'largest_batch': self._largest_batch,
+                'latency_ms_p50': _percentile(latencies, 0.50) * 1000,
+                'latency_ms_p95': _percentile(latencies, 0.95) * 1000,
+                'latency_ms_max': (latencies[-1] if latencies else 0) * 1000,
+            }
+
+    def run(self):
+        conn = get_connection(self.db_path)
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    return
+                batch = [item]
+                while len(batch) < BATCH_SIZE:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        self._queue.put(None)
+                        break
+                    batch.append(item)
+                self._commit_batch(conn, batch)
+        finally:
+            conn.close()
+
+    def _commit_batch(self, conn, batch):
+        outcomes = []
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for func, future, enqueued in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute('SAVEPOINT queued_write')
+                try:
+                    result = func(conn)
+                except Exception as exc:
+                    conn.execute('ROLLBACK TO queued_write')
+                    conn.execute('RELEASE queued_write')
+                    outcomes.append((future, enqueued, None, exc))
+                else:
+                    conn.execute('RELEASE queued_write')
+                    outcomes.append((future, enqueued, result, None))
+            conn.commit()
+        except Exception as exc:
+            # The transaction itself failed, so nothing in the batch was written
+            if conn.in_transaction:
+                conn.rollback()
+            outcomes = [(future, enqueued, None, exc) for _, future, enqueued in batch
+                        if not future.cancelled()]
+
+        finished = time.perf_counter()
+        with self._lock:
+            self._batches += 1
+            self._largest_batch = max(self._largest_batch, len(batch))
+            for future, enqueued, result, exc in outcomes:
+                self._writes += 1
+                self._failed += exc is not None
+                self._latencies.append(finished - enqueued)
+
+        # Results are only handed out once they are committed
+        for future, _, result, exc in outcomes:
+            if exc is None:
+                future.set_result(result)
+            else:
+                future.set_exception(exc)
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_writer(db_path=DB_PATH):
+    """Return the process-wide writer for a database, starting it on first use"""
+    if not ENABLED:
+        return None
+    key = os.path.abspath(db_path)
+    writer = _writers.get(key)
+    if writer is None:
+        with _writers_lock:
+            writer = _writers.get(key)
+            if writer is None:
+                writer = _writers[key] = WriteQueue(db_path)
+                writer.start()
+    return writer
+
+
+def submit(func, db_path=DB_PATH):
+    """Run func(conn) as one atomic write; returns a Future for its return value.
+
+    func must not commit or roll back; the writer does that for the batch.
+    """
+    writer = get_writer(db_path)
+    if writer is not None:
+        return writer.submit(func)
+
+    future = Future()
+    future.set_running_or_notify_cancel()
+    conn = get_connection(db_path)
+    try:
+        result = func(conn)
+        conn.commit()
+    except Exception as exc:
+        conn.rollback()
+        future.set_exception(exc)
+    else:
+        future.set_result(result)
+    finally:
+        conn.close()
+    return future
+
+
+def call(func, db_path=DB_PATH, timeout=WRITE_TIMEOUT):
+    """submit() and wait for the result, re-raising the write's exception"""
+    return submit(func, db_path).result(timeout)
+
+
+def write(statements, db_path=DB_PATH, timeout=WRITE_TIMEOUT):
+    """Run [(sql, params), ...] as one atomic write and wait for it.
+
+    Returns a WriteResult per statement.
+    """
+    def run_statements(conn):
+        results = []
+        for sql, params in statements:
+            cursor = conn.execute(sql, params)
+            results.append(WriteResult(cursor.lastrowid, cursor.rowcount))
+        return results
+    return call(run_statements, db_path, timeout)
+
+
+def stats(db_path=DB_PATH):
+    """Return the writer's stats for a database, or None if it is not running"""
+    writer = _writers.get(os.path.abspath(db_path))
+    return writer.stats() if writer is not None else None